@@ -5,6 +5,22 @@ from django.urls import reverse_lazy
 from functools import wraps
 
 
+def has_role(user, allowed_roles):
+    """Verifica se o usuario esta autenticado e tem um dos roles permitidos (superuser sempre tem)"""
+    if not user.is_authenticated:
+        return False
+    
+    # Superuser sempre tem acesso
+    if user.is_superuser:
+        return True
+    
+    # Verifica se o profile existe e se o role esta permitido
+    if hasattr(user, 'profile'):
+        return user.profile.role in allowed_roles
+    
+    return False
+
+
 class RoleRequiredMixin(UserPassesTestMixin):
     """
     Mixin que restringe acesso a views baseado no role do usuario.
@@ -19,18 +35,7 @@ class RoleRequiredMixin(UserPassesTestMixin):
     
     def test_func(self):
         """Verifica se o usuario tem um dos roles permitidos"""
-        if not self.request.user.is_authenticated:
-            return False
-        
-        # Superuser sempre tem acesso
-        if self.request.user.is_superuser:
-            return True
-        
-        # Verifica se o profile existe e se o role esta permitido
-        if hasattr(self.request.user, 'profile'):
-            return self.request.user.profile.role in self.allowed_roles
-        
-        return False
+        return has_role(self.request.user, self.allowed_roles)
     
     def handle_no_permission(self):
         """Mensagem amigavel quando usuario nao tem permissao"""
@@ -0,0 +1,23 @@
+from rest_framework.permissions import BasePermission
+
+from .mixins import StaffOrAboveRequiredMixin, has_role
+
+
+class RolePermission(BasePermission):
+    """
+    Permissão do DRF com a mesma regra de roles do RoleRequiredMixin
+    (responde 403 em vez de redirecionar).
+
+    Uso:
+        class MyAPIView(APIView):
+        permission_classes = [StaffOrAbovePermission]
+    """
+    allowed_roles = []
+
+    def has_permission(self, request, view):
+        return has_role(request.user, self.allowed_roles)
+
+
+class StaffOrAbovePermission(RolePermission):
+    """Mesmos roles das views de movimentação (StaffOrAboveRequiredMixin)"""
+    allowed_roles = StaffOrAboveRequiredMixin.allowed_roles
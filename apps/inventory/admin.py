@@ -7,4 +7,16 @@ from .models import StockMovement
 class StockMovementAdmin(admin.ModelAdmin):
     list_display = ["product", "movement_type", "quantity", "user", "created_at"]
     list_filter = ["movement_type", "created_at", "product__category", "user"]
-    search_fields = ["product__name", "product__sku", "user__username"]
\ No newline at end of file
+    search_fields = ["product__name", "product__sku", "user__username"]
+
+    # Somente leitura: movimentações são registradas pelas telas e pela API,
+    # que atualizam saldos e totais diários (services.py) junto com elas
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,214 @@
+"""
+Arquivo frio de movimentações antigas.
+
+Movimentações mais antigas que a janela de retenção (setting
+MOVEMENT_ARCHIVE_AFTER_MONTHS) saem da tabela principal e vão para
+`ArchivedStockMovement`, mantendo id e dados. A variação líquida arquivada
+de cada produto fica em `StockOpeningBalance`. Assim a tabela principal e
+seus índices (`movement_created_idx`, `movement_product_created_idx`)
+ficam pequenos.
+
+Os totais diários (MovementDailyRollup) não são alterados pelo arquivamento,
+então totais de relatórios continuam corretos. Listagens que alcançam o
+período arquivado usam `with_archive`, que lê as duas tabelas em sequência.
+"""
+
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, Case, When, Value, IntegerField
+from django.utils import timezone
+
+from .models import StockMovement, ArchivedStockMovement, StockOpeningBalance
+from . import autocomplete, dashboard
+from .counts import add_rows
+from .partitioning import add_months
+
+
+ARCHIVED_FIELDS = ['id', 'product_id', 'movement_type', 'quantity', 'reason', 'user_id', 'created_at']
+
+
+def archive_cutoff(months=None):
+    """
+    Início do mês de `months` meses atrás (padrão: MOVEMENT_ARCHIVE_AFTER_MONTHS).
+    Arquiva meses inteiros, alinhados com as partições mensais.
+    """
+    if months is None:
+        months = settings.MOVEMENT_ARCHIVE_AFTER_MONTHS
+    month = add_months(timezone.localdate().replace(day=1), -months)
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+# Fronteira do arquivo em cache por ARCHIVED_UNTIL_CACHE_TIMEOUT segundos
+ARCHIVED_UNTIL_CACHE_KEY = 'inventory:archived_until'
+_missing = object()
+
+
+def archived_until():
+    """
+    Data/hora da movimentação arquivada mais recente (None se o arquivo está
+    vazio). Em cache por poucos segundos, para que listas e relatórios não
+    consultem o arquivo a cada página: com o cache local por processo
+    (LocMem), outro processo só vê um arquivamento novo quando a entrada
+    expira, e até lá as movimentações recém-arquivadas ficam fora das listas.
+    """
+    cached = cache.get(ARCHIVED_UNTIL_CACHE_KEY, _missing)
+    if cached is not _missing:
+        return cached
+
+    last = ArchivedStockMovement.objects.aggregate(last=Max('created_at'))['last']
+    cache.set(ARCHIVED_UNTIL_CACHE_KEY, last, settings.ARCHIVED_UNTIL_CACHE_TIMEOUT)
+    return last
+
+
+def add_opening_balances(deltas, as_of):
+    """Soma as variações arquivadas {product_id: variação} nos saldos de abertura"""
+    existing = set(
+        StockOpeningBalance.objects.filter(product_id__in=deltas).values_list('product_id', flat=True)
+    )
+
+    StockOpeningBalance.objects.bulk_create(
+        [
+            StockOpeningBalance(product_id=pk, quantity=delta, as_of=as_of)
+            for pk, delta in deltas.items() if pk not in existing
+        ],
+        batch_size=1000,
+    )
+
+    to_update = [(pk, delta) for pk, delta in deltas.items() if pk in existing]
+    for i in range(0, len(to_update), 500):
+        chunk = to_update[i:i + 500]
+        StockOpeningBalance.objects.filter(product_id__in=[pk for pk, _ in chunk]).update(
+            quantity=F('quantity') + Case(
+                *[When(product_id=pk, then=Value(delta)) for pk, delta in chunk],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            as_of=as_of,
+        )
+
+
+def archive_movements(before, batch_size=5000, limit=None):
+    """
+    Move as movimentações com created_at < `before` para o arquivo, em lotes
+    (uma transação por lote: cópia, saldo de abertura e remoção).
+    Retorna a quantidade arquivada.
+
+    A remoção é um DELETE direto, sem os sinais post_delete de cada linha
+    (que fariam o Django carregar o lote inteiro): os caches que eles
+    invalidariam são invalidados uma vez por lote. A versão dos relatórios
+    muda pelo maior id arquivado (ver reports/versioning.py).
+    """
+    archived = 0
+
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+
+        with transaction.atomic():
+            ids = list(
+                StockMovement.objects.filter(created_at__lt=before)
+                .order_by('id')
+                .values_list('id', flat=True)[:size]
+            )
+            if not ids:
+                break
+
+            batch = StockMovement.objects.filter(id__in=ids)
+            ArchivedStockMovement.objects.bulk_create(
+                [ArchivedStockMovement(**row) for row in batch.values(*ARCHIVED_FIELDS)],
+                batch_size=1000,
+            )
+            add_opening_balances(
+                {row['product_id']: row['net_quantity'] for row in batch.net_by_product()},
+                before,
+            )
+            batch._raw_delete(batch.db)
+            add_rows(StockMovement, -len(ids))
+            autocomplete.invalidate_on_commit(autocomplete.PRODUCTS, autocomplete.MOVEMENTS)
+            dashboard.invalidate_on_commit(*dashboard.MOVEMENT_METRICS)
+            add_rows(ArchivedStockMovement, len(ids))
+
+        archived += len(ids)
+
+    cache.delete(ARCHIVED_UNTIL_CACHE_KEY)
+    return archived
+
+
+class ReadThrough:
+    """
+    Sequência paginável com as movimentações da tabela principal seguidas
+    das arquivadas. Como o arquivo só recebe movimentações anteriores às da
+    tabela principal, a ordem por -created_at é preservada sem UNION: uma
+    página que começa depois do fim da tabela principal lê só o arquivo.
+    """
+
+    ordered = True
+
+    def __init__(self, hot, archived):
+        self.hot = hot
+        self.archived = archived
+        self._hot_count = None
+        self._archived_count = None
+
+    @property
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    @property
+    def archived_count(self):
+        if self._archived_count is None:
+            self._archived_count = self.archived.count()
+        return self._archived_count
+
+    def count(self):
+        return self.hot_count + self.archived_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            items = self[key:key + 1]
+            if not items:
+                raise IndexError(key)
+            return items[0]
+
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        items = []
+        if self._hot_count is None or start < self._hot_count:
+            # Lê a tabela principal sem contá-la antes: página cheia não toca no arquivo
+            items = list(self.hot[start:stop])
+            if len(items) == stop - start:
+                return items
+            # A tabela principal terminou nesta página (ou antes dela)
+            self._hot_count = start + len(items) if items else self.hot.count()
+
+        items.extend(self.archived[max(start - self.hot_count, 0):stop - self.hot_count])
+        return items
+
+    def iterator(self, chunk_size=2000):
+        """Percorre as duas tabelas em blocos, sem guardar os resultados (como QuerySet.iterator)"""
+        yield from self.hot.iterator(chunk_size=chunk_size)
+        yield from self.archived.iterator(chunk_size=chunk_size)
+
+    def __iter__(self):
+        return self.iterator()
+
+
+def with_archive(queryset, archived_queryset, start=None, boundary=_missing):
+    """
+    Retorna `queryset` se o período (a partir de `start`) não alcança o
+    arquivo; caso contrário, um `ReadThrough` que lê as duas tabelas.
+    Ambos os querysets devem vir filtrados e ordenados por -created_at.
+    `boundary`: fronteira do arquivo já lida (padrão: `archived_until()`).
+    """
+    if boundary is _missing:
+        boundary = archived_until()
+    if boundary is None or (start is not None and start > boundary):
+        return queryset
+    return ReadThrough(queryset, archived_queryset)
@@ -0,0 +1,148 @@
+"""
+Cache dos autocompletes de produtos, fornecedores e movimentações.
+
+Substitui o `cache_page`, que usava a URL crua como chave: "Mouse",
+"mouse" e "mouse " eram três consultas, e digitar "mous" depois de "mou"
+nunca aproveitava nada.
+
+- Chave: autocomplete, versão e termo normalizado (minúsculas, espaços
+  colapsados e, onde a busca ignora acentos, sem acentos). A resposta JSON é
+  montada a cada requisição; só a lista de resultados fica no cache.
+- Versão por autocomplete no banco (contadores `autocomplete:<nome>` de
+  reports.DataVersion, como as do dashboard), trocada por `invalidate` nas
+  gravações dos modelos exibidos (sinais em signals.py e
+  `on_movements_created`): vale para todos os processos, mesmo com cache
+  local por processo (LocMem). Entradas antigas deixam de ser lidas e
+  expiram em AUTOCOMPLETE_CACHE_TIMEOUT. Cada busca lê a versão (uma
+  consulta pela chave única) antes do cache.
+- Prefixos: com menos de `limit` resultados, a lista de uma busca em que
+  "quem casa com 'mous' casa com 'mou'" (índice de prefixos de produtos,
+  chaves numéricas de fornecedores, trecho nas movimentações) está completa.
+  Ela é guardada com o texto de cada resultado e responde termos mais longos
+  filtrando em memória (`matches`). Buscas aproximadas (trigramas, texto)
+  não têm essa propriedade e não são reaproveitadas; lista filtrada vazia
+  também vai ao banco, que pode recorrer a elas.
+- Métricas (GET /metrics/): requisições por autocomplete e resultado
+  (hit, prefix, miss) e a taxa de acerto.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.products.prefix_index import normalize
+from apps.reports import versioning
+from . import metrics
+
+
+PRODUCTS = 'products'
+SUPPLIERS = 'suppliers'
+MOVEMENTS = 'movements'
+AUTOCOMPLETES = (PRODUCTS, SUPPLIERS, MOVEMENTS)
+
+# Tamanho mínimo do termo nos autocompletes
+MIN_LENGTH = 2
+
+requests = metrics.Counter(
+    'sistock_autocomplete_cache_requests_total',
+    'Buscas dos autocompletes por resultado do cache (hit, prefix: filtrado de um prefixo, miss)',
+    autocomplete=AUTOCOMPLETES,
+    result=('hit', 'prefix', 'miss'),
+)
+
+
+def hit_ratio():
+    values = requests.values()
+    ratios = {}
+    for name in AUTOCOMPLETES:
+        total = sum(values[(name, result)] for result in ('hit', 'prefix', 'miss'))
+        ratios[(name,)] = round((values[(name, 'hit')] + values[(name, 'prefix')]) / total, 4) if total else 0
+    return ratios
+
+
+metrics.Gauge(
+    'sistock_autocomplete_cache_hit_ratio',
+    'Fração das buscas dos autocompletes respondidas pelo cache (hit + prefix)',
+    hit_ratio,
+    label_names=('autocomplete',),
+)
+
+
+def version_name(name):
+    """Contador de versão do autocomplete `name` (reports.DataVersion)"""
+    return f'autocomplete:{name}'
+
+
+def version(name):
+    """Versão atual do autocomplete `name` (também usada pelos Select2, ver Select2ResponseView)"""
+    return versioning.versions([version_name(name)])[version_name(name)]
+
+
+def invalidate(*names):
+    """Troca a versão dos autocompletes `names` (chamado nas gravações dos modelos exibidos)"""
+    versioning.bump(*(version_name(name) for name in names))
+
+
+def invalidate_on_commit(*names):
+    """`invalidate` após o commit (antes dele, uma busca poderia guardar os dados antigos na versão nova)"""
+    transaction.on_commit(lambda: invalidate(*names))
+
+
+class AutocompleteCache:
+    """
+    Cache de um autocomplete. `matches(termo normalizado, texto)` diz se um
+    resultado guardado continua valendo para um termo mais longo.
+    """
+
+    def __init__(self, name, matches, fold_accents=False, limit=10):
+        self.name = name
+        self.matches = matches
+        self.fold_accents = fold_accents
+        self.limit = limit
+
+    def normalize(self, query):
+        query = normalize(query) if self.fold_accents else query.lower()
+        return ' '.join(query.split())
+
+    def key(self, version, term):
+        digest = hashlib.sha256(term.encode()).hexdigest()[:24]
+        return f'autocomplete:{self.name}:{version}:{digest}'
+
+    def get(self, query, search):
+        """
+        Resultados de `query`: do cache, filtrados do maior prefixo completo em
+        cache ou de `search(termo)`. `search` recebe o termo com espaços
+        colapsados e devolve (resultados, textos): textos alinhados aos
+        resultados para o filtro de prefixos, ou None se a busca não permite.
+        """
+        term = self.normalize(query)
+        current = version(self.name)
+        key = self.key(current, term)
+        prefixes = [self.key(current, term[:size]) for size in range(len(term) - 1, MIN_LENGTH - 1, -1)]
+        found = cache.get_many([key, *prefixes])
+
+        if key in found:
+            requests.inc(autocomplete=self.name, result='hit')
+            return found[key]['results']
+
+        for prefix in prefixes:
+            entry = found.get(prefix)
+            if entry is None or entry['texts'] is None or len(entry['results']) >= self.limit:
+                continue
+            pairs = [(result, text) for result, text in zip(entry['results'], entry['texts']) if self.matches(term, text)]
+            if not pairs:
+                break
+            requests.inc(autocomplete=self.name, result='prefix')
+            results = [result for result, _ in pairs]
+            self.store(key, results, [text for _, text in pairs])
+            return results
+
+        requests.inc(autocomplete=self.name, result='miss')
+        results, texts = search(' '.join(query.split()))
+        self.store(key, results, texts)
+        return results
+
+    def store(self, key, results, texts):
+        cache.set(key, {'results': results, 'texts': texts}, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
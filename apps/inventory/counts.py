@@ -0,0 +1,111 @@
+"""
+Contagens estimadas para tabelas grandes (listas paginadas e cards do dashboard).
+
+COUNT(*) percorre a tabela (ou o índice) inteira, então o custo cresce com
+o ledger. Aqui a contagem só é exata até `COUNT_ESTIMATE_THRESHOLD` linhas
+(um COUNT limitado, custo fixo); acima disso vira uma estimativa:
+
+- PostgreSQL: estatísticas do planejador. Sem filtro, `pg_class.reltuples`
+  (somando as partições, se a tabela for particionada); com filtro, o número
+  de linhas previsto pelo EXPLAIN.
+- Demais bancos (SQLite): `TableRowCount`, um total por tabela mantido com
+  UPDATE ... SET rows = rows + n pelos pontos de escrita (sinais de Product
+  e Supplier, `on_movements_created`, arquivamento). Só vale para consultas
+  sem filtro; com filtro a contagem continua exata.
+
+`refresh_row_counts` (e o comando de mesmo nome) recalcula os totais após
+cargas que não passam por esses pontos.
+"""
+
+import json
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from apps.products.models import Product
+from apps.suppliers.models import Supplier
+from . import partitioning
+from .models import StockMovement, ArchivedStockMovement, TableRowCount
+
+
+# Tabelas com total mantido em TableRowCount
+COUNTED_MODELS = (StockMovement, ArchivedStockMovement, Product, Supplier)
+
+
+def uses_planner_statistics():
+    """True se o banco fornece estimativas próprias (TableRowCount não é mantido)"""
+    return partitioning.is_supported()
+
+
+def add_rows(model, delta):
+    """Soma `delta` ao total mantido da tabela de `model` (sem linha ainda: será calculado na leitura)"""
+    if not delta or uses_planner_statistics():
+        return
+    TableRowCount.objects.filter(table=model._meta.db_table).update(rows=F('rows') + delta)
+
+
+def refresh_row_counts(models=COUNTED_MODELS):
+    """Recalcula com COUNT(*) os totais de `models`. Retorna {tabela: linhas}"""
+    totals = {model._meta.db_table: model.objects.order_by().count() for model in models}
+    TableRowCount.objects.bulk_create(
+        [TableRowCount(table=table, rows=rows) for table, rows in totals.items()],
+        update_conflicts=True,
+        unique_fields=['table'],
+        update_fields=['rows', 'updated_at'],
+    )
+    return totals
+
+
+def table_statistics(model):
+    """Linhas estimadas pelo PostgreSQL (reltuples), ou None se a tabela nunca foi analisada"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT SUM(reltuples) FILTER (WHERE reltuples >= 0), COUNT(*) FILTER (WHERE reltuples < 0) "
+            "FROM pg_class WHERE oid = %s::regclass "
+            "OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+            [model._meta.db_table] * 2,
+        )
+        rows, never_analyzed = cursor.fetchone()
+    if rows is None or never_analyzed:
+        return None
+    return int(rows)
+
+
+def planner_estimate(queryset):
+    """Linhas previstas pelo EXPLAIN do PostgreSQL para `queryset` (sem executá-lo)"""
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimated_count(model):
+    """Total aproximado de linhas da tabela de `model`, sem COUNT(*) (exceto na primeira leitura)"""
+    if uses_planner_statistics():
+        rows = table_statistics(model)
+        if rows is not None:
+            return rows
+        return model.objects.order_by().count()
+
+    rows = TableRowCount.objects.filter(table=model._meta.db_table).values_list('rows', flat=True).first()
+    if rows is None:
+        rows = refresh_row_counts([model])[model._meta.db_table]
+    return max(rows, 0)
+
+
+def count_or_estimate(queryset, threshold=None):
+    """
+    Retorna (total, estimado). Conta exatamente até `threshold` linhas; acima
+    disso usa a estimativa disponível (ou o COUNT exato, se não houver).
+    """
+    threshold = settings.COUNT_ESTIMATE_THRESHOLD if threshold is None else threshold
+    bounded = queryset.order_by()[:threshold + 1].count()
+    if bounded <= threshold:
+        return bounded, False
+
+    if not queryset.query.where:
+        estimate = estimated_count(queryset.model)
+    elif uses_planner_statistics():
+        estimate = planner_estimate(queryset)
+    else:
+        return queryset.count(), False
+    return max(estimate, bounded), True
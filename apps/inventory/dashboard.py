@@ -0,0 +1,160 @@
+"""
+Métricas do dashboard em cache, invalidadas por evento.
+
+Todo login termina no dashboard (LOGIN_REDIRECT_URL), e cada carga
+consultava as métricas uma a uma. Aqui cada métrica é uma entrada no cache
+com a versão em que foi calculada:
+
+- Versão por métrica no banco (contadores `dashboard:<métrica>` de
+  reports.DataVersion), trocada por `invalidate` após o commit das
+  gravações que a afetam (sinais em signals.py e `on_movements_created`):
+  um fornecedor novo recalcula só o total de fornecedores. No banco, a troca
+  vale para todos os processos, mesmo com cache local por processo (LocMem),
+  em que cada processo guarda as suas entradas. Entradas com mais de
+  DASHBOARD_CACHE_TIMEOUT segundos também são recalculadas (escritas que não
+  passam pelos sinais, ex.: comandos de recálculo e estatísticas do planner).
+- Carga com tudo em dia: uma consulta das versões e uma leitura do cache
+  (`get_many` das entradas), nenhuma consulta das métricas. Não chega a
+  zero consultas: versões só no cache não seriam vistas pelos demais
+  processos com LocMem, e a consulta das versões (chave única, uma linha por
+  métrica) é o custo de invalidar em todos eles.
+- Proteção contra estouro de recálculo: entrada desatualizada é recalculada
+  por quem obtém a trava (`cache.add`, por processo com LocMem); os demais
+  exibem o valor anterior até o novo ser gravado. Só sem nenhum valor
+  anterior (cache frio) a requisição calcula sem a trava.
+- Métricas (GET /metrics/): cargas do dashboard por resultado (hit, stale:
+  exibiu valor anterior, recompute: recalculou alguma métrica).
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.products.models import Product
+from apps.products.valuation import valuation_totals
+from apps.reports import versioning
+from apps.suppliers.models import Supplier
+from . import metrics
+from .counts import count_or_estimate
+from .models import StockMovement, MovementDailyRollup
+
+
+User = get_user_model()
+
+STOCK = 'stock'
+SUPPLIERS = 'suppliers'
+MOVEMENTS = 'movements'
+LOW_STOCK = 'low_stock'
+RECENT_ACTIVITIES = 'recent_activities'
+ACTIVE_USERS = 'active_users'
+
+# Métricas afetadas por movimentações novas (saldos, totais e a lista recente)
+MOVEMENT_METRICS = (STOCK, MOVEMENTS, LOW_STOCK, RECENT_ACTIVITIES)
+
+# Validade da trava de recálculo (segundos): cobre um recálculo que falhou sem liberá-la
+LOCK_TIMEOUT = 30
+
+loads = metrics.Counter(
+    'sistock_dashboard_cache_loads_total',
+    'Cargas do dashboard por resultado do cache (hit, stale: valor anterior exibido, recompute)',
+    result=('hit', 'stale', 'recompute'),
+)
+
+
+def stock_totals():
+    totals = valuation_totals()
+    return {'total_products': totals['total_products'], 'low_stock_count': totals['low_stock_count']}
+
+
+def low_stock_products():
+    # Só os campos exibidos (o cache guarda os objetos)
+    return list(
+        Product.objects.low_stock().select_related('category')
+        .only('id', 'name', 'sku', 'stock_quantity', 'minimum_stock', 'category__name')[:5]
+    )
+
+
+def recent_activities():
+    # Só os campos exibidos: o usuário vai para o cache sem o hash da senha
+    return list(
+        StockMovement.objects.select_related('product', 'user').only(
+            'id', 'created_at', 'movement_type', 'quantity', 'reason',
+            'product__name', 'product__sku',
+            'user__username', 'user__first_name', 'user__last_name'
+        ).order_by('-created_at')[:10]
+    )
+
+
+# Métrica → função que a calcula
+METRICS = {
+    STOCK: stock_totals,
+    # Exato até COUNT_ESTIMATE_THRESHOLD fornecedores, estimado acima disso
+    SUPPLIERS: lambda: count_or_estimate(Supplier.objects.all())[0],
+    MOVEMENTS: lambda: MovementDailyRollup.objects.totals()['total_movements'],
+    LOW_STOCK: low_stock_products,
+    RECENT_ACTIVITIES: recent_activities,
+    ACTIVE_USERS: lambda: User.objects.filter(is_active=True).count(),
+}
+
+
+def version_name(name):
+    """Contador de versão da métrica `name` (reports.DataVersion)"""
+    return f'dashboard:{name}'
+
+
+def entry_key(name):
+    return f'dashboard:{name}'
+
+
+def lock_key(name):
+    return f'dashboard:{name}:lock'
+
+
+def invalidate(*names):
+    """Troca a versão das métricas `names` (chamado nas gravações que as afetam)"""
+    versioning.bump(*(version_name(name) for name in names))
+
+
+def invalidate_on_commit(*names):
+    """`invalidate` após o commit (antes dele, um recálculo guardaria os dados antigos na versão nova)"""
+    transaction.on_commit(lambda: invalidate(*names))
+
+
+def compute(name, version):
+    value = METRICS[name]()
+    cache.set(entry_key(name), {'value': value, 'version': version, 'computed_at': time.time()}, timeout=None)
+    return value
+
+
+def dashboard_metrics():
+    """Valor de cada métrica de METRICS: {nome: valor}"""
+    current_versions = versioning.versions([version_name(name) for name in METRICS])
+    found = cache.get_many([entry_key(name) for name in METRICS])
+    oldest = time.time() - settings.DASHBOARD_CACHE_TIMEOUT
+
+    values, result = {}, 'hit'
+    for name in METRICS:
+        current = current_versions[version_name(name)]
+        entry = found.get(entry_key(name))
+
+        if entry is not None and entry['version'] == current and entry['computed_at'] >= oldest:
+            values[name] = entry['value']
+        elif entry is None:
+            values[name] = compute(name, current)
+            result = 'recompute'
+        elif cache.add(lock_key(name), True, LOCK_TIMEOUT):
+            try:
+                values[name] = compute(name, current)
+            finally:
+                cache.delete(lock_key(name))
+            result = 'recompute'
+        else:
+            # Outro processo está recalculando: exibe o valor anterior
+            values[name] = entry['value']
+            result = 'stale' if result == 'hit' else result
+
+    loads.inc(result=result)
+    return values
@@ -1,14 +1,22 @@
 import django_filters
+from .forms import ProductWidget
 from .models import StockMovement
 from apps.products.models import Product
 
 
 class StockMovementFilter(django_filters.FilterSet):
     """
-    Filtra por produto, tipo e usuário
+    Filtra por produto, tipo e usuário.
+    O produto é escolhido em um Select2 com busca sob demanda (a página não
+    lista o catálogo); o id enviado é validado com uma consulta por pk.
     """
     product = django_filters.ModelChoiceFilter(
         queryset=Product.objects.all(),
+        widget=ProductWidget(attrs={
+            'data-placeholder': 'Todos os produtos',
+            'data-allow-clear': 'true',
+            'data-minimum-input-length': 0,
+        }),
         label='Produto'
     )
     movement_type = django_filters.ChoiceFilter(
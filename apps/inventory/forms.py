@@ -1,13 +1,54 @@
 from django import forms
+from django.conf import settings
+from django.core import signing
 from .models import StockMovement, Product
 from django_select2.forms import ModelSelect2Widget
 
+from .autocomplete import PRODUCTS
+
+
+class CachedSelect2Mixin:
+    """
+    Opções carregadas sob demanda de Select2ResponseView (sem COUNT, em cache
+    na versão de `autocomplete`) em vez da view do django-select2; na página
+    só a opção selecionada.
+    """
+    autocomplete = PRODUCTS
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('data_view', 'inventory:select2_json')
+        super().__init__(*args, **kwargs)
+
 
 class ProductWidget(ModelSelect2Widget):
-    search_fields = [
-        'name__icontains',
-        'sku__icontains',
-    ]
+    """
+    Select2 de produtos (formulário e filtro de movimentações), servido por
+    ProductLookupView: busca no índice de texto por relevância, só
+    id/nome/SKU/saldo, respostas em cache curto. Não guarda estado no
+    servidor: o `data-field_id` é um token assinado com a configuração do
+    widget, válido em qualquer processo (o ModelSelect2Widget guarda o widget
+    no cache, que com o LocMemCache não é visto pelos outros workers).
+    """
+    model = Product
+
+    TOKEN_SALT = 'inventory.ProductWidget'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('data_view', 'inventory:product_lookup')
+        super().__init__(*args, **kwargs)
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs=extra_attrs)
+        attrs['data-field_id'] = signing.dumps({'limit': int(self.max_results)}, salt=self.TOKEN_SALT)
+        return attrs
+
+    @classmethod
+    def load_token(cls, token):
+        """Configuração do widget a partir do token (BadSignature se inválido ou expirado)"""
+        return signing.loads(token, salt=cls.TOKEN_SALT, max_age=settings.PRODUCT_WIDGET_TOKEN_MAX_AGE)
+
+    def set_to_cache(self):
+        """Nada a guardar: a configuração vai no token"""
 
 
 class StockMovementForm(forms.ModelForm):
@@ -53,6 +94,8 @@ class StockMovementForm(forms.ModelForm):
             self.add_error('quantity', "Para entradas, a quantidade deve ser positiva.")
         
         # Regra 3: Não permitir que uma saída deixe o estoque negativo
+        # (checagem antecipada para o usuário; a garantia real é a baixa
+        # condicional feita em MovementCreateView.form_valid)
         if movement_type == StockMovement.OUT:
             if product.stock_quantity < quantity:
                 self.add_error('quantity', f"Estoque insuficiente. Quantidade disponível: {product.stock_quantity}.")
@@ -0,0 +1,85 @@
+"""
+Busca global: produtos, fornecedores e movimentações em uma só requisição.
+
+A caixa de busca do cabeçalho faria três requisições (uma por
+autocomplete). `search` executa as três buscas ao mesmo tempo e a resposta
+sai quando a mais lenta termina, não após a soma delas.
+
+- Cada seção é a busca do autocomplete correspondente, com o mesmo cache
+  (ver autocomplete.py): termos repetidos nem chegam ao banco.
+- As seções rodam em threads de `executor`, cada uma com a sua conexão.
+  O ORM assíncrono do Django (`aget`, `async for`) executa as consultas
+  em uma única thread por requisição (sync_to_async com
+  thread_sensitive=True), uma depois da outra, e não serviria aqui.
+- Prazo por seção: GLOBAL_SEARCH_TIMEOUT segundos. Uma seção que estoura
+  o prazo (ou falha) volta vazia, com `status` "timeout" (ou "error"), e as
+  demais são respondidas normalmente. A consulta atrasada continua na sua
+  thread até terminar e guarda o resultado no cache do autocomplete: a
+  próxima tecla já o encontra.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metrics
+from .autocomplete import AUTOCOMPLETES
+
+
+logger = logging.getLogger(__name__)
+
+# Threads das seções (compartilhadas pelas requisições do processo)
+WORKERS = 8
+
+STATUSES = ('ok', 'timeout', 'error')
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='global-search')
+
+sections_total = metrics.Counter(
+    'sistock_global_search_sections_total',
+    'Seções da busca global por resultado (ok, timeout: prazo estourado, error)',
+    section=AUTOCOMPLETES,
+    status=STATUSES,
+)
+
+
+def run_section(search, query):
+    """`search(query)` na thread do executor, com a conexão tratada como em uma requisição"""
+    close_old_connections()
+    try:
+        return search(query)
+    finally:
+        close_old_connections()
+
+
+async def search(query, searches, timeout=None):
+    """
+    Executa `searches` ({seção: função(termo) → resultados}) em paralelo.
+    Retorna {seção: {'results', 'count', 'status'}}, na ordem de `searches`.
+    """
+    timeout = settings.GLOBAL_SEARCH_TIMEOUT if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    outcomes = await asyncio.gather(
+        *(
+            asyncio.wait_for(loop.run_in_executor(executor, run_section, function, query), timeout)
+            for function in searches.values()
+        ),
+        return_exceptions=True,
+    )
+
+    sections = {}
+    for name, outcome in zip(searches, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            results, status = [], 'timeout'
+            logger.warning(f"Busca global: seção '{name}' excedeu {timeout}s (query='{query}')")
+        elif isinstance(outcome, Exception):
+            results, status = [], 'error'
+            logger.error(f"Busca global: erro na seção '{name}' (query='{query}')", exc_info=outcome)
+        else:
+            results, status = outcome, 'ok'
+        sections_total.inc(section=name, status=status)
+        sections[name] = {'results': results, 'count': len(results), 'status': status}
+    return sections
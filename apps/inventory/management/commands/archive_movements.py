@@ -0,0 +1,62 @@
+"""
+Management command para mover movimentações antigas para o arquivo frio.
+Uso: python manage.py archive_movements [opções]
+
+Movimentações anteriores ao início do mês de N meses atrás (padrão: setting
+MOVEMENT_ARCHIVE_AFTER_MONTHS) são copiadas para ArchivedStockMovement, somadas
+no saldo de abertura de cada produto e removidas da tabela principal, em lotes.
+Relatório e exportação de movimentações continuam lendo o período arquivado.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory.archive import archive_cutoff, archive_movements
+from apps.inventory.models import StockMovement
+
+
+class Command(BaseCommand):
+    """
+    Comando de arquivamento de movimentações fora da janela de retenção.
+    """
+
+    help = 'Move movimentações antigas para o arquivo frio, deixando saldos de abertura por produto'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=settings.MOVEMENT_ARCHIVE_AFTER_MONTHS,
+            help=f'Meses mantidos na tabela principal (padrão: {settings.MOVEMENT_ARCHIVE_AFTER_MONTHS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Movimentações por transação (padrão: 5000)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Máximo de movimentações arquivadas nesta execução'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas informa quantas movimentações seriam arquivadas'
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months deve ser maior ou igual a 1')
+
+        cutoff = archive_cutoff(options['months'])
+        pending = StockMovement.objects.filter(created_at__lt=cutoff).count()
+
+        self.stdout.write(f'📦 {pending} movimentação(ões) anterior(es) a {cutoff:%d/%m/%Y}')
+        if options['dry_run'] or not pending:
+            return
+
+        archived = archive_movements(cutoff, batch_size=max(1, options['batch_size']), limit=options['limit'])
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {archived} movimentação(ões) arquivada(s)\n'))
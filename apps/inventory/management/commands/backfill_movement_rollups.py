@@ -0,0 +1,99 @@
+"""
+Management command para (re)construir a tabela de totais diários de movimentações.
+Uso: python manage.py backfill_movement_rollups [opções]
+
+Necessário uma vez após a criação da tabela, ou depois de cargas que não passaram
+pelos serviços de inventário (ex.: importação direta no banco, exclusões no admin).
+Lê a tabela principal e o arquivo (ArchivedStockMovement): os totais dos
+períodos arquivados continuam nos relatórios.
+"""
+
+import heapq
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from apps.inventory.models import StockMovement, ArchivedStockMovement, MovementDailyRollup
+
+
+class Command(BaseCommand):
+    """
+    Recalcula MovementDailyRollup a partir do ledger com um GROUP BY por dia
+    em cada tabela (principal e arquivo), somando as chaves presentes nas duas.
+    """
+
+    help = 'Reconstrói os totais diários de movimentações (MovementDailyRollup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            default=None,
+            help='Reconstrói apenas a partir desta data (AAAA-MM-DD); padrão: tudo'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Linhas de resumo inseridas por lote (padrão: 1000)'
+        )
+
+    KEY = itemgetter('day', 'product_id', 'movement_type')
+
+    def grouped_rows(self, since, chunk_size):
+        """
+        Totais por (dia, produto, tipo) das duas tabelas: os dois GROUP BY saem
+        na mesma ordem e são intercalados, somando as chaves repetidas (dia
+        dividido pelo arquivamento), sem guardar os resultados em memória.
+        """
+        streams = []
+        for model in (StockMovement, ArchivedStockMovement):
+            movements = model.objects.annotate(day=TruncDate('created_at'))
+            if since:
+                movements = movements.filter(day__gte=since)
+            grouped = movements.order_by().values('day', 'product_id', 'movement_type').annotate(
+                movement_count=Count('id'),
+                quantity_sum=Sum('quantity'),
+            ).order_by('day', 'product_id', 'movement_type')
+            streams.append(grouped.iterator(chunk_size=chunk_size))
+
+        for (day, product_id, movement_type), rows in groupby(heapq.merge(*streams, key=self.KEY), key=self.KEY):
+            rows = list(rows)
+            yield {
+                'day': day, 'product_id': product_id, 'movement_type': movement_type,
+                'movement_count': sum(row['movement_count'] for row in rows),
+                'quantity_sum': sum(row['quantity_sum'] for row in rows),
+            }
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Data inválida em --since (use AAAA-MM-DD).')
+
+        rollups = MovementDailyRollup.objects.all()
+        if since:
+            rollups = rollups.filter(day__gte=since)
+        with transaction.atomic():
+            removed, _ = rollups.delete()
+            self.stdout.write(f'🗑️  {removed} resumo(s) removido(s)')
+
+            batch, created = [], 0
+            for row in self.grouped_rows(since, options['batch_size']):
+                batch.append(MovementDailyRollup(**row))
+                if len(batch) >= options['batch_size']:
+                    MovementDailyRollup.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                MovementDailyRollup.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {created} resumo(s) diário(s) gerado(s)'))
@@ -0,0 +1,115 @@
+"""
+Management command para medir a ingestão em lote contra o formulário de movimentação.
+Uso: python manage.py benchmark_ingest [opções]
+
+Todos os dados criados são descartados ao final (rollback da transação).
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from apps.inventory.models import StockMovement
+from apps.products.models import Product, Category
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Compara movimentações/segundo entre o loop de POSTs no MovementCreateView
+    e um único POST na API de lote.
+    """
+
+    help = 'Benchmark: ingestão em lote vs. formulário de movimentação (dados descartados ao final)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--movements',
+            type=int,
+            default=500,
+            help='Quantidade de movimentações por cenário (padrão: 500)'
+        )
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=50,
+            help='Quantidade de produtos envolvidos (padrão: 50)'
+        )
+
+    def build_rows(self, products, total):
+        """Gera entradas e saídas alternadas distribuídas entre os produtos"""
+        rows = []
+        for i in range(total):
+            product = products[i % len(products)]
+            movement_type = StockMovement.IN if i % 3 else StockMovement.OUT
+            rows.append({
+                'product': product.pk,
+                'movement_type': movement_type,
+                'quantity': 5 if movement_type == StockMovement.IN else 1,
+                'reason': 'Benchmark',
+            })
+        return rows
+
+    @override_settings(ALLOWED_HOSTS=['*'])
+    def handle(self, *args, **options):
+        total = options['movements']
+        products_count = options['products']
+
+        with transaction.atomic():
+            user = User.objects.create_superuser('benchmark_ingest', password=None)
+            user.profile.role = 'ADMIN'
+            user.profile.save()
+            category = Category.objects.create(name='Benchmark ingestão')
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f'Produto benchmark {i}',
+                    sku=f'BENCH-INGEST-{i:05d}',
+                    category=category,
+                    price=10,
+                    stock_quantity=1000,
+                )
+                for i in range(products_count)
+            ])
+
+            client = Client()
+            client.force_login(user)
+            rows = self.build_rows(products, total)
+
+            # Cenário 1: um POST do formulário por movimentação
+            form_url = reverse('inventory:movement_create')
+            before = StockMovement.objects.count()
+            started = time.perf_counter()
+            for row in rows:
+                client.post(form_url, row)
+            form_elapsed = time.perf_counter() - started
+            form_created = StockMovement.objects.count() - before
+
+            # Cenário 2: um único POST com o lote inteiro
+            batch_url = reverse('inventory:movement_batch_create')
+            started = time.perf_counter()
+            response = client.post(
+                batch_url,
+                data=json.dumps({'movements': rows}),
+                content_type='application/json'
+            )
+            batch_elapsed = time.perf_counter() - started
+
+            created = response.json().get('created', 0)
+            form_rate = form_created / form_elapsed
+            batch_rate = created / batch_elapsed if batch_elapsed else 0
+
+            self.stdout.write(
+                f'\n📊 {total} movimentações em {products_count} produtos\n'
+                f'   Formulário (loop): {form_elapsed:8.3f}s  {form_rate:10.0f} mov/s ({form_created} criadas)\n'
+                f'   API em lote:       {batch_elapsed:8.3f}s  {batch_rate:10.0f} mov/s ({created} criadas)\n'
+            )
+            self.stdout.write(self.style.SUCCESS(f'   Ganho: {batch_rate / form_rate:.1f}x\n'))
+
+            # Descarta tudo que foi criado durante o benchmark
+            transaction.set_rollback(True)
@@ -0,0 +1,101 @@
+"""
+Management command de benchmark da paginação de movimentações.
+Uso: python manage.py benchmark_pagination [opções]
+
+Cria movimentações sintéticas (padrão: 300 mil) dentro de uma transação e
+compara, na primeira e em uma página profunda (padrão: 10.000), a paginação
+por OFFSET (Paginator do Django, com COUNT) e a paginação por cursor
+(KeysetPaginator). Os dados são descartados ao final (rollback).
+"""
+
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils import timezone
+
+from apps.inventory.models import StockMovement
+from apps.inventory.pagination import KeysetPaginator, encode_cursor
+from apps.products.models import Product, Category
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Compara OFFSET e cursor na lista de movimentações.
+    """
+
+    help = 'Benchmark da paginação de movimentações: OFFSET vs. cursor (keyset)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=300_000, help='Movimentações geradas (padrão: 300000)')
+        parser.add_argument('--page', type=int, default=10_000, help='Página profunda medida (padrão: 10000)')
+        parser.add_argument('--page-size', type=int, default=20, help='Itens por página (padrão: 20)')
+        parser.add_argument('--repeat', type=int, default=5, help='Execuções de cada leitura (padrão: 5)')
+
+    def create_data(self, rows):
+        user = User.objects.create_user('benchmark_pagination')
+        category = Category.objects.create(name='Benchmark paginação')
+        product = Product.objects.create(
+            name='Produto benchmark', sku='BENCH-PAG-000001', category=category, price=10, stock_quantity=0
+        )
+
+        now = timezone.now()
+        for start in range(0, rows, 10_000):
+            movements = StockMovement.objects.bulk_create(
+                [
+                    StockMovement(product=product, movement_type=StockMovement.IN, quantity=1, user=user)
+                    for _ in range(start, min(start + 10_000, rows))
+                ],
+                batch_size=2000,
+            )
+            # created_at é auto_now_add: espalha as datas em grupos de 100 (um minuto por grupo)
+            for offset in range(0, len(movements), 100):
+                group = movements[offset:offset + 100]
+                StockMovement.objects.filter(pk__gte=group[0].pk, pk__lte=group[-1].pk).update(
+                    created_at=now - timedelta(minutes=(start + offset) // 100)
+                )
+            self.stdout.write(f'   ⏳ {min(start + 10_000, rows):,} movimentações')
+
+    def measure(self, label, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = run()
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(f'   {label:<34}{min(timings) * 1000:>10.2f} ms{rows:>10}')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        page_size = options['page_size']
+        repeat = max(1, options['repeat'])
+        deep = min(options['page'], max(1, rows // page_size))
+
+        with transaction.atomic():
+            self.stdout.write(f'⏳ Gerando {rows:,} movimentações...')
+            self.create_data(rows)
+
+            queryset = StockMovement.objects.select_related('product', 'user').order_by('-created_at', '-id')
+            # Cursor da última linha da página anterior à profunda (o que o link "Próxima" levaria na URL)
+            after = encode_cursor(queryset[(deep - 1) * page_size - 1]) if deep > 1 else None
+
+            def offset_page(number):
+                return lambda: len(Paginator(queryset, page_size).page(number).object_list)
+
+            def keyset_page(cursor):
+                return lambda: len(KeysetPaginator(queryset, page_size).page(after=cursor))
+
+            self.stdout.write(f'\n📊 Paginação de {rows:,} movimentações ({page_size} por página)\n')
+            self.stdout.write(f'   {"Leitura":<34}{"Tempo":>13}{"Linhas":>10}')
+            self.measure('OFFSET + COUNT, página 1', offset_page(1), repeat)
+            self.measure(f'OFFSET + COUNT, página {deep:,}', offset_page(deep), repeat)
+            self.measure('Cursor, página 1', keyset_page(None), repeat)
+            self.measure(f'Cursor, página {deep:,}', keyset_page(after), repeat)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (dados descartados)\n'))
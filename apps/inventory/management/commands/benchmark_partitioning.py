@@ -0,0 +1,159 @@
+"""
+Management command de benchmark: relatórios por período em tabela única x
+tabela particionada por mês (somente PostgreSQL).
+Uso: python manage.py benchmark_partitioning [opções]
+
+Cria duas tabelas temporárias com o mesmo volume de movimentações sintéticas
+(padrão: 10 milhões de linhas distribuídas em 24 meses), mede a latência das
+consultas do relatório de movimentações para um período e mostra quantas
+partições o plano lê. As tabelas são removidas ao final.
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.inventory.partitioning import add_months
+
+
+FLAT = 'bench_movement_flat'
+PARTITIONED = 'bench_movement_part'
+
+COLUMNS = """
+    id bigint NOT NULL,
+    product_id bigint NOT NULL,
+    movement_type varchar(3) NOT NULL,
+    quantity integer NOT NULL,
+    created_at timestamptz NOT NULL
+"""
+
+# Consultas equivalentes às do relatório: totais por tipo e primeira página
+QUERIES = {
+    'Totais por tipo': (
+        "SELECT movement_type, count(*), sum(quantity) FROM {table} "
+        "WHERE created_at >= %s AND created_at < %s GROUP BY movement_type"
+    ),
+    'Primeira página (50)': (
+        "SELECT id, product_id, movement_type, quantity, created_at FROM {table} "
+        "WHERE created_at >= %s AND created_at < %s ORDER BY created_at DESC LIMIT 50"
+    ),
+    'Total por produto': (
+        "SELECT product_id, sum(quantity) FROM {table} "
+        "WHERE created_at >= %s AND created_at < %s GROUP BY product_id ORDER BY 2 DESC LIMIT 10"
+    ),
+}
+
+
+class Command(BaseCommand):
+    """
+    Compara latência de consultas por período com e sem particionamento.
+    """
+
+    help = 'Benchmark de relatórios por período: tabela única x particionada por mês (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000, help='Linhas geradas (padrão: 10000000)')
+        parser.add_argument('--months', type=int, default=24, help='Meses cobertos pelos dados (padrão: 24)')
+        parser.add_argument('--repeat', type=int, default=5, help='Execuções por consulta (padrão: 5)')
+
+    def time_query(self, cursor, sql, params, repeat):
+        """Retorna a mediana, em ms, de `repeat` execuções (após um aquecimento)"""
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
+
+    def create_tables(self, cursor, rows, first_month, months):
+        end = add_months(first_month, months)
+        cursor.execute(f"CREATE TABLE {FLAT} ({COLUMNS})")
+        cursor.execute(f"CREATE TABLE {PARTITIONED} ({COLUMNS}) PARTITION BY RANGE (created_at)")
+
+        month = first_month
+        while month < end:
+            cursor.execute(
+                f"CREATE TABLE {PARTITIONED}_p{month:%Y_%m} PARTITION OF {PARTITIONED} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [month.isoformat(), add_months(month, 1).isoformat()],
+            )
+            month = add_months(month, 1)
+
+        self.stdout.write(f'⏳ Gerando {rows:,} movimentações em {months} meses...')
+        cursor.execute(
+            f"""
+            INSERT INTO {FLAT}
+            SELECT g,
+                   1 + (g % 2000),
+                   (ARRAY['IN', 'OUT', 'ADJ'])[1 + (g % 3)],
+                   1 + (g % 50),
+                   %s::timestamptz + (g::float8 / %s) * (%s::timestamptz - %s::timestamptz)
+            FROM generate_series(1, %s) AS g
+            """,
+            [first_month, rows, end, first_month, rows],
+        )
+        cursor.execute(f"INSERT INTO {PARTITIONED} SELECT * FROM {FLAT}")
+
+        # Mesmos índices do modelo (created_at e product+created_at)
+        for table in (FLAT, PARTITIONED):
+            cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+            cursor.execute(f"CREATE INDEX {table}_created_idx ON {table} (created_at DESC)")
+            cursor.execute(f"CREATE INDEX {table}_product_idx ON {table} (product_id, created_at DESC)")
+            cursor.execute(f"ANALYZE {table}")
+
+    def drop_tables(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {FLAT}")
+        cursor.execute(f"DROP TABLE IF EXISTS {PARTITIONED}")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  Benchmark disponível apenas no PostgreSQL (banco atual: {connection.vendor})')
+            )
+            return
+
+        rows = options['rows']
+        months = max(2, options['months'])
+        repeat = max(1, options['repeat'])
+        today = date.today()
+        first_month = add_months(date(today.year, today.month, 1), -(months - 1))
+
+        # Período do relatório: o último mês completo
+        start = add_months(first_month, months - 2)
+        end = add_months(start, 1)
+        params = [start, end]
+
+        with connection.cursor() as cursor:
+            self.drop_tables(cursor)
+            try:
+                self.create_tables(cursor, rows, first_month, months)
+
+                self.stdout.write(f'\n📊 Período consultado: {start} a {end} ({rows:,} linhas no total)\n')
+                self.stdout.write(f'   {"Consulta":<24}{"Tabela única":>16}{"Particionada":>16}{"Ganho":>10}')
+                for label, sql in QUERIES.items():
+                    flat = self.time_query(cursor, sql.format(table=FLAT), params, repeat)
+                    part = self.time_query(cursor, sql.format(table=PARTITIONED), params, repeat)
+                    self.stdout.write(f'   {label:<24}{flat:>13.1f} ms{part:>13.1f} ms{flat / part:>9.1f}x')
+
+                # Confere o partition pruning no plano
+                cursor.execute(
+                    f"EXPLAIN (COSTS OFF) {QUERIES['Totais por tipo'].format(table=PARTITIONED)}", params
+                )
+                plan = [row[0] for row in cursor.fetchall()]
+                scanned = sorted({
+                    word for line in plan for word in line.split() if word.startswith(f'{PARTITIONED}_p')
+                })
+                self.stdout.write(f'\n🔎 Partições lidas: {len(scanned)} de {months} ({", ".join(scanned)})')
+
+                if len(scanned) == 1:
+                    self.stdout.write(self.style.SUCCESS('\n✅ Partition pruning ativo\n'))
+                else:
+                    self.stdout.write(self.style.WARNING('\n⚠️  Plano leu mais de uma partição\n'))
+            finally:
+                self.drop_tables(cursor)
@@ -4,12 +4,15 @@ Uso: python manage.py create_movements [opções]
 """
 
 from django.core.management.base import BaseCommand
+from django.core.cache import cache
 from django.db import transaction
 from django.db.models import F
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from faker import Faker
-from apps.inventory.models import StockMovement
+from apps.inventory.models import StockMovement, ArchivedStockMovement, MovementDailyRollup, StockOpeningBalance
+from apps.inventory.archive import ARCHIVED_UNTIL_CACHE_KEY
+from apps.inventory.services import on_movements_created
 from apps.products.models import Product
 from datetime import timedelta
 import random
@@ -119,16 +122,7 @@ class Command(BaseCommand):
         """
         Atualiza o estoque do produto baseado na movimentação.
         """
-        if movement_type == 'IN':
-            product.stock_quantity += quantity
-        elif movement_type == 'OUT':
-            product.stock_quantity = max(0, product.stock_quantity - quantity)
-        else:  # ADJ
-            if quantity > 0:
-                product.stock_quantity += quantity
-            else:
-                product.stock_quantity = max(0, product.stock_quantity + quantity)
-        
+        product.stock_quantity += StockMovement.signed(movement_type, quantity)
         product.save(update_fields=['stock_quantity'])
     
     def handle(self, *args, **options):
@@ -191,6 +185,10 @@ class Command(BaseCommand):
             
             if movements_count > 0:
                 StockMovement.objects.all().delete()
+                MovementDailyRollup.objects.all().delete()
+                ArchivedStockMovement.objects.all().delete()
+                cache.delete(ARCHIVED_UNTIL_CACHE_KEY)
+                StockOpeningBalance.objects.all().delete()
                 self.stdout.write(
                     self.style.WARNING(f'   ✅ Removidas {movements_count} movimentações')
                 )
@@ -240,9 +238,17 @@ class Command(BaseCommand):
             # Gerar quantidade
             quantity_value = self.generate_quantity(fake, movement_type)
             
-            # Para ajustes negativos, garantir que é negativo
-            if movement_type == 'ADJ' and quantity_value < 0:
-                quantity_value = abs(quantity_value) * -1
+            # Nunca registra baixa maior que o saldo: a movimentação gravada deve
+            # explicar exatamente a variação do estoque (ver reconcile_stock)
+            if update_stock and StockMovement.signed(movement_type, quantity_value) < 0:
+                available = product.stock_quantity
+                if available == 0:
+                    movement_type = 'IN'
+                    quantity_value = self.generate_quantity(fake, movement_type)
+                elif movement_type == 'OUT':
+                    quantity_value = min(quantity_value, available)
+                else:  # ADJ negativo
+                    quantity_value = max(quantity_value, -available)
             
             # Gerar razão
             reason = fake.random_element(self.REASONS[movement_type])
@@ -254,7 +260,7 @@ class Command(BaseCommand):
             movement = StockMovement(
                 product=product,
                 movement_type=movement_type,
-                quantity=abs(quantity_value),  # Django espera positivo
+                quantity=quantity_value,  # Saídas positivas; ajustes carregam o sinal
                 reason=reason,
                 user=user,
                 created_at=created_at
@@ -280,6 +286,7 @@ class Command(BaseCommand):
                         movements_list,
                         batch_size=100
                     )
+                    on_movements_created(movements_list)
                     
                     self.stdout.write(
                         self.style.SUCCESS(
@@ -0,0 +1,71 @@
+"""
+Management command para manter as partições mensais de movimentações.
+Uso: python manage.py movement_partitions [opções]
+
+Cria as partições do mês atual até alguns meses à frente (agendar via cron,
+uma vez por mês). Com --convert, converte uma tabela ainda não particionada.
+Somente PostgreSQL; no SQLite apenas informa que não há o que fazer.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.inventory import partitioning
+
+
+class Command(BaseCommand):
+    """
+    Comando de manutenção das partições de StockMovement.
+    """
+
+    help = 'Cria partições mensais futuras da tabela de movimentações (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Meses à frente com partição garantida (padrão: 3)'
+        )
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Cria partições a partir deste mês (AAAA-MM-DD), ex.: para cargas retroativas'
+        )
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Converte a tabela em particionada, se ainda não for (bloqueia a tabela durante a cópia)'
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  Particionamento disponível apenas no PostgreSQL (banco atual: {connection.vendor})')
+            )
+            return
+
+        months_ahead = options['months_ahead']
+        if months_ahead < 0:
+            raise CommandError('--months-ahead deve ser maior ou igual a zero')
+
+        if options['convert']:
+            self.stdout.write('🔄 Convertendo a tabela de movimentações...')
+            if partitioning.convert_to_partitioned(months_ahead=months_ahead):
+                self.stdout.write(self.style.SUCCESS('   ✅ Tabela convertida'))
+            else:
+                self.stdout.write('   Tabela já era particionada')
+
+        with connection.cursor() as cursor:
+            if not partitioning.is_partitioned(cursor):
+                raise CommandError(
+                    'A tabela de movimentações não é particionada. Use --convert ou '
+                    'STOCK_MOVEMENT_PARTITIONING=True antes de migrar.'
+                )
+
+        created = partitioning.ensure_partitions(months_ahead=months_ahead, since=options['since'])
+        for name in created:
+            self.stdout.write(f'   ➕ {name}')
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {len(created)} partição(ões) criada(s)\n'))
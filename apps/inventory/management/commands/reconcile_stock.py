@@ -0,0 +1,266 @@
+"""
+Management command para reconciliar o saldo em cache dos produtos com o ledger.
+Uso: python manage.py reconcile_stock [opções]
+
+`Product.stock_quantity` é um saldo em cache; a fonte da verdade é a soma das
+movimentações (StockMovement e as arquivadas em ArchivedStockMovement). O comando
+lê apenas as movimentações novas desde a última execução (marca d'água = último
+id processado), em blocos por faixa de id, somando a variação líquida por produto com um GROUP BY por bloco. Os saldos
+acumulados ficam em StockLedgerBalance e são comparados com o saldo em cache.
+
+A marca d'água só avança sobre movimentações criadas há mais de --margin
+segundos: no PostgreSQL um id menor pode ficar visível depois de um maior
+(transação confirmada mais tarde) e seria pulado para sempre. As
+movimentações mais novas que a marca d'água entram só na comparação.
+
+Todos os produtos são comparados (saldo do ledger 0 para os que não têm
+movimentações). O saldo definido direto no produto (cadastro, edição,
+create_products) entra no ledger como ajuste (ver
+`services.record_stock_adjustment`). Produtos cadastrados antes disso
+(`opening_in_ledger` falso) não têm o saldo inicial no ledger: --fix não os
+corrige (destruiria estoque real); --seed-opening registra a diferença deles
+como saldo inicial.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Q, Max, Min, Case, When, Value, IntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.inventory.services import on_movements_created
+from apps.inventory.signals import stock_changed
+from apps.inventory.models import StockMovement, ArchivedStockMovement, StockLedgerBalance, LedgerWatermark
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    """
+    Comando de reconciliação incremental ledger x saldo.
+    """
+
+    help = 'Compara Product.stock_quantity com o ledger de movimentações (incremental, com marca d\'água)'
+
+    WATERMARK_NAME = 'reconcile_stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Corrige o saldo dos produtos divergentes para o saldo do ledger'
+        )
+        parser.add_argument(
+            '--seed-opening',
+            action='store_true',
+            help='Registra a diferença dos produtos sem saldo inicial no ledger como ajuste de abertura'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Descarta a marca d\'água e relê todo o ledger'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=50000,
+            help='Faixa de ids de movimentações lida por bloco (padrão: 50000)'
+        )
+        parser.add_argument(
+            '--margin',
+            type=int,
+            default=300,
+            help='Idade mínima (segundos) das movimentações que avançam a marca d\'água (padrão: 300)'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help='Quantidade de divergências listadas (padrão: 20)'
+        )
+
+    def read_ledger(self, start_id, end_id, chunk_size):
+        """
+        Lê as movimentações com id em (start_id, end_id] em blocos e
+        retorna a variação líquida por produto.
+        """
+        deltas = defaultdict(int)
+        chunk_start = start_id
+
+        while chunk_start < end_id:
+            chunk_end = min(chunk_start + chunk_size, end_id)
+            # Movimentações arquivadas mantêm o id original e continuam no ledger
+            for model in (StockMovement, ArchivedStockMovement):
+                rows = model.objects.filter(
+                    id__gt=chunk_start, id__lte=chunk_end
+                ).net_by_product()
+
+                for row in rows:
+                    deltas[row['product_id']] += row['net_quantity']
+
+            self.stdout.write(f'   ⏳ Ledger lido até #{chunk_end}')
+            chunk_start = chunk_end
+
+        return deltas
+
+    def pending_deltas(self, end_id):
+        """Variação líquida por produto das movimentações visíveis após a marca d'água"""
+        deltas = defaultdict(int)
+        for model in (StockMovement, ArchivedStockMovement):
+            for row in model.objects.filter(id__gt=end_id).net_by_product():
+                deltas[row['product_id']] += row['net_quantity']
+        return deltas
+
+    def store_balances(self, deltas):
+        """Acumula as variações lidas nos saldos do ledger por produto"""
+        existing = set(
+            StockLedgerBalance.objects.filter(product_id__in=deltas).values_list('product_id', flat=True)
+        )
+
+        StockLedgerBalance.objects.bulk_create(
+            [StockLedgerBalance(product_id=pk, quantity=delta) for pk, delta in deltas.items() if pk not in existing],
+            batch_size=1000,
+        )
+
+        to_update = [(pk, delta) for pk, delta in deltas.items() if pk in existing and delta]
+        for i in range(0, len(to_update), 500):
+            chunk = to_update[i:i + 500]
+            StockLedgerBalance.objects.filter(product_id__in=[pk for pk, _ in chunk]).update(
+                quantity=F('quantity') + Case(
+                    *[When(product_id=pk, then=Value(delta)) for pk, delta in chunk],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+
+        with transaction.atomic():
+            watermark, _ = LedgerWatermark.objects.select_for_update().get_or_create(name=self.WATERMARK_NAME)
+
+            if options['full']:
+                self.stdout.write('🔄 Reprocessando todo o ledger...')
+                StockLedgerBalance.objects.all().delete()
+                watermark.last_movement_id = 0
+
+            # Fim da leitura: só movimentações com idade suficiente para que
+            # nenhum id menor ainda esteja em uma transação aberta
+            cutoff = timezone.now() - timedelta(seconds=max(0, options['margin']))
+            start_id = watermark.last_movement_id
+            last = max(
+                StockMovement.objects.aggregate(last=Max('id'))['last'] or 0,
+                ArchivedStockMovement.objects.aggregate(last=Max('id'))['last'] or 0,
+            )
+            # Primeira movimentação recente (faixa curta do índice de created_at)
+            recent = StockMovement.objects.filter(created_at__gt=cutoff).aggregate(first=Min('id'))['first']
+            end_id = max(start_id, min(last, recent - 1) if recent else last)
+
+            if end_id > start_id:
+                self.stdout.write(f'📒 Lendo movimentações #{start_id + 1} a #{end_id}...')
+                deltas = self.read_ledger(start_id, end_id, chunk_size)
+                self.store_balances(deltas)
+                watermark.last_movement_id = end_id
+                self.stdout.write(f'   ✅ {len(deltas)} produto(s) com movimentações novas')
+            else:
+                self.stdout.write('📒 Nenhuma movimentação nova desde a última execução.')
+
+            watermark.save()
+
+            # Compara o saldo em cache de cada produto com o saldo do ledger
+            # (0 sem movimentações) mais as movimentações posteriores à marca d'água
+            pending = self.pending_deltas(watermark.last_movement_id)
+            candidates = (
+                Product.objects.annotate(ledger=Coalesce(F('ledger_balance__quantity'), 0))
+                .filter(~Q(stock_quantity=F('ledger')) | Q(pk__in=list(pending)))
+                .only('name', 'sku', 'stock_quantity', 'opening_in_ledger')
+                .order_by('name')
+            )
+            drifted = []
+            for product in candidates:
+                product.ledger += pending.get(product.pk, 0)
+                if product.ledger != product.stock_quantity:
+                    drifted.append(product)
+
+            if options['seed_opening']:
+                drifted = self.seed_opening(drifted)
+
+            if not drifted:
+                self.stdout.write(self.style.SUCCESS('\n✅ Nenhuma divergência entre saldo e ledger\n'))
+                return
+
+            self.stdout.write(self.style.WARNING(f'\n⚠️  {len(drifted)} produto(s) com divergência:'))
+            for product in drifted[:options['show']]:
+                self.stdout.write(
+                    f'   {product.sku:<20} saldo {product.stock_quantity:>8}  '
+                    f'ledger {product.ledger:>8}  diferença {product.stock_quantity - product.ledger:>+8}'
+                    + ('' if product.opening_in_ledger else '  (sem saldo inicial no ledger)')
+                )
+            if len(drifted) > options['show']:
+                self.stdout.write(f'   ... e mais {len(drifted) - options["show"]} produto(s)')
+
+            if not options['fix']:
+                self.stdout.write('\nUse --fix para corrigir os saldos.\n')
+                return
+
+            # Sem o saldo inicial no ledger, a diferença pode ser estoque real
+            legacy = [p for p in drifted if not p.opening_in_ledger]
+            # Corrige de forma relativa (saldo - diferença lida), preservando
+            # movimentações gravadas depois da leitura do ledger
+            fixable = [p for p in drifted if p.opening_in_ledger and p.ledger >= 0]
+            for i in range(0, len(fixable), 500):
+                chunk = fixable[i:i + 500]
+                Product.objects.filter(pk__in=[p.pk for p in chunk]).update(
+                    stock_quantity=F('stock_quantity') - Case(
+                        *[When(pk=p.pk, then=Value(p.stock_quantity - p.ledger)) for p in chunk],
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    )
+                )
+
+            if fixable:
+                stock_changed.send(sender=self.__class__, product_ids=[p.pk for p in fixable])
+
+            self.stdout.write(self.style.SUCCESS(f'\n✅ {len(fixable)} saldo(s) corrigido(s)'))
+            if legacy:
+                self.stdout.write(self.style.ERROR(
+                    f'❌ {len(legacy)} produto(s) sem saldo inicial no ledger não foram corrigidos: '
+                    f'confira o estoque e use --seed-opening para registrar a diferença como saldo inicial'
+                ))
+            manual = len(drifted) - len(fixable) - len(legacy)
+            if manual:
+                self.stdout.write(self.style.ERROR(
+                    f'❌ {manual} produto(s) com ledger negativo precisam de revisão manual\n'
+                ))
+
+    def seed_opening(self, drifted):
+        """
+        Registra como ajuste de abertura a diferença dos produtos sem saldo
+        inicial no ledger (atribuído ao primeiro superusuário) e os marca
+        como registrados. Retorna as divergências restantes.
+        """
+        user = get_user_model().objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('--seed-opening precisa de um superusuário para registrar os ajustes')
+
+        legacy = [p for p in drifted if not p.opening_in_ledger]
+        movements = StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    product=product, movement_type=StockMovement.ADJ,
+                    quantity=product.stock_quantity - product.ledger,
+                    user=user, reason='Saldo inicial (anterior ao ledger)',
+                )
+                for product in legacy
+            ],
+            batch_size=1000,
+        )
+        on_movements_created(movements)
+        # Os demais produtos sem a marca já conferem com o ledger
+        Product.objects.filter(opening_in_ledger=False).update(opening_in_ledger=True)
+
+        self.stdout.write(self.style.SUCCESS(f'🌱 {len(movements)} saldo(s) inicial(is) registrado(s) no ledger'))
+        return [p for p in drifted if p.opening_in_ledger]
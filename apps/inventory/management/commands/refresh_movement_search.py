@@ -0,0 +1,63 @@
+"""
+Management command para recalcular o documento de busca das movimentações.
+Uso: python manage.py refresh_movement_search [opções]
+
+`StockMovement.search_document` é montado na gravação e reescrito quando um
+produto ou usuário muda de nome (sinais). Rode este comando depois de
+alterações que não passam por esses pontos (UPDATE em lote de produtos ou
+usuários, importação direta no banco) ou com --check para contar os
+documentos desatualizados. A gravação é feita em lotes de ids, uma
+transação por lote.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from apps.inventory.models import StockMovement
+from apps.inventory.search import outdated_search_documents, refresh_search_documents
+
+
+class Command(BaseCommand):
+    """
+    Recalcula StockMovement.search_document a partir de produto, usuário e motivo.
+    """
+
+    help = 'Recalcula o documento de busca das movimentações (autocomplete)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Movimentações por transação (padrão: 10000)'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Apenas conta os documentos desatualizados, sem gravar'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            outdated = outdated_search_documents().count()
+            if outdated:
+                self.stdout.write(self.style.WARNING(f'⚠️  {outdated} documento(s) desatualizado(s)'))
+            else:
+                self.stdout.write(self.style.SUCCESS('✅ Documentos de busca conferem'))
+            return
+
+        bounds = StockMovement.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write('ℹ️  Nenhuma movimentação')
+            return
+
+        batch_size = max(1, options['batch_size'])
+        updated = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            with transaction.atomic():
+                updated += refresh_search_documents(
+                    StockMovement.objects.filter(id__gte=start, id__lt=start + batch_size)
+                )
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {updated} documento(s) de busca recalculado(s)'))
@@ -0,0 +1,58 @@
+"""
+Management command para recalcular os totais de linhas mantidos (TableRowCount).
+Uso: python manage.py refresh_row_counts [opções]
+
+Os totais são mantidos de forma incremental pelos sinais de Product/Supplier,
+por `on_movements_created` e pelo arquivamento, e usados como contagem
+estimada fora do PostgreSQL. Rode este comando depois de cargas que não
+passam por esses pontos (bulk_create, importação direta no banco) ou com
+--check para conferir a diferença em relação ao COUNT(*).
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.inventory.counts import refresh_row_counts, uses_planner_statistics
+from apps.inventory.models import TableRowCount
+
+
+class Command(BaseCommand):
+    """
+    Recalcula TableRowCount com COUNT(*) nas tabelas contadas.
+    """
+
+    help = 'Recalcula os totais de linhas usados nas contagens estimadas (TableRowCount)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Apenas compara os totais mantidos com o COUNT(*), sem gravar'
+        )
+
+    def handle(self, *args, **options):
+        if uses_planner_statistics():
+            self.stdout.write('ℹ️  PostgreSQL: as estimativas vêm das estatísticas do planejador (ANALYZE)')
+
+        with transaction.atomic():
+            before = dict(TableRowCount.objects.values_list('table', 'rows'))
+            totals = refresh_row_counts()
+
+            for table, rows in totals.items():
+                if before.get(table) != rows:
+                    self.stdout.write(f'   ⚠️  {table}: {before.get(table, "-")} → {rows}')
+            differences = [table for table, rows in totals.items() if before.get(table) != rows]
+
+            if options['check']:
+                transaction.set_rollback(True)
+
+        if options['check']:
+            if differences:
+                self.stdout.write(self.style.WARNING(f'\n⚠️  {len(differences)} tabela(s) divergente(s)'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ Totais conferem ({len(totals)} tabelas)'))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Totais recalculados: {len(totals)} tabelas ({len(differences)} corrigida(s))')
+        )
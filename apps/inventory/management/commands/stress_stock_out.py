@@ -0,0 +1,138 @@
+"""
+Management command de estresse para saídas concorrentes nos mesmos SKUs.
+Uso: python manage.py stress_stock_out [opções]
+
+Várias threads disputam a baixa de estoque de poucos produtos ("SKUs quentes")
+usando `decrement_stock`. Ao final, verifica se houve venda acima do saldo
+(oversell) e mostra a vazão por SKU. Os dados criados são removidos ao final.
+"""
+
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction, OperationalError
+
+from apps.inventory.models import StockMovement
+from apps.inventory.services import decrement_stock
+from apps.products.models import Product, Category
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Mede vazão e confere ausência de oversell da baixa condicional de estoque.
+    """
+
+    help = 'Teste de estresse multi-thread para saídas concorrentes (baixa condicional de estoque)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Threads concorrentes (padrão: 8)')
+        parser.add_argument('--skus', type=int, default=1, help='Quantidade de SKUs quentes (padrão: 1)')
+        parser.add_argument('--stock', type=int, default=500, help='Saldo inicial por SKU (padrão: 500)')
+        parser.add_argument('--attempts', type=int, default=200, help='Tentativas de saída por thread (padrão: 200)')
+        parser.add_argument(
+            '--strategy',
+            choices=['conditional', 'select_for_update'],
+            default='conditional',
+            help='Estratégia de baixa (padrão: conditional)'
+        )
+
+    def worker(self, products, user, attempts, strategy, stats, lock):
+        """Tenta registrar `attempts` saídas de 1 unidade, alternando entre os SKUs"""
+        local = Counter()
+        try:
+            for i in range(attempts):
+                product = products[i % len(products)]
+                while True:
+                    try:
+                        with transaction.atomic():
+                            if decrement_stock(product.pk, 1, strategy=strategy):
+                                StockMovement.objects.create(
+                                    product=product,
+                                    movement_type=StockMovement.OUT,
+                                    quantity=1,
+                                    reason='Estresse',
+                                    user=user,
+                                )
+                                local[(product.pk, 'ok')] += 1
+                            else:
+                                local[(product.pk, 'rejected')] += 1
+                        break
+                    except OperationalError:
+                        # SQLite: "database is locked" sob escrita concorrente
+                        local['retries'] += 1
+        finally:
+            connection.close()
+            with lock:
+                stats.update(local)
+
+    def handle(self, *args, **options):
+        threads_count = options['threads']
+        stock = options['stock']
+        attempts = options['attempts']
+        strategy = options['strategy']
+
+        user = User.objects.create_user('stress_stock_out')
+        category = Category.objects.create(name='Estresse saídas')
+        products = [
+            Product.objects.create(
+                name=f'SKU quente {i}',
+                sku=f'STRESS-OUT-{i:03d}',
+                category=category,
+                price=1,
+                stock_quantity=stock,
+            )
+            for i in range(options['skus'])
+        ]
+
+        stats = Counter()
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self.worker, args=(products, user, attempts, strategy, stats, lock))
+            for _ in range(threads_count)
+        ]
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            self.stdout.write(
+                f'\n📊 {threads_count} threads x {attempts} tentativas, '
+                f'{len(products)} SKU(s) com saldo {stock}, estratégia "{strategy}" ({connection.vendor})\n'
+            )
+
+            problems = 0
+            for product in products:
+                product.refresh_from_db()
+                sold = stats[(product.pk, 'ok')]
+                rejected = stats[(product.pk, 'rejected')]
+                recorded = StockMovement.objects.filter(product=product).count()
+                # Oversell: mais baixas do que saldo, ou saldo/ledger divergentes
+                if sold > stock or product.stock_quantity != stock - sold or recorded != sold:
+                    problems += 1
+
+                self.stdout.write(
+                    f'   {product.sku}: {sold} baixas, {rejected} recusas, saldo final {product.stock_quantity}, '
+                    f'{recorded} movimentações | {(sold + rejected) / elapsed:,.0f} tentativas/s, '
+                    f'{sold / elapsed:,.0f} baixas/s'
+                )
+
+            self.stdout.write(f'   Retentativas por bloqueio: {stats["retries"]} | Tempo total: {elapsed:.2f}s')
+
+            if problems:
+                self.stdout.write(self.style.ERROR(f'\n❌ Oversell ou divergência em {problems} SKU(s)\n'))
+            else:
+                self.stdout.write(self.style.SUCCESS('\n✅ Nenhum oversell\n'))
+        finally:
+            StockMovement.objects.filter(product__in=products).delete()
+            Product.objects.filter(pk__in=[p.pk for p in products]).delete()
+            category.delete()
+            user.delete()
@@ -0,0 +1,92 @@
+"""
+Métricas da aplicação no formato de texto do Prometheus, em GET /metrics/.
+
+Os contadores ficam no cache do Django, uma chave por série: com o Redis de
+produção somam todos os processos e servidores; com o LocMem
+(desenvolvimento) valem por processo. Os valores possíveis de cada rótulo
+são declarados no registro, para que a exportação encontre as séries sem
+listar o cache.
+
+Acesso: superusuário logado ou cabeçalho `Authorization: Bearer
+<METRICS_TOKEN>` (coleta pelo Prometheus). Sem METRICS_TOKEN, só o
+superusuário.
+"""
+
+import itertools
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+
+registry = []
+
+
+class Counter:
+    """Contador com rótulos de valores fixos (`labels`: nome → valores possíveis)"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, **labels):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.series = list(itertools.product(*labels.values()))
+        registry.append(self)
+
+    def key(self, values):
+        return ':'.join(('metrics', self.name, *values))
+
+    def inc(self, **labels):
+        key = self.key(tuple(labels[name] for name in self.label_names))
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Primeira ocorrência (ou chave descartada pelo cache)
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+
+    def values(self):
+        """Valor atual de cada série: {(valor do rótulo, ...): contagem}"""
+        found = cache.get_many([self.key(values) for values in self.series])
+        return {values: found.get(self.key(values), 0) for values in self.series}
+
+    def samples(self):
+        return self.values().items()
+
+
+class Gauge:
+    """Valor calculado na coleta por `function()`: {(valor do rótulo, ...): valor}"""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, function, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.label_names = tuple(label_names)
+        registry.append(self)
+
+    def samples(self):
+        return self.function().items()
+
+
+def render():
+    """Todas as métricas registradas, no formato de texto do Prometheus"""
+    lines = []
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for values, value in metric.samples():
+            labels = ','.join(f'{name}="{value}"' for name, value in zip(metric.label_names, values))
+            lines.append(f'{metric.name}{{{labels}}} {value}' if labels else f'{metric.name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_superuser or (token and constant_time_compare(authorization, f'Bearer {token}'))):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
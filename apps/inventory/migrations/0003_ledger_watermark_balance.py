@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_stockmovement_movement_created_idx_and_more'),
+        ('products', '0003_product_product_search_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "Marca d'água do Ledger",
+                'verbose_name_plural': "Marcas d'água do Ledger",
+            },
+        ),
+        migrations.CreateModel(
+            name='StockLedgerBalance',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_balance', serialize=False, to='products.product')),
+                ('quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo do Ledger',
+                'verbose_name_plural': 'Saldos do Ledger',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_ledger_watermark_balance'),
+        ('products', '0003_product_product_search_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('movement_type', models.CharField(choices=[('IN', 'Entrada'), ('OUT', 'Saída'), ('ADJ', 'Ajuste')], max_length=3)),
+                ('movement_count', models.PositiveIntegerField(default=0)),
+                ('quantity_sum', models.BigIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Movimentações',
+                'verbose_name_plural': 'Resumos Diários de Movimentações',
+                'indexes': [models.Index(fields=['day', 'movement_type'], name='rollup_day_type_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day', 'movement_type'), name='rollup_product_day_type_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Converte inventory_stockmovement em tabela particionada por mês (PostgreSQL).
+# Só age com STOCK_MOVEMENT_PARTITIONING=True; no SQLite é um no-op.
+
+from django.db import migrations
+
+from apps.inventory import partitioning
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_movementdailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(partitioning.convert_from_migration, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_partition_stockmovement'),
+        ('products', '0003_product_product_search_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockOpeningBalance',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='opening_balance', serialize=False, to='products.product')),
+                ('quantity', models.IntegerField(default=0)),
+                ('as_of', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo de Abertura',
+                'verbose_name_plural': 'Saldos de Abertura',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedStockMovement',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('movement_type', models.CharField(choices=[('IN', 'Entrada'), ('OUT', 'Saída'), ('ADJ', 'Ajuste')], max_length=3)),
+                ('quantity', models.IntegerField()),
+                ('reason', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_movements', to='products.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_stock_movements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimentação Arquivada',
+                'verbose_name_plural': 'Movimentações Arquivadas',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at'], name='archived_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:19
+
+from django.db import migrations, models
+
+
+COUNTED = [
+    ('inventory', 'StockMovement'),
+    ('inventory', 'ArchivedStockMovement'),
+    ('products', 'Product'),
+    ('suppliers', 'Supplier'),
+]
+
+
+def fill_row_counts(apps, schema_editor):
+    """Grava o total inicial de cada tabela contada (depois mantido pelas escritas)"""
+    TableRowCount = apps.get_model('inventory', 'TableRowCount')
+    TableRowCount.objects.bulk_create([
+        TableRowCount(table=model._meta.db_table, rows=model.objects.order_by().count())
+        for model in (apps.get_model(app_label, name) for app_label, name in COUNTED)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_archived_movements_opening_balance'),
+        ('products', '0004_categoryvaluation'),
+        ('suppliers', '0002_supplier_supplier_name_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableRowCount',
+            fields=[
+                ('table', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('rows', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contagem de Linhas',
+                'verbose_name_plural': 'Contagens de Linhas',
+            },
+        ),
+        migrations.RunPython(fill_row_counts, migrations.RunPython.noop),
+    ]
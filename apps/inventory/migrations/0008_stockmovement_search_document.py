@@ -0,0 +1,138 @@
+# Documento de busca desnormalizado das movimentações (ver apps/inventory/search.py):
+# coluna search_document preenchida a partir de produto, usuário e motivo e
+# indexada por trigramas. PostgreSQL: pg_trgm + GIN em UPPER(search_document).
+# SQLite: tabela virtual FTS5 (tokenizer trigram) mantida por triggers.
+
+import sqlite3
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Concat
+
+
+DOCUMENT_FIELDS = (
+    'product__name', 'product__sku',
+    'user__username', 'user__first_name', 'user__last_name',
+    'reason',
+)
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS movement_search_trgm_idx ON inventory_stockmovement "
+    "USING GIN (UPPER(search_document) gin_trgm_ops)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS movement_search_trgm_idx",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE inventory_stockmovement_fts USING fts5(
+        search_document,
+        content='inventory_stockmovement', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER inventory_stockmovement_fts_insert AFTER INSERT ON inventory_stockmovement BEGIN
+        INSERT INTO inventory_stockmovement_fts(rowid, search_document)
+        VALUES (new.id, new.search_document);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_stockmovement_fts_delete AFTER DELETE ON inventory_stockmovement BEGIN
+        INSERT INTO inventory_stockmovement_fts(inventory_stockmovement_fts, rowid, search_document)
+        VALUES ('delete', old.id, old.search_document);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_stockmovement_fts_update AFTER UPDATE OF search_document ON inventory_stockmovement BEGIN
+        INSERT INTO inventory_stockmovement_fts(inventory_stockmovement_fts, rowid, search_document)
+        VALUES ('delete', old.id, old.search_document);
+        INSERT INTO inventory_stockmovement_fts(rowid, search_document)
+        VALUES (new.id, new.search_document);
+    END
+    """,
+    "INSERT INTO inventory_stockmovement_fts(inventory_stockmovement_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS inventory_stockmovement_fts_insert",
+    "DROP TRIGGER IF EXISTS inventory_stockmovement_fts_delete",
+    "DROP TRIGGER IF EXISTS inventory_stockmovement_fts_update",
+    "DROP TABLE IF EXISTS inventory_stockmovement_fts",
+]
+
+
+def fill_search_documents(apps, schema_editor):
+    """Preenche o documento das movimentações existentes (um UPDATE)"""
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    parts = []
+    for field in DOCUMENT_FIELDS:
+        parts += [F(field), Value(' ')]
+    document = (
+        StockMovement.objects.filter(pk=OuterRef('pk'))
+        .annotate(document=Concat(*parts[:-1], output_field=TextField()))
+        .values('document')[:1]
+    )
+    StockMovement.objects.update(search_document=Subquery(document))
+
+
+def sqlite_has_fts5_trigram(schema_editor):
+    # Tokenizer trigram: SQLite 3.34+
+    if sqlite3.sqlite_version_info < (3, 34):
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run(schema_editor, POSTGRESQL_FORWARD)
+    elif vendor == 'sqlite' and sqlite_has_fts5_trigram(schema_editor):
+        run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run(schema_editor, POSTGRESQL_REVERSE)
+    elif vendor == 'sqlite':
+        run(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_table_row_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.CreateModel(
+            name='MovementSearchEntry',
+            fields=[
+                ('movement', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='inventory.stockmovement')),
+                ('document', models.TextField(db_column='inventory_stockmovement_fts')),
+            ],
+            options={
+                'db_table': 'inventory_stockmovement_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from apps.products.models import Product
 
@@ -6,6 +7,29 @@ User = get_user_model()
 
 # Create your models here.
 
+class StockMovementQuerySet(models.QuerySet):
+    def signed_quantity(self):
+        """Expressão da variação de estoque (saídas negativas) para agregações no banco"""
+        return models.Case(
+            models.When(movement_type=StockMovement.OUT, then=-models.F('quantity')),
+            default=models.F('quantity'),
+        )
+
+    def net_by_product(self):
+        """Soma a variação líquida de estoque por produto em um único GROUP BY"""
+        return self.order_by().values('product_id').annotate(
+            net_quantity=models.Sum(self.signed_quantity())
+        )
+
+
+class SearchableMovementQuerySet(StockMovementQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Monta o documento de busca antes de inserir (bulk_create não chama save())"""
+        objs = list(objs)
+        self.model.fill_search_documents(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class StockMovement(models.Model):
     IN = 'IN'
     OUT = 'OUT'
@@ -16,12 +40,25 @@ class StockMovement(models.Model):
         (ADJ, 'Ajuste'),
     ]
 
+    # Sinal aplicado à quantidade de cada tipo ao atualizar o estoque
+    # (ajustes carregam o próprio sinal na quantidade)
+    STOCK_SIGNS = {
+        IN: 1,
+        OUT: -1,
+        ADJ: 1,
+    }
+
     product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='movements')
     movement_type = models.CharField(max_length=3, choices=MOVEMENT_TYPES)
     quantity = models.IntegerField()
     reason = models.TextField(blank=True)
     user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='stock_movements')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Produto, SKU, usuário, nome completo e motivo em uma coluna indexada,
+    # para o autocomplete não juntar tabelas (ver apps.inventory.search)
+    search_document = models.TextField(blank=True, default='', editable=False)
+
+    objects = SearchableMovementQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Movimentação de Estoque"
@@ -33,9 +70,193 @@ class StockMovement(models.Model):
             models.Index(fields=['product', '-created_at'], name='movement_product_created_idx'),
         ]
     
+    @classmethod
+    def signed(cls, movement_type, quantity):
+        """Retorna a variação de estoque causada por uma movimentação"""
+        return cls.STOCK_SIGNS.get(movement_type, 1) * quantity
+
+    @property
+    def signed_quantity(self):
+        return self.signed(self.movement_type, self.quantity)
+
+    @classmethod
+    def fill_search_documents(cls, movements):
+        """Monta o documento de busca das movimentações (uma consulta por tabela relacionada não carregada)"""
+        from .search import fill_search_documents
+        fill_search_documents(movements)
+
+    def save(self, *args, **kwargs):
+        self.fill_search_documents([self])
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'search_document'}
+        super().save(*args, **kwargs)
+
     def get_movement_type_display(self):
         return dict(self.MOVEMENT_TYPES).get(self.movement_type, 'Desconhecido')
     
     def __str__(self):
         return f"{self.get_movement_type_display()} - {self.product} - {self.quantity}"
-    
\ No newline at end of file
+
+
+class MovementSearchEntry(models.Model):
+    """
+    Linha do índice de busca das movimentações no SQLite: tabela virtual
+    FTS5 (tokenizer trigram) sobre `search_document`, criada pela migração
+    0008 e mantida por triggers (ver `search.py`). Não é gerenciada pelo
+    Django e não existe no PostgreSQL, que indexa a própria coluna.
+    """
+    movement = models.OneToOneField(
+        StockMovement, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_entry',
+    )
+    # Coluna oculta com o nome da tabela: alvo do MATCH
+    document = models.TextField(db_column='inventory_stockmovement_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'inventory_stockmovement_fts'
+
+
+class MovementDailyRollupQuerySet(models.QuerySet):
+    def totals(self, **extra):
+        """Totais de movimentações (geral e por tipo) em uma única agregação (mais as colunas `extra`)"""
+        zero = models.Value(0)
+        return self.aggregate(
+            **extra,
+            total_movements=Coalesce(models.Sum('movement_count'), zero),
+            total_in=Coalesce(models.Sum('movement_count', filter=models.Q(movement_type=StockMovement.IN)), zero),
+            total_out=Coalesce(models.Sum('movement_count', filter=models.Q(movement_type=StockMovement.OUT)), zero),
+            total_adj=Coalesce(models.Sum('movement_count', filter=models.Q(movement_type=StockMovement.ADJ)), zero),
+        )
+
+
+class MovementDailyRollup(models.Model):
+    """
+    Totais diários de movimentações por produto e tipo, mantidos na mesma
+    transação de cada inserção (ver `services.record_rollups`). Relatórios e
+    dashboard leem os totais daqui em vez de contar a tabela de movimentações.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    movement_type = models.CharField(max_length=3, choices=StockMovement.MOVEMENT_TYPES)
+    movement_count = models.PositiveIntegerField(default=0)
+    quantity_sum = models.BigIntegerField(default=0)
+
+    objects = MovementDailyRollupQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Resumo Diário de Movimentações"
+        verbose_name_plural = "Resumos Diários de Movimentações"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day', 'movement_type'], name='rollup_product_day_type_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'movement_type'], name='rollup_day_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.product_id} - {self.movement_type}: {self.movement_count}"
+
+
+class LedgerWatermark(models.Model):
+    """
+    Marca d'água de processos incrementais sobre o ledger de movimentações:
+    guarda o último id de StockMovement já processado por cada processo.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_movement_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Marca d'água do Ledger"
+        verbose_name_plural = "Marcas d'água do Ledger"
+
+    def __str__(self):
+        return f"{self.name} (#{self.last_movement_id})"
+
+
+class StockLedgerBalance(models.Model):
+    """
+    Saldo do ledger por produto (soma das movimentações até a marca d'água
+    da reconciliação), comparado com o saldo em cache `Product.stock_quantity`.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='ledger_balance')
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Saldo do Ledger"
+        verbose_name_plural = "Saldos do Ledger"
+
+    def __str__(self):
+        return f"{self.product} - {self.quantity}"
+
+
+class ArchivedStockMovement(models.Model):
+    """
+    Movimentação antiga movida para fora da tabela principal (ver
+    `apps.inventory.archive`). Guarda o mesmo id e os mesmos dados da
+    movimentação original; relatórios e exportações leem daqui quando o
+    período consultado alcança o arquivo.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='archived_movements')
+    movement_type = models.CharField(max_length=3, choices=StockMovement.MOVEMENT_TYPES)
+    quantity = models.IntegerField()
+    reason = models.TextField(blank=True)
+    user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='archived_stock_movements')
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StockMovementQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Movimentação Arquivada"
+        verbose_name_plural = "Movimentações Arquivadas"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=['-created_at'], name='archived_created_idx'),
+        ]
+
+    @property
+    def signed_quantity(self):
+        return StockMovement.signed(self.movement_type, self.quantity)
+
+    def __str__(self):
+        return f"{self.get_movement_type_display()} - {self.product} - {self.quantity} (arquivada)"
+
+
+class StockOpeningBalance(models.Model):
+    """
+    Saldo de abertura por produto: soma das movimentações já arquivadas.
+    Saldo atual = saldo de abertura + movimentações da tabela principal.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='opening_balance')
+    quantity = models.IntegerField(default=0)
+    as_of = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Saldo de Abertura"
+        verbose_name_plural = "Saldos de Abertura"
+
+    def __str__(self):
+        return f"{self.product} - {self.quantity} em {self.as_of:%d/%m/%Y}"
+
+
+class TableRowCount(models.Model):
+    """
+    Total de linhas mantido por tabela (ver `apps.inventory.counts`), usado
+    como estimativa de contagem fora do PostgreSQL, onde não há estatísticas
+    do planejador: lido em uma consulta por chave em vez de COUNT(*).
+    """
+    table = models.CharField(max_length=100, primary_key=True)
+    rows = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Contagem de Linhas"
+        verbose_name_plural = "Contagens de Linhas"
+
+    def __str__(self):
+        return f"{self.table}: {self.rows}"
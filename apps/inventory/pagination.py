@@ -0,0 +1,226 @@
+"""
+Paginação por cursor (keyset) das listas de movimentações.
+
+Em vez de OFFSET, cada página continua a partir da última linha exibida:
+WHERE created_at <= c AND NOT (created_at = c AND id >= i)
+ORDER BY created_at DESC, id DESC LIMIT n + 1. A condição em `created_at`
+usa o índice `movement_created_idx` (e `archived_created_idx` no arquivo),
+então a página 10.000 custa o mesmo que a primeira. O total não é necessário
+para navegar: `paginator.count` só é calculado se a página o pedir.
+
+Os cursores (`after` / `before`) vão na URL, codificados em base64.
+
+`EstimatedCountPaginator` é o paginador por número de página das demais
+listas: acima de `COUNT_ESTIMATE_THRESHOLD` linhas usa o total estimado
+(`counts.count_or_estimate`) e os templates exibem "cerca de N".
+"""
+
+import base64
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.utils.functional import cached_property
+
+from .archive import ReadThrough
+from .counts import count_or_estimate
+
+
+CURSOR_PARAMS = ('after', 'before', 'page')
+
+
+def encode_cursor(row):
+    raw = f'{row.created_at.isoformat()}|{row.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Retorna (created_at, id) do cursor, ou None se ausente/inválido"""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        created_at, pk = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage(Sequence):
+    """Página de um `KeysetPaginator` (interface compatível com o uso de `page_obj` nos templates)"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self._has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self._has_previous and self.object_list else None
+
+
+class KeysetPaginator:
+    """
+    Pagina um queryset (ou `ReadThrough` com tabela principal + arquivo)
+    ordenado por (-created_at, -id). `count` pode ser um número, uma função
+    (chamada só quando o total for exibido) ou None (COUNT sob demanda).
+    """
+
+    def __init__(self, object_list, per_page, count=None):
+        if isinstance(object_list, ReadThrough):
+            self.sources = [object_list.hot, object_list.archived]
+        else:
+            self.sources = [object_list]
+        self.per_page = int(per_page)
+        self._count = count
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        if callable(self._count):
+            return self._count()
+        if self._count is not None:
+            return self._count
+        totals = [count_or_estimate(source) for source in self.sources]
+        self.estimated = any(estimated for _, estimated in totals)
+        return sum(total for total, _ in totals)
+
+    def fetch(self, cursor, newer, limit):
+        """Até `limit` linhas a partir do cursor: mais antigas (próxima página) ou mais novas (anterior)"""
+        sources = reversed(self.sources) if newer else self.sources
+        ordering = ('created_at', 'id') if newer else ('-created_at', '-id')
+        rows = []
+        for source in sources:
+            queryset = source.order_by(*ordering)
+            if cursor:
+                created_at, pk = cursor
+                if newer:
+                    queryset = queryset.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=pk)
+                else:
+                    queryset = queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=pk)
+            rows.extend(queryset[:limit - len(rows)])
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def page(self, after=None, before=None):
+        """Página seguinte a `after`, anterior a `before` ou a primeira (cursores inválidos são ignorados)"""
+        before_cursor = decode_cursor(before)
+        if before_cursor:
+            rows = self.fetch(before_cursor, newer=True, limit=self.per_page + 1)
+            has_previous = len(rows) > self.per_page
+            return KeysetPage(list(reversed(rows[:self.per_page])), self, has_next=True, has_previous=has_previous)
+
+        after_cursor = decode_cursor(after)
+        rows = self.fetch(after_cursor, newer=False, limit=self.per_page + 1)
+        has_next = len(rows) > self.per_page
+        return KeysetPage(rows[:self.per_page], self, has_next=has_next, has_previous=after_cursor is not None)
+
+
+class EstimatedPage(Page):
+    """Página de um total estimado: a existência da próxima página vem das linhas lidas, não do total"""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator que conta exatamente só até `COUNT_ESTIMATE_THRESHOLD` linhas;
+    acima disso `count` é estimado (`estimated` = True) e as páginas são lidas
+    com uma linha a mais para saber se há próxima, sem depender do total.
+    """
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        count, self.estimated = count_or_estimate(self.object_list)
+        return count
+
+    def page(self, number):
+        if not self.count or not self.estimated:
+            return super().page(number)
+
+        number = self.validate_number_lower(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        return EstimatedPage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+    def validate_number_lower(self, number):
+        """Valida só o limite inferior: com total estimado, a última página real pode passar de `num_pages`"""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+
+def cursor_links(params, page):
+    """Querystrings da primeira, anterior e próxima páginas, mantendo os demais filtros"""
+    base = params.copy()
+    for key in CURSOR_PARAMS:
+        base.pop(key, None)
+
+    def with_cursor(key, value):
+        query = base.copy()
+        query[key] = value
+        return query.urlencode()
+
+    return {
+        'first_page_query': base.urlencode(),
+        'previous_page_query': with_cursor('before', page.previous_cursor) if page.has_previous() else None,
+        'next_page_query': with_cursor('after', page.next_cursor) if page.has_next() else None,
+    }
+
+
+class KeysetPaginationMixin:
+    """
+    ListView paginada por cursor: `get_queryset` deve retornar movimentações
+    (ou `ReadThrough`). `get_total_count` pode informar um total já conhecido.
+    """
+
+    def get_total_count(self):
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, count=self.get_total_count())
+        page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if context.get('page_obj') is not None:
+            context.update(cursor_links(self.request.GET, context['page_obj']))
+        return context
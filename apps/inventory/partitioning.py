@@ -0,0 +1,208 @@
+"""
+Particionamento mensal por faixa de `created_at` da tabela de movimentações
+(somente PostgreSQL).
+
+A tabela `inventory_stockmovement` é convertida em tabela particionada
+(PARTITION BY RANGE (created_at)) com uma partição por mês e uma partição
+padrão para datas fora das faixas criadas. Consultas que filtram por
+`created_at` (dashboard, listas, relatórios e exportações) passam a ler apenas
+as partições do período (partition pruning).
+
+No SQLite nada muda: a tabela continua única e as funções abaixo são no-ops.
+"""
+
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import StockMovement
+
+
+TABLE = StockMovement._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def is_supported(using_connection=None):
+    return (using_connection or connection).vendor == 'postgresql'
+
+
+def is_enabled():
+    """Particionamento ligado pelo setting STOCK_MOVEMENT_PARTITIONING e suportado pelo banco"""
+    return getattr(settings, 'STOCK_MOVEMENT_PARTITIONING', False) and is_supported()
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)",
+        [TABLE],
+    )
+    return cursor.fetchone()[0]
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def create_month_partition(cursor, month):
+    """
+    Cria a partição do mês, se ainda não existir. Linhas desse mês que
+    tenham caído na partição padrão são movidas para a nova partição.
+    """
+    name = partition_name(month)
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    if cursor.fetchone()[0]:
+        return False
+
+    start, end = month, add_months(month, 1)
+    qn = connection.ops.quote_name
+
+    # Uma partição nova não pode sobrepor linhas existentes na partição padrão
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {qn(DEFAULT_PARTITION)} WHERE created_at >= %s AND created_at < %s)",
+        [start, end],
+    )
+    has_default_rows = cursor.fetchone()[0]
+
+    if has_default_rows:
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(DEFAULT_PARTITION)}")
+
+    cursor.execute(
+        f"CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)",
+        [start.isoformat(), end.isoformat()],
+    )
+
+    if has_default_rows:
+        cursor.execute(
+            f"INSERT INTO {qn(name)} SELECT * FROM {qn(DEFAULT_PARTITION)} WHERE created_at >= %s AND created_at < %s",
+            [start, end],
+        )
+        cursor.execute(
+            f"DELETE FROM {qn(DEFAULT_PARTITION)} WHERE created_at >= %s AND created_at < %s",
+            [start, end],
+        )
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(DEFAULT_PARTITION)} DEFAULT")
+
+    return True
+
+
+def ensure_partitions(months_ahead=3, since=None):
+    """
+    Garante partições do mês de `since` (padrão: mês atual) até
+    `months_ahead` meses à frente. Retorna os nomes das partições criadas.
+    """
+    created = []
+    if not is_supported():
+        return created
+
+    first = month_start(since or date.today())
+    last = add_months(month_start(date.today()), months_ahead)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return created
+
+        month = first
+        while month <= last:
+            if create_month_partition(cursor, month):
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+
+    return created
+
+
+def convert_to_partitioned(schema_editor=None, months_ahead=3):
+    """
+    Converte a tabela de movimentações em tabela particionada por mês.
+
+    Roda sob ACCESS EXCLUSIVE (a tabela fica indisponível durante a cópia).
+    Recria índices e chaves estrangeiras com os mesmos nomes; a chave
+    primária passa a ser (id, created_at), exigência do PostgreSQL para
+    tabelas particionadas. O id continua vindo de uma sequência.
+    """
+    conn = schema_editor.connection if schema_editor else connection
+    if not is_supported(conn):
+        return False
+
+    qn = conn.ops.quote_name
+    old = f'{TABLE}_unpartitioned'
+    sequence = f'{TABLE}_id_seq'
+
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        if is_partitioned(cursor):
+            return False
+
+        cursor.execute(f"LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE")
+
+        # Guarda as definições de índices (exceto a PK) e FKs para recriá-las
+        cursor.execute(
+            """
+            SELECT pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            WHERE i.indrelid = %s::regclass AND NOT i.indisprimary
+            """,
+            [TABLE],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'f'
+            """,
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f"SELECT min(created_at), coalesce(max(id), 0) FROM {qn(TABLE)}")
+        oldest, last_id = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} RENAME TO {qn(old)}")
+        # Colunas de identidade não são suportadas em tabelas particionadas em
+        # todas as versões; a identidade antiga (e sua sequência) é descartada
+        cursor.execute(f"ALTER TABLE {qn(old)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+
+        # Colunas, defaults e CHECKs copiados; identidade substituída por sequência
+        cursor.execute(
+            f"CREATE TABLE {qn(TABLE)} (LIKE {qn(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {qn(sequence)} AS bigint")
+        cursor.execute("SELECT setval(%s, %s)", [sequence, max(last_id, 1)])
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval(%s)", [sequence])
+        cursor.execute(f"ALTER SEQUENCE {qn(sequence)} OWNED BY {qn(TABLE)}.id")
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD PRIMARY KEY (id, created_at)")
+        cursor.execute(f"CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(TABLE)} DEFAULT")
+
+        # Partições mensais do movimento mais antigo até alguns meses à frente
+        month = month_start(oldest.date() if oldest else date.today())
+        last = add_months(month_start(date.today()), months_ahead)
+        while month <= last:
+            create_month_partition(cursor, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {qn(TABLE)} SELECT * FROM {qn(old)}")
+        cursor.execute(f"DROP TABLE {qn(old)}")
+
+        # As definições foram lidas antes da renomeação e já apontam para o nome final
+        for definition in index_defs:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}")
+
+    return True
+
+
+def convert_from_migration(apps, schema_editor):
+    """Passo da migração: converte só se o setting estiver ligado e o banco for PostgreSQL"""
+    if getattr(settings, 'STOCK_MOVEMENT_PARTITIONING', False):
+        convert_to_partitioned(schema_editor)
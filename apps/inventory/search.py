@@ -0,0 +1,140 @@
+"""
+Busca das movimentações (autocomplete) em uma coluna desnormalizada.
+
+`StockMovement.search_document` guarda nome e SKU do produto, usuário,
+nome e sobrenome e motivo, separados por espaço. É montado na gravação
+(save() e bulk_create, ver `fill_search_documents`) e reescrito pelos sinais
+quando um produto ou usuário muda de nome; `python manage.py
+refresh_movement_search` recalcula (ou confere, com --check) a coluna.
+
+A busca mantém o comportamento anterior (trecho de qualquer um dos campos,
+sem diferenciar maiúsculas), mas em uma única tabela e por índice, ordenada
+por `-created_at`:
+
+- PostgreSQL: índice GIN de trigramas (pg_trgm) em UPPER(search_document),
+  que atende o `icontains` do Django (UPPER(...) LIKE UPPER(...)).
+- SQLite: tabela virtual FTS5 `inventory_stockmovement_fts` com tokenizer
+  trigram (busca por trecho), mantida por triggers. Termos com menos de 3
+  caracteres (abaixo de um trigrama) usam `icontains` na coluna. O FTS
+  devolve todas as ocorrências antes da ordenação por data, então
+  `latest_movements` confere primeiro as RECENT_WINDOW movimentações mais
+  recentes: termos comuns se resolvem ali, os raros vão ao índice.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Concat
+
+from apps.products.models import Product
+from apps.products.search import Match
+from .models import StockMovement, MovementSearchEntry
+
+
+User = get_user_model()
+
+# Campos do documento, na ordem
+DOCUMENT_FIELDS = (
+    'product__name', 'product__sku',
+    'user__username', 'user__first_name', 'user__last_name',
+    'reason',
+)
+
+FTS_TABLE = MovementSearchEntry._meta.db_table
+
+# Movimentações mais recentes conferidas antes do índice FTS5
+RECENT_WINDOW = 5000
+
+MovementSearchEntry._meta.get_field('document').register_lookup(Match)
+
+
+def build_document(*values):
+    """Documento a partir dos valores de DOCUMENT_FIELDS (igual a `document_expression`)"""
+    return ' '.join(str(value or '') for value in values)
+
+
+def document_expression():
+    """Mesmo documento de `build_document`, calculado no banco"""
+    parts = []
+    for field in DOCUMENT_FIELDS:
+        parts += [F(field), Value(' ')]
+    return Concat(*parts[:-1], output_field=TextField())
+
+
+def fill_search_documents(movements):
+    """Monta `search_document` das movimentações (produtos e usuários não carregados: uma consulta cada)"""
+    product_ids = {m.product_id for m in movements if not StockMovement.product.is_cached(m)}
+    user_ids = {m.user_id for m in movements if not StockMovement.user.is_cached(m)}
+    products = {
+        pk: values for pk, *values in
+        Product.objects.filter(pk__in=product_ids).values_list('pk', 'name', 'sku')
+    } if product_ids else {}
+    users = {
+        pk: values for pk, *values in
+        User.objects.filter(pk__in=user_ids).values_list('pk', 'username', 'first_name', 'last_name')
+    } if user_ids else {}
+
+    for movement in movements:
+        if StockMovement.product.is_cached(movement):
+            product = (movement.product.name, movement.product.sku)
+        else:
+            product = products.get(movement.product_id, ('', ''))
+        if StockMovement.user.is_cached(movement):
+            user = (movement.user.username, movement.user.first_name, movement.user.last_name)
+        else:
+            user = users.get(movement.user_id, ('', '', ''))
+        movement.search_document = build_document(*product, *user, movement.reason)
+
+
+def refresh_search_documents(queryset):
+    """Recalcula no banco o documento das movimentações de `queryset`. Retorna as linhas gravadas"""
+    document = (
+        StockMovement.objects.filter(pk=OuterRef('pk'))
+        .annotate(document=document_expression())
+        .values('document')[:1]
+    )
+    return queryset.order_by().update(search_document=Subquery(document))
+
+
+def outdated_search_documents(queryset=None):
+    """Movimentações cujo documento difere do calculado a partir das tabelas relacionadas"""
+    queryset = StockMovement.objects.all() if queryset is None else queryset
+    return queryset.annotate(expected=document_expression()).exclude(search_document=F('expected'))
+
+
+_fts_available = {}
+
+
+def uses_fts():
+    """True se a tabela FTS5 de movimentações existe (SQLite com FTS5/trigram)"""
+    vendor = connection.vendor
+    if vendor not in _fts_available:
+        _fts_available[vendor] = vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[vendor]
+
+
+def search_movements(term, queryset=None):
+    """Movimentações cujo produto, SKU, usuário, nome ou motivo contém `term`"""
+    queryset = StockMovement.objects.all() if queryset is None else queryset
+    term = (term or '').strip()
+    if uses_fts() and len(term) >= 3:
+        phrase = '"{}"'.format(term.replace('"', '""'))
+        return queryset.filter(search_entry__document__match=phrase)
+    return queryset.filter(search_document__icontains=term)
+
+
+def matches(term, document):
+    """Mesmo critério de `search_movements`, em memória (termo já em minúsculas)"""
+    return term in document.lower()
+
+
+def latest_movements(term, queryset=None, limit=10):
+    """Até `limit` movimentações mais recentes que contêm `term` (ver `search_movements`)"""
+    queryset = StockMovement.objects.all() if queryset is None else queryset
+    queryset = queryset.order_by('-created_at')
+    if uses_fts() and len(term.strip()) >= 3:
+        recent = StockMovement.objects.order_by('-created_at').values('pk')[:RECENT_WINDOW]
+        movements = list(queryset.filter(pk__in=recent, search_document__icontains=term.strip())[:limit])
+        if len(movements) == limit:
+            return movements
+    return list(search_movements(term, queryset)[:limit])
@@ -5,4 +5,19 @@ class StockMovementSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockMovement
         fields = '__all__'
-        
\ No newline at end of file
+
+
+class StockMovementBatchItemSerializer(serializers.Serializer):
+    """
+    Valida o formato de uma linha do lote de movimentações.
+    Regras de estoque são aplicadas depois, em conjunto, por `services.ingest_movements`.
+    """
+    product = serializers.IntegerField(min_value=1)
+    movement_type = serializers.ChoiceField(choices=StockMovement.MOVEMENT_TYPES)
+    quantity = serializers.IntegerField()
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class StockMovementBatchOptionsSerializer(serializers.Serializer):
+    """Opções do lote de movimentações ("atomic": true/false, "true"/"false", 1/0)"""
+    atomic = serializers.BooleanField(default=False)
@@ -0,0 +1,276 @@
+"""
+Serviços de escrita do estoque.
+
+Concentra as regras que alteram `Product.stock_quantity` para que o
+formulário de movimentação e a ingestão em lote usem o mesmo caminho.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Case, When, Value, IntegerField
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from apps.products.models import Product
+from apps.products.valuation import record_stock_deltas
+from .models import StockMovement, MovementDailyRollup
+from .autocomplete import MOVEMENTS, PRODUCTS, invalidate_on_commit
+from .counts import add_rows
+from . import dashboard
+
+
+class InsufficientStock(Exception):
+    """Uma baixa de estoque foi recusada por falta de saldo no momento da escrita"""
+
+
+def is_staff_role(user):
+    """Indica se o usuário é Operador/Staff (só pode registrar entradas)"""
+    return hasattr(user, 'profile') and user.profile.role == 'STAFF'
+
+
+def apply_stock_deltas(deltas, guarded=False):
+    """
+    Aplica a variação líquida de estoque por produto em um único UPDATE.
+
+    `deltas` é um dicionário {product_id: variação}. Para vários produtos
+    é gerado um UPDATE ... SET stock_quantity = stock_quantity + CASE ...,
+    evitando um `product.save()` por linha.
+
+    Com `guarded=True`, o UPDATE só altera linhas cujo saldo final fica
+    >= 0; se algum produto ficar de fora, levanta `InsufficientStock`
+    (a transação do chamador deve ser desfeita).
+
+    A valorização por categoria é atualizada na sequência
+    (`valuation.record_stock_deltas`); chame dentro de uma transação.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+
+    if len(deltas) == 1:
+        (pk, delta), = deltas.items()
+        change = Value(delta)
+    else:
+        change = Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    queryset = Product.objects.filter(pk__in=deltas)
+    if guarded:
+        queryset = queryset.filter(GreaterThanOrEqual(F('stock_quantity') + change, 0))
+
+    updated = queryset.update(stock_quantity=F('stock_quantity') + change)
+
+    if guarded and updated < len(deltas):
+        raise InsufficientStock()
+
+    record_stock_deltas(deltas)
+    return updated
+
+
+def decrement_stock(product_id, quantity, strategy=None):
+    """
+    Baixa `quantity` unidades do estoque sem a corrida leitura-validação-escrita.
+
+    Estratégias (setting STOCK_DECREMENT_STRATEGY):
+    - 'conditional' (padrão): UPDATE ... SET stock_quantity = stock_quantity - q
+      WHERE id = %s AND stock_quantity >= q. O próprio banco decide, numa
+      única instrução, se há saldo.
+    - 'select_for_update': trava a linha do produto, confere o saldo e
+      atualiza. Útil onde se quer ler o saldo travado antes de decidir.
+
+    Retorna True se a baixa foi aplicada e False se não havia saldo.
+    A valorização por categoria é atualizada na mesma transação.
+    """
+    strategy = strategy or getattr(settings, 'STOCK_DECREMENT_STRATEGY', 'conditional')
+
+    if strategy == 'select_for_update':
+        with transaction.atomic():
+            available = (
+                Product.objects.select_for_update()
+                .filter(pk=product_id)
+                .values_list('stock_quantity', flat=True)
+                .first()
+            )
+            if available is None or available < quantity:
+                return False
+            Product.objects.filter(pk=product_id).update(
+                stock_quantity=F('stock_quantity') - quantity
+            )
+            record_stock_deltas({product_id: -quantity})
+            return True
+
+    with transaction.atomic():
+        decremented = Product.objects.filter(
+            pk=product_id,
+            stock_quantity__gte=quantity,
+        ).update(stock_quantity=F('stock_quantity') - quantity) == 1
+        if decremented:
+            record_stock_deltas({product_id: -quantity})
+    return decremented
+
+
+def record_rollups(movements):
+    """
+    Soma as movimentações recém-criadas nos totais diários (MovementDailyRollup).
+
+    Deve ser chamada na mesma transação da inserção. Usa um único
+    INSERT ... ON CONFLICT DO UPDATE (PostgreSQL e SQLite >= 3.24) que
+    incrementa as linhas já existentes, sem ler antes de escrever.
+    """
+    groups = defaultdict(lambda: [0, 0])
+    for movement in movements:
+        key = (movement.product_id, timezone.localdate(movement.created_at), movement.movement_type)
+        groups[key][0] += 1
+        groups[key][1] += movement.quantity
+
+    if not groups:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(MovementDailyRollup._meta.db_table)
+    columns = ['product_id', 'day', 'movement_type', 'movement_count', 'quantity_sum']
+    rows = [
+        (product_id, connection.ops.adapt_datefield_value(day), movement_type, count, quantity)
+        for (product_id, day, movement_type), (count, quantity) in groups.items()
+    ]
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), 500):
+            chunk = rows[i:i + 500]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT ({qn('product_id')}, {qn('day')}, {qn('movement_type')}) DO UPDATE SET "
+                f"{qn('movement_count')} = {table}.{qn('movement_count')} + excluded.{qn('movement_count')}, "
+                f"{qn('quantity_sum')} = {table}.{qn('quantity_sum')} + excluded.{qn('quantity_sum')}",
+                [value for row in chunk for value in row],
+            )
+
+
+def on_movements_created(movements):
+    """
+    Ponto único de atualização dos dados derivados após inserir movimentações
+    (chamado dentro da transação da inserção).
+    """
+    record_rollups(movements)
+    add_rows(StockMovement, len(movements))
+    invalidate_on_commit(PRODUCTS, MOVEMENTS)
+    dashboard.invalidate_on_commit(*dashboard.MOVEMENT_METRICS)
+
+
+def record_stock_adjustment(product, quantity, user, reason):
+    """
+    Registra no ledger um saldo definido direto no produto (cadastro ou
+    edição): ajuste com a diferença `quantity`, sem alterar o saldo de novo.
+    Sem ele, `reconcile_stock --fix` trataria o saldo como divergência.
+    """
+    if not quantity:
+        return None
+    movement = StockMovement.objects.create(
+        product=product, movement_type=StockMovement.ADJ, quantity=quantity, user=user, reason=reason
+    )
+    on_movements_created([movement])
+    return movement
+
+
+def validate_movement(movement_type, quantity, available, staff_only_in=False):
+    """
+    Valida uma movimentação contra o saldo disponível.
+    Retorna um dicionário {campo: [mensagens]} (vazio se válida).
+    """
+    errors = {}
+
+    if staff_only_in and movement_type != StockMovement.IN:
+        errors['movement_type'] = ["Como Operador/Staff, você somente pode registrar movimentações de entrada."]
+        return errors
+
+    if movement_type in (StockMovement.IN, StockMovement.OUT) and quantity <= 0:
+        label = 'entradas' if movement_type == StockMovement.IN else 'saídas'
+        errors['quantity'] = [f"Para {label}, a quantidade deve ser positiva."]
+        return errors
+
+    if available is None:
+        errors['product'] = ["Produto não encontrado."]
+        return errors
+
+    if available + StockMovement.signed(movement_type, quantity) < 0:
+        errors['quantity'] = [f"Estoque insuficiente. Quantidade disponível: {available}."]
+
+    return errors
+
+
+def ingest_movements(user, rows, atomic=False):
+    """
+    Registra um lote de movimentações de uma só vez.
+
+    `rows` é uma lista de dicionários com `product` (id), `movement_type`,
+    `quantity` e `reason`. As linhas são validadas em conjunto, em ordem,
+    contra o saldo corrente de cada produto (lido com `select_for_update`),
+    inseridas com `bulk_create` e o estoque é atualizado com um único
+    UPDATE agrupado, tudo na mesma transação.
+
+    Com `atomic=True`, qualquer linha inválida descarta o lote inteiro.
+    Retorna uma lista de resultados alinhada com `rows`. Levanta
+    `InsufficientStock` se o saldo mudou durante a gravação.
+    """
+    results = [None] * len(rows)
+    staff_only_in = is_staff_role(user)
+    product_ids = {row['product'] for row in rows}
+
+    with transaction.atomic():
+        # Trava os produtos envolvidos (ordem fixa evita deadlocks)
+        balances = dict(
+            Product.objects.select_for_update()
+            .filter(pk__in=product_ids)
+            .order_by('pk')
+            .values_list('pk', 'stock_quantity')
+        )
+
+        deltas = defaultdict(int)
+        accepted = []
+
+        for index, row in enumerate(rows):
+            product_id = row['product']
+            available = balances.get(product_id)
+            if available is not None:
+                available += deltas[product_id]
+
+            errors = validate_movement(
+                row['movement_type'], row['quantity'], available, staff_only_in
+            )
+            if errors:
+                results[index] = {'index': index, 'status': 'error', 'errors': errors}
+                continue
+
+            deltas[product_id] += StockMovement.signed(row['movement_type'], row['quantity'])
+            accepted.append((index, StockMovement(
+                product_id=product_id,
+                movement_type=row['movement_type'],
+                quantity=row['quantity'],
+                reason=row.get('reason', ''),
+                user=user,
+            )))
+
+        if atomic and len(accepted) < len(rows):
+            for index, _ in accepted:
+                results[index] = {'index': index, 'status': 'skipped'}
+            return results
+
+        created = StockMovement.objects.bulk_create(
+            [movement for _, movement in accepted],
+            batch_size=500,
+        )
+        # Guarda no próprio UPDATE: se outro escritor consumiu o saldo
+        # (ex.: SQLite, onde select_for_update não trava), o lote é desfeito
+        apply_stock_deltas(deltas, guarded=True)
+        on_movements_created(created)
+
+    for (index, _), movement in zip(accepted, created):
+        results[index] = {'index': index, 'status': 'created', 'id': movement.pk}
+
+    return results
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from apps.products.models import Product, Category
+from apps.suppliers.models import Supplier
+from . import autocomplete, counts, dashboard, search, trigram
+from .models import StockMovement
+
+
+User = get_user_model()
+
+# Campos copiados para o documento de busca das movimentações (ver search.py)
+SEARCH_DOCUMENT_SOURCES = {
+    Product: ('product', ('name', 'sku')),
+    User: ('user', ('username', 'first_name', 'last_name')),
+}
+
+# Autocompletes que exibem dados de cada modelo (ver autocomplete.py); o de
+# produtos mostra o saldo, alterado pelas movimentações
+AUTOCOMPLETE_SOURCES = {
+    Product: (autocomplete.PRODUCTS, autocomplete.MOVEMENTS),
+    Category: (autocomplete.PRODUCTS,),
+    Supplier: (autocomplete.SUPPLIERS,),
+    User: (autocomplete.MOVEMENTS,),
+    StockMovement: (autocomplete.PRODUCTS, autocomplete.MOVEMENTS),
+}
+
+
+# Métricas do dashboard que exibem dados de cada modelo (ver dashboard.py)
+DASHBOARD_SOURCES = {
+    Product: (dashboard.STOCK, dashboard.LOW_STOCK, dashboard.RECENT_ACTIVITIES),
+    Category: (dashboard.STOCK, dashboard.LOW_STOCK),
+    Supplier: (dashboard.SUPPLIERS,),
+    User: (dashboard.ACTIVE_USERS, dashboard.RECENT_ACTIVITIES),
+    StockMovement: dashboard.MOVEMENT_METRICS,
+}
+
+# Campos de User que o dashboard não exibe: gravados a cada login
+USER_UNTRACKED_FIELDS = {'last_login'}
+
+
+# Saldo de produtos alterado fora do fluxo de movimentações (ex.: correção
+# da reconciliação). Argumentos: product_ids.
+stock_changed = Signal()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Supplier)
+def count_created_row(sender, instance, created, raw=False, **kwargs):
+    """Mantém o total de linhas da tabela (TableRowCount) ao criar um registro"""
+    if created and not raw:
+        counts.add_rows(sender, 1)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Supplier)
+def index_trigrams(sender, instance, created, raw=False, **kwargs):
+    """Leva edições ao índice de trigramas em memória (registros novos entram na próxima busca)"""
+    if not created and not raw:
+        trigram.update_indexes(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Supplier)
+def count_deleted_row(sender, instance, **kwargs):
+    counts.add_rows(sender, -1)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=User)
+def remember_search_names(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guarda nome/SKU (ou nome de usuário) antes da edição"""
+    _, fields = SEARCH_DOCUMENT_SOURCES[sender]
+    instance._search_names_before = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return
+    instance._search_names_before = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=User)
+def refresh_movement_search(sender, instance, raw=False, **kwargs):
+    """Nome alterado: reescreve o documento de busca das movimentações do produto ou usuário"""
+    relation, fields = SEARCH_DOCUMENT_SOURCES[sender]
+    before = getattr(instance, '_search_names_before', None)
+    if raw or before is None:
+        return
+    if before != tuple(getattr(instance, field) for field in fields):
+        search.refresh_search_documents(StockMovement.objects.filter(**{relation: instance}))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=StockMovement)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=StockMovement)
+def invalidate_autocompletes(sender, raw=False, **kwargs):
+    """Gravação em um modelo exibido: troca a versão do cache dos autocompletes"""
+    if not raw:
+        autocomplete.invalidate_on_commit(*AUTOCOMPLETE_SOURCES[sender])
+
+
+@receiver(stock_changed)
+def invalidate_product_autocomplete(sender, **kwargs):
+    autocomplete.invalidate_on_commit(autocomplete.PRODUCTS)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=StockMovement)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=StockMovement)
+def invalidate_dashboard(sender, raw=False, update_fields=None, **kwargs):
+    """Gravação em um modelo exibido: troca a versão das métricas afetadas do dashboard"""
+    if raw:
+        return
+    if sender is User and update_fields and set(update_fields) <= USER_UNTRACKED_FIELDS:
+        return  # login (update_last_login)
+    dashboard.invalidate_on_commit(*DASHBOARD_SOURCES[sender])
+
+
+@receiver(stock_changed)
+def invalidate_dashboard_stock(sender, **kwargs):
+    dashboard.invalidate_on_commit(dashboard.STOCK, dashboard.LOW_STOCK)
@@ -1,3 +1,1170 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.db import connection, transaction, OperationalError
+from django.db.models.signals import post_delete
+from apps.products.models import Product, Category
+from apps.suppliers.models import Supplier
+from apps.inventory.models import (
+    StockMovement, StockLedgerBalance, LedgerWatermark, MovementDailyRollup,
+    ArchivedStockMovement, StockOpeningBalance, TableRowCount,
+)
+from apps.inventory.services import apply_stock_deltas, decrement_stock, on_movements_created
+from apps.inventory import autocomplete, dashboard, global_search, partitioning, search, trigram
+from apps.inventory.counts import count_or_estimate, estimated_count
+from apps.inventory.archive import ARCHIVED_FIELDS, ARCHIVED_UNTIL_CACHE_KEY, ReadThrough, archived_until
+from apps.inventory.pagination import EstimatedCountPaginator, KeysetPaginator
+from apps.reports.models import DataVersion
+from apps.products.prefix_index import product_prefix_index
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+from datetime import date, timedelta
+from io import StringIO
+import json
+import re
+import threading
+import time
 
 # Create your tests here.
+
+
+class MovementBatchCreateAPITest(TestCase):
+    """Testes para a API de ingestão em lote de movimentações"""
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('inventory:movement_batch_create')
+
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        self.user.profile.role = 'MANAGER'
+        self.user.profile.save()
+        self.client.force_login(self.user)
+
+        category = Category.objects.create(name='Eletrônicos')
+        self.mouse = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=10, minimum_stock=2, category=category
+        )
+        self.teclado = Product.objects.create(
+            name='Teclado Mecânico', sku='TECL-001', price=300.00,
+            stock_quantity=5, minimum_stock=1, category=category
+        )
+
+    def post(self, movements, **extra):
+        return self.client.post(
+            self.url,
+            data=json.dumps({'movements': movements, **extra}),
+            content_type='application/json'
+        )
+
+    def test_lote_cria_movimentacoes_e_atualiza_estoque(self):
+        """Testa se o lote insere as movimentações e aplica o saldo líquido por produto"""
+        response = self.post([
+            {'product': self.mouse.pk, 'movement_type': 'IN', 'quantity': 5},
+            {'product': self.mouse.pk, 'movement_type': 'OUT', 'quantity': 12},
+            {'product': self.teclado.pk, 'movement_type': 'ADJ', 'quantity': -2},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['created'], 3)
+        self.assertEqual(StockMovement.objects.count(), 3)
+
+        self.mouse.refresh_from_db()
+        self.teclado.refresh_from_db()
+        self.assertEqual(self.mouse.stock_quantity, 3)
+        self.assertEqual(self.teclado.stock_quantity, 3)
+
+    def test_saida_sem_saldo_rejeita_apenas_a_linha(self):
+        """Testa se a validação considera as linhas anteriores do mesmo lote"""
+        response = self.post([
+            {'product': self.teclado.pk, 'movement_type': 'OUT', 'quantity': 4},
+            {'product': self.teclado.pk, 'movement_type': 'OUT', 'quantity': 4},
+            {'product': 999999, 'movement_type': 'IN', 'quantity': 1},
+            {'product': self.mouse.pk, 'movement_type': 'XYZ', 'quantity': 1},
+        ])
+
+        data = response.json()
+        statuses = [result['status'] for result in data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'error', 'error'])
+        self.assertIn('quantity', data['results'][1]['errors'])
+        self.assertIn('product', data['results'][2]['errors'])
+        self.assertIn('movement_type', data['results'][3]['errors'])
+
+        self.teclado.refresh_from_db()
+        self.assertEqual(self.teclado.stock_quantity, 1)
+
+    def test_lote_atomico_descarta_tudo_em_caso_de_erro(self):
+        """Testa se o modo atômico não grava nada quando alguma linha é inválida"""
+        response = self.post([
+            {'product': self.mouse.pk, 'movement_type': 'IN', 'quantity': 5},
+            {'product': self.mouse.pk, 'movement_type': 'OUT', 'quantity': 100},
+        ], atomic=True)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['results'][0]['status'], 'skipped')
+        self.assertEqual(StockMovement.objects.count(), 0)
+
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.stock_quantity, 10)
+
+    def test_staff_somente_entradas(self):
+        """Testa se Operador/Staff não consegue registrar saídas pelo lote"""
+        self.user.profile.role = 'STAFF'
+        self.user.profile.save()
+
+        response = self.post([
+            {'product': self.mouse.pk, 'movement_type': 'OUT', 'quantity': 1},
+        ])
+
+        self.assertEqual(response.json()['results'][0]['status'], 'error')
+        self.assertEqual(StockMovement.objects.count(), 0)
+
+    def test_atomico_como_texto(self):
+        """Testa se "atomic": "false" / "0" não ativa o modo atômico e valores inválidos são rejeitados"""
+        rows = [
+            {'product': self.mouse.pk, 'movement_type': 'IN', 'quantity': 1},
+            {'product': self.mouse.pk, 'movement_type': 'XYZ', 'quantity': 1},
+        ]
+        for value in ('false', '0', 0):
+            with self.subTest(atomic=value):
+                self.assertEqual(self.post(rows, atomic=value).json()['created'], 1)
+
+        self.assertEqual(self.post(rows, atomic='true').json()['results'][0]['status'], 'skipped')
+        response = self.post(rows, atomic='talvez')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('atomic', response.json())
+        self.assertEqual(StockMovement.objects.count(), 3)
+
+    def test_exige_role(self):
+        """Testa se a API exige login e um role, como as telas de movimentação"""
+        self.user.profile.delete()
+        self.user = User.objects.get(pk=self.user.pk)
+        self.client.force_login(self.user)
+        rows = [{'product': self.mouse.pk, 'movement_type': 'IN', 'quantity': 1}]
+        self.assertEqual(self.post(rows).status_code, 403)
+
+        self.client.logout()
+        self.assertEqual(self.post(rows).status_code, 403)
+        self.assertEqual(StockMovement.objects.count(), 0)
+
+
+class GuardedDecrementTest(TransactionTestCase):
+    """Testes de concorrência da baixa condicional de estoque"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='operador', password='senha123456')
+        category = Category.objects.create(name='Eletrônicos')
+        self.product = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=20, minimum_stock=2, category=category
+        )
+
+    def run_concurrent_outs(self, strategy, threads=8, attempts=10):
+        """Dispara saídas de 1 unidade em várias threads e retorna quantas foram aceitas"""
+        accepted = []
+        lock = threading.Lock()
+
+        def worker():
+            sold = 0
+            try:
+                for _ in range(attempts):
+                    while True:
+                        try:
+                            with transaction.atomic():
+                                if decrement_stock(self.product.pk, 1, strategy=strategy):
+                                    StockMovement.objects.create(
+                                        product=self.product, movement_type='OUT',
+                                        quantity=1, user=self.user
+                                    )
+                                    sold += 1
+                            break
+                        except OperationalError:
+                            continue    # <- SQLite: tabela travada por outra thread
+            finally:
+                connection.close()
+                with lock:
+                    accepted.append(sold)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return sum(accepted)
+
+    def test_saidas_concorrentes_sem_oversell(self):
+        """Testa se 80 saídas concorrentes sobre saldo 20 aceitam exatamente 20"""
+        sold = self.run_concurrent_outs('conditional')
+
+        self.product.refresh_from_db()
+        self.assertEqual(sold, 20)
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertEqual(StockMovement.objects.filter(product=self.product).count(), 20)
+
+    def test_select_for_update_sem_oversell(self):
+        """Testa a estratégia alternativa com trava de linha"""
+        sold = self.run_concurrent_outs('select_for_update', threads=4, attempts=8)
+
+        self.product.refresh_from_db()
+        self.assertEqual(sold, 20)
+        self.assertEqual(self.product.stock_quantity, 0)
+
+    def test_baixa_sem_saldo_retorna_false(self):
+        """Testa se a baixa condicional informa a falha sem alterar o saldo"""
+        self.assertFalse(decrement_stock(self.product.pk, 21))
+        self.assertTrue(decrement_stock(self.product.pk, 20))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+
+class ReconcileStockCommandTest(TestCase):
+    """Testes do comando de reconciliação ledger x saldo"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        category = Category.objects.create(name='Eletrônicos')
+        self.product = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=0, minimum_stock=2, category=category
+        )
+
+    def add_movement(self, movement_type, quantity):
+        return StockMovement.objects.create(
+            product=self.product, movement_type=movement_type, quantity=quantity, user=self.user
+        )
+
+    def reconcile(self, *args, margin=0):
+        out = StringIO()
+        call_command('reconcile_stock', '--margin', str(margin), *args, stdout=out)
+        return out.getvalue()
+
+    def test_detecta_e_corrige_divergencia(self):
+        """Testa se a divergência é reportada e corrigida com --fix"""
+        self.add_movement('IN', 10)
+        self.add_movement('OUT', 3)
+        self.add_movement('ADJ', -2)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=9)
+
+        output = self.reconcile()
+        self.assertIn('MOUSE-001', output)
+        self.assertEqual(StockLedgerBalance.objects.get(product=self.product).quantity, 5)
+
+        self.reconcile('--fix')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+        self.assertIn('Nenhuma divergência', self.reconcile())
+
+    def test_execucao_incremental_le_apenas_movimentacoes_novas(self):
+        """Testa se a marca d'água evita reler o ledger inteiro"""
+        self.add_movement('IN', 10)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=10)
+        self.reconcile()
+
+        last = self.add_movement('IN', 4)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=14)
+
+        output = self.reconcile()
+
+        self.assertIn(f'#{last.pk} a #{last.pk}', output)
+        self.assertEqual(LedgerWatermark.objects.get(name='reconcile_stock').last_movement_id, last.pk)
+        self.assertEqual(StockLedgerBalance.objects.get(product=self.product).quantity, 14)
+
+    def test_marca_dagua_nao_avanca_sobre_movimentacoes_recentes(self):
+        """Testa a margem: movimentações recentes ficam fora da marca d'água, mas entram na comparação"""
+        first = self.add_movement('IN', 10)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=10)
+        self.reconcile()
+
+        self.add_movement('OUT', 4)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=6)
+        output = self.reconcile('--fix', margin=300)
+
+        self.assertIn('Nenhuma divergência', output)
+        self.assertEqual(LedgerWatermark.objects.get(name='reconcile_stock').last_movement_id, first.pk)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 6)
+
+    def test_saldo_do_cadastro_entra_no_ledger(self):
+        """Testa se o saldo definido no cadastro e na edição do produto vira ajuste, e não divergência"""
+        self.user.profile.role = 'MANAGER'
+        self.user.profile.save()
+        self.client.force_login(self.user)
+        data = {
+            'name': 'Teclado', 'sku': 'TECL-001', 'price': '99.90', 'category': self.product.category_id,
+            'stock_quantity': 7, 'minimum_stock': 1,
+        }
+        self.client.post(reverse('products:product_create'), data)
+        keyboard = Product.objects.get(sku='TECL-001')
+        self.client.post(reverse('products:product_update', args=[keyboard.pk]), {**data, 'stock_quantity': 4})
+
+        adjustments = StockMovement.objects.filter(product=keyboard, movement_type='ADJ').order_by('id')
+        self.assertEqual([m.quantity for m in adjustments], [7, -3])
+
+        self.reconcile('--fix')
+        keyboard.refresh_from_db()
+        self.assertEqual(keyboard.stock_quantity, 4)
+        self.assertEqual(StockLedgerBalance.objects.get(product=keyboard).quantity, 4)
+
+    def test_produto_sem_movimentacoes_e_comparado(self):
+        """Testa se um produto com saldo e sem nenhuma movimentação aparece como divergência"""
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=8)
+        self.assertIn('MOUSE-001', self.reconcile())
+
+        self.reconcile('--fix')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+    def test_produto_anterior_ao_ledger_nao_e_corrigido(self):
+        """Testa se --fix preserva o estoque de produto sem saldo inicial no ledger e --seed-opening o registra"""
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=50, opening_in_ledger=False)
+        self.add_movement('OUT', 5)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=45)
+
+        output = self.reconcile('--fix')
+        self.assertIn('sem saldo inicial no ledger', output)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 45)
+
+        with self.assertRaises(CommandError):
+            self.reconcile('--seed-opening')
+        User.objects.create_superuser(username='admin', password='senha123456')
+        self.assertIn('1 saldo(s) inicial(is) registrado(s)', self.reconcile('--seed-opening'))
+
+        opening = StockMovement.objects.get(product=self.product, movement_type='ADJ')
+        self.assertEqual(opening.quantity, 50)
+        self.assertIn('Nenhuma divergência', self.reconcile('--fix'))
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, self.product.opening_in_ledger), (45, True))
+
+
+class MovementDailyRollupTest(TestCase):
+    """Testes dos totais diários mantidos na escrita"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        self.user.profile.role = 'MANAGER'
+        self.user.profile.save()
+        self.client.force_login(self.user)
+
+        category = Category.objects.create(name='Eletrônicos')
+        self.product = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=10, minimum_stock=2, category=category
+        )
+
+    def rollup_snapshot(self):
+        return list(
+            MovementDailyRollup.objects.order_by('product_id', 'day', 'movement_type')
+            .values_list('product_id', 'day', 'movement_type', 'movement_count', 'quantity_sum')
+        )
+
+    def test_formulario_e_lote_atualizam_resumo(self):
+        """Testa se formulário e lote incrementam o mesmo resumo do dia"""
+        self.client.post(reverse('inventory:movement_create'), {
+            'product': self.product.pk, 'movement_type': 'OUT', 'quantity': 2, 'reason': ''
+        })
+        self.client.post(
+            reverse('inventory:movement_batch_create'),
+            data=json.dumps({'movements': [
+                {'product': self.product.pk, 'movement_type': 'OUT', 'quantity': 3},
+                {'product': self.product.pk, 'movement_type': 'IN', 'quantity': 7},
+            ]}),
+            content_type='application/json'
+        )
+
+        totals = MovementDailyRollup.objects.totals()
+        self.assertEqual(totals['total_movements'], 3)
+        self.assertEqual(totals['total_out'], 2)
+        self.assertEqual(
+            MovementDailyRollup.objects.get(movement_type='OUT').quantity_sum, 5
+        )
+
+    def test_backfill_reproduz_resumo_incremental(self):
+        """Testa se o backfill gera os mesmos totais mantidos na escrita"""
+        self.client.post(
+            reverse('inventory:movement_batch_create'),
+            data=json.dumps({'movements': [
+                {'product': self.product.pk, 'movement_type': 'IN', 'quantity': 4},
+                {'product': self.product.pk, 'movement_type': 'ADJ', 'quantity': -1},
+                {'product': self.product.pk, 'movement_type': 'IN', 'quantity': 1},
+            ]}),
+            content_type='application/json'
+        )
+        incremental = self.rollup_snapshot()
+
+        call_command('backfill_movement_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_snapshot(), incremental)
+
+    def test_admin_de_movimentacoes_somente_leitura(self):
+        """Testa se o admin não cria nem altera movimentações (fora dos totais diários)"""
+        movement = StockMovement.objects.create(
+            product=self.product, movement_type='IN', quantity=1, user=self.user
+        )
+        self.client.force_login(User.objects.create_superuser(username='admin', password='senha123456'))
+
+        self.assertEqual(self.client.get(reverse('admin:inventory_stockmovement_add')).status_code, 403)
+        self.client.post(reverse('admin:inventory_stockmovement_change', args=[movement.pk]), {'quantity': 50})
+        self.client.post(reverse('admin:inventory_stockmovement_delete', args=[movement.pk]), {'post': 'yes'})
+
+        movement.refresh_from_db()
+        self.assertEqual(movement.quantity, 1)
+        self.assertEqual(self.client.get(reverse('admin:inventory_stockmovement_changelist')).status_code, 200)
+
+
+class MovementPartitioningTest(TestCase):
+    """Testes do particionamento de movimentações fora do PostgreSQL"""
+
+    def test_sqlite_permanece_sem_particoes(self):
+        """Testa se conversão e manutenção de partições são no-ops no SQLite"""
+        self.assertFalse(partitioning.convert_to_partitioned())
+        self.assertEqual(partitioning.ensure_partitions(), [])
+
+        out = StringIO()
+        call_command('movement_partitions', stdout=out)
+        self.assertIn('apenas no PostgreSQL', out.getvalue())
+
+    def test_nome_e_faixa_das_particoes(self):
+        """Testa o cálculo dos meses das partições, inclusive na virada do ano"""
+        self.assertEqual(partitioning.add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(partitioning.add_months(date(2025, 1, 1), -1), date(2024, 12, 1))
+        self.assertEqual(partitioning.partition_name(date(2026, 2, 1)), 'inventory_stockmovement_p2026_02')
+
+
+class ArchiveMovementsTest(TestCase):
+    """Testes do arquivamento de movimentações antigas"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        category = Category.objects.create(name='Eletrônicos')
+        self.product = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=13, minimum_stock=2, category=category
+        )
+        self.old = timezone.now() - timedelta(days=800)
+
+        for movement_type, quantity, created_at in [
+            ('IN', 10, self.old), ('OUT', 4, self.old), ('IN', 7, timezone.now()),
+        ]:
+            movement = StockMovement.objects.create(
+                product=self.product, movement_type=movement_type, quantity=quantity, user=self.user
+            )
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=created_at)
+
+    def test_arquiva_e_deixa_saldo_de_abertura(self):
+        """Testa se movimentações antigas saem da tabela principal com saldo de abertura"""
+        out = StringIO()
+        call_command('archive_movements', '--months', '12', '--batch-size', '1', stdout=out)
+
+        self.assertIn('2 movimentação(ões) arquivada(s)', out.getvalue())
+        self.assertEqual(StockMovement.objects.count(), 1)
+        self.assertEqual(ArchivedStockMovement.objects.count(), 2)
+        self.assertEqual(StockOpeningBalance.objects.get(product=self.product).quantity, 6)
+
+    def test_reconciliacao_considera_arquivo(self):
+        """Testa se o ledger continua completo depois do arquivamento"""
+        call_command('archive_movements', '--months', '12', stdout=StringIO())
+
+        self.assertIn('Nenhuma divergência', self.reconcile('--full'))
+        self.assertEqual(StockLedgerBalance.objects.get(product=self.product).quantity, 13)
+
+    def test_remocao_sem_sinais_por_linha(self):
+        """Testa se o arquivamento remove o lote sem post_delete por linha e invalida os caches uma vez"""
+        deleted = []
+
+        def receiver(sender, **kwargs):
+            deleted.append(kwargs['instance'].pk)
+
+        post_delete.connect(receiver, sender=StockMovement)
+        before = autocomplete.version(autocomplete.MOVEMENTS)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('archive_movements', '--months', '12', stdout=StringIO())
+        finally:
+            post_delete.disconnect(receiver, sender=StockMovement)
+
+        self.assertEqual(deleted, [])
+        self.assertEqual(StockMovement.objects.count(), 1)
+        self.assertNotEqual(autocomplete.version(autocomplete.MOVEMENTS), before)
+
+    def test_backfill_inclui_movimentacoes_arquivadas(self):
+        """Testa se a reconstrução dos totais diários mantém os totais do arquivo"""
+        call_command('archive_movements', '--months', '12', stdout=StringIO())
+        call_command('backfill_movement_rollups', stdout=StringIO())
+
+        totals = MovementDailyRollup.objects.totals()
+        self.assertEqual(totals['total_movements'], 3)
+        self.assertEqual((totals['total_in'], totals['total_out']), (2, 1))
+
+    @override_settings(ARCHIVED_UNTIL_CACHE_TIMEOUT=0)
+    def test_fronteira_do_arquivo_expira(self):
+        """Testa se um arquivamento feito por outro processo aparece quando a fronteira em cache expira"""
+        cache.delete(ARCHIVED_UNTIL_CACHE_KEY)
+        self.assertIsNone(archived_until())
+        oldest = StockMovement.objects.order_by('created_at').values(*ARCHIVED_FIELDS).first()
+        ArchivedStockMovement.objects.create(**oldest)  # outro processo (sem limpar cache algum)
+        self.assertEqual(archived_until(), oldest['created_at'])
+
+    def reconcile(self, *args, margin=0):
+        out = StringIO()
+        call_command('reconcile_stock', '--margin', str(margin), *args, stdout=out)
+        return out.getvalue()
+
+
+class KeysetPaginationTest(TestCase):
+    """Testes da paginação por cursor das movimentações"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        self.client = Client()
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Eletrônicos')
+        self.product = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=0, minimum_stock=2, category=category
+        )
+        movements = StockMovement.objects.bulk_create([
+            StockMovement(product=self.product, movement_type='IN', quantity=1, user=self.user)
+            for _ in range(45)
+        ])
+        # Metade das movimentações com o mesmo created_at (desempate por id)
+        now = timezone.now()
+        for i, movement in enumerate(movements):
+            StockMovement.objects.filter(pk=movement.pk).update(
+                created_at=now if i % 2 else now - timedelta(minutes=i)
+            )
+        self.expected = list(StockMovement.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def walk(self, paginator):
+        """Percorre todas as páginas para frente e retorna os ids e as páginas"""
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        return [row.pk for page in pages for row in page], pages
+
+    def test_percorre_sem_repetir_nem_pular(self):
+        """Testa se os cursores percorrem todas as linhas, inclusive com created_at repetido"""
+        paginator = KeysetPaginator(StockMovement.objects.all(), 20)
+        ids, pages = self.walk(paginator)
+
+        self.assertEqual(ids, self.expected)
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertFalse(pages[0].has_previous())
+
+        # Voltando da última página chega-se à segunda
+        previous = paginator.page(before=pages[-1].previous_cursor)
+        self.assertEqual([row.pk for row in previous], self.expected[20:40])
+        self.assertTrue(previous.has_previous())
+        self.assertTrue(previous.has_next())
+
+    def test_cursor_invalido_volta_para_primeira_pagina(self):
+        """Testa se um cursor inválido é ignorado"""
+        page = KeysetPaginator(StockMovement.objects.all(), 20).page(after='nao-e-um-cursor')
+        self.assertEqual([row.pk for row in page], self.expected[:20])
+
+    def test_total_apenas_sob_demanda(self):
+        """Testa se a página não executa COUNT e se o total só é contado quando pedido"""
+        paginator = KeysetPaginator(StockMovement.objects.all(), 20)
+        with self.assertNumQueries(1):
+            paginator.page()
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 45)
+
+    def test_le_tabela_principal_e_arquivo(self):
+        """Testa se a paginação continua do arquivo quando a tabela principal acaba"""
+        old = timezone.now() - timedelta(days=800)
+        archived = ArchivedStockMovement.objects.bulk_create([
+            ArchivedStockMovement(
+                id=10_000 + i, product=self.product, movement_type='OUT', quantity=1,
+                user=self.user, created_at=old - timedelta(minutes=i),
+            )
+            for i in range(10)
+        ])
+        paginator = KeysetPaginator(
+            ReadThrough(StockMovement.objects.all(), ArchivedStockMovement.objects.all()), 20
+        )
+        ids, pages = self.walk(paginator)
+
+        self.assertEqual(ids, self.expected + [row.pk for row in archived])
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(paginator.count, 55)
+
+    def test_lista_de_movimentacoes(self):
+        """Testa a navegação da lista pelos links de cursor, sem COUNT por padrão"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('inventory:movement_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['movements']), 20)
+        self.assertFalse(response.context['show_total'])
+        self.assertNotIn('COUNT(', ' '.join(query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get(reverse('inventory:movement_list') + '?' + response.context['next_page_query'])
+        self.assertEqual([m.pk for m in response.context['movements']], self.expected[20:40])
+
+        response = self.client.get(reverse('inventory:movement_list'), {'total': 1})
+        self.assertContains(response, '45')
+
+
+class EstimatedCountTest(TestCase):
+    """Testes das contagens estimadas (TableRowCount no SQLite) e do paginador com total estimado"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name='Eletrônicos')
+        for i in range(12):
+            Product.objects.create(
+                name=f'Produto {i:02d}', sku=f'PROD-{i:02d}', price=10,
+                stock_quantity=i, minimum_stock=3, category=self.category
+            )
+
+    def test_total_mantido_pelas_escritas(self):
+        """Testa se o total por tabela acompanha criações, exclusões, movimentações e arquivamento"""
+        self.assertEqual(estimated_count(Product), 12)
+        self.assertEqual(estimated_count(StockMovement), 0)
+
+        Product.objects.create(name='Novo', sku='NOVO-01', price=1, category=self.category)
+        Product.objects.get(sku='PROD-00').delete()
+        product = Product.objects.get(sku='PROD-01')
+        movements = StockMovement.objects.bulk_create([
+            StockMovement(product=product, movement_type='IN', quantity=1, user=self.user) for _ in range(3)
+        ])
+        on_movements_created(movements)
+        StockMovement.objects.filter(pk=movements[0].pk).update(created_at=timezone.now() - timedelta(days=800))
+        call_command('archive_movements', '--months', '12', stdout=StringIO())
+
+        self.assertEqual(estimated_count(Product), 12)
+        self.assertEqual(estimated_count(StockMovement), 2)
+        self.assertEqual(estimated_count(ArchivedStockMovement), 1)
+
+        out = StringIO()
+        call_command('refresh_row_counts', '--check', stdout=out)
+        self.assertIn('Totais conferem', out.getvalue())
+
+    @override_settings(COUNT_ESTIMATE_THRESHOLD=5)
+    def test_estimativa_acima_do_limite(self):
+        """Testa se acima do limite a contagem sem filtro vem do total mantido e com filtro continua exata"""
+        estimated_count(Product)
+        TableRowCount.objects.filter(table=Product._meta.db_table).update(rows=1000)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(count_or_estimate(Product.objects.all()), (1000, True))
+        self.assertEqual(count_or_estimate(Product.objects.filter(stock_quantity__gte=2)), (10, False))
+        self.assertEqual(count_or_estimate(Product.objects.filter(stock_quantity__gte=8)), (4, False))
+
+    @override_settings(COUNT_ESTIMATE_THRESHOLD=5)
+    def test_paginador_com_total_estimado(self):
+        """Testa se a lista de produtos mostra "cerca de N" e navega pelas linhas lidas, não pelo total"""
+        estimated_count(Product)
+        TableRowCount.objects.filter(table=Product._meta.db_table).update(rows=100)
+
+        paginator = EstimatedCountPaginator(Product.objects.order_by('name'), 5)
+        self.assertEqual(paginator.count, 100)
+        self.assertTrue(paginator.estimated)
+        last = paginator.page(3)
+        self.assertEqual(len(last), 2)
+        self.assertFalse(last.has_next())
+        self.assertEqual(last.end_index(), 12)
+
+        response = self.client.get(reverse('products:product_list'), {'page_size': 5, 'page': 2})
+        self.assertContains(response, 'cerca de 100')
+        self.assertNotContains(response, 'Última')
+
+    def test_dashboard_sem_count_nas_tabelas_grandes(self):
+        """Testa se o dashboard não executa COUNT(*) sem limite em produtos, fornecedores ou movimentações"""
+        cache.clear()  # métricas do dashboard em cache (ver dashboard.py)
+        Supplier.objects.create(name='Fornecedor', email='f@example.com', cnpj='12.345.678/0001-90')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('inventory:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_products'], 12)
+        self.assertEqual(response.context['low_stock_count'], 4)
+        self.assertEqual(response.context['total_suppliers'], 1)
+
+        counts = [
+            query['sql'] for query in queries.captured_queries
+            if 'COUNT(' in query['sql'] and ' LIMIT ' not in query['sql'] and any(
+                f'FROM "{table}"' in query['sql']
+                for table in ('products_product', 'suppliers_supplier', 'inventory_stockmovement')
+            )
+        ]
+        self.assertEqual(counts, [])
+
+    def test_total_de_fornecedores_estimado_acima_do_limite(self):
+        """Testa se o dashboard usa a estimativa de fornecedores acima de COUNT_ESTIMATE_THRESHOLD"""
+        cache.clear()
+        Supplier.objects.bulk_create([Supplier(name=f'Fornecedor {i}') for i in range(3)])
+        TableRowCount.objects.update_or_create(table=Supplier._meta.db_table, defaults={'rows': 500})
+
+        with self.settings(COUNT_ESTIMATE_THRESHOLD=10):
+            self.assertEqual(dashboard.compute(dashboard.SUPPLIERS, 1), 3)
+        with self.settings(COUNT_ESTIMATE_THRESHOLD=2):
+            self.assertEqual(dashboard.compute(dashboard.SUPPLIERS, 1), 500)
+
+
+class TrigramSearchTest(TestCase):
+    """Testes da busca aproximada por trigramas (índice em memória fora do PostgreSQL)"""
+
+    def setUp(self):
+        cache.clear()
+        trigram.clear_indexes()
+        self.client.force_login(User.objects.create_user(username='estoquista', password='senha123456'))
+        self.category = Category.objects.create(name='Ferragens')
+        self.screw = Product.objects.create(name='Parafuso Sextavado', sku='PRF-004512', price=1, category=self.category)
+        Product.objects.create(name='Porca Sextavada', sku='PRC-000100', price=1, category=self.category)
+        Supplier.objects.create(name='Distribuidora Paulista', email='vendas@paulista.com.br', cnpj='12.345.678/0001-90')
+
+    def search(self, term):
+        return [p.name for p in trigram.fuzzy_search(Product.objects.all(), term, ('name', 'sku'))]
+
+    def test_trigramas_no_formato_do_pg_trgm(self):
+        """Testa a quebra em trigramas e a similaridade"""
+        self.assertEqual(trigram.trigrams('Oi!'), {'  o', ' oi', 'oi '})
+        self.assertEqual(trigram.similarity(trigram.trigrams('mouse'), 'Mouse Gamer'), 1.0)
+
+    def test_erros_de_digitacao_e_trechos_de_sku(self):
+        """Testa termos com erro e SKUs incompletos, do mais ao menos parecido"""
+        self.assertEqual(self.search('parafuzo sextavad'), ['Parafuso Sextavado'])
+        self.assertEqual(self.search('PFR-004512'), ['Parafuso Sextavado'])
+        self.assertEqual(self.search('sextavada')[0], 'Porca Sextavada')
+        self.assertEqual(self.search('martelo'), [])
+
+    def test_indice_acompanha_escritas(self):
+        """Testa registros criados (inclusive bulk_create) e editados depois do índice construído"""
+        self.assertEqual(self.search('arruela'), [])
+        Product.objects.bulk_create([Product(name='Arruela Lisa', sku='ARR-1', price=1, category=self.category)])
+        self.assertEqual(self.search('aruela'), ['Arruela Lisa'])
+
+        self.screw.name = 'Rebite Pop'
+        self.screw.save()
+        self.assertEqual(self.search('rebite'), ['Rebite Pop'])
+        self.assertEqual(self.search('parafuso'), [])
+
+    def test_autocompletes(self):
+        """Testa os autocompletes de produtos e fornecedores com erro de digitação"""
+        response = self.client.get(reverse('products:product_autocomplete'), {'q': 'parafuzo'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Parafuso Sextavado'])
+
+        response = self.client.get(reverse('suppliers:supplier_autocomplete'), {'q': 'distribuidra'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Distribuidora Paulista'])
+
+        response = self.client.get(reverse('suppliers:supplier_autocomplete'), {'q': 'vendas@paulista'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Distribuidora Paulista'])
+
+
+class MovementSearchDocumentTest(TestCase):
+    """Testes do documento de busca desnormalizado das movimentações"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='jsilva', password='senha123456', first_name='Joana', last_name='Silva'
+        )
+        category = Category.objects.create(name='Ferramentas')
+        self.drill = Product.objects.create(name='Furadeira de Impacto', sku='FUR-0042', price=300, category=category)
+        self.saw = Product.objects.create(name='Serra Circular', sku='SER-0007', price=500, category=category)
+        self.first = StockMovement.objects.create(
+            product=self.drill, movement_type=StockMovement.IN, quantity=5, user=self.user, reason='Compra mensal'
+        )
+        StockMovement.objects.bulk_create([
+            StockMovement(product_id=self.saw.pk, movement_type=StockMovement.IN, quantity=2, user_id=self.user.pk),
+        ])
+        self.last = StockMovement.objects.create(
+            product=self.drill, movement_type=StockMovement.OUT, quantity=1, user=self.user, reason='Venda balcão'
+        )
+
+    def ids(self, term):
+        return list(search.search_movements(term).order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_documento_montado_na_gravacao(self):
+        """Testa save() e bulk_create preenchendo o documento igual ao calculado no banco"""
+        self.assertEqual(self.first.search_document, 'Furadeira de Impacto FUR-0042 jsilva Joana Silva Compra mensal')
+        self.assertFalse(search.outdated_search_documents().exists())
+
+    def test_busca_por_trecho_de_cada_campo(self):
+        """Testa produto, SKU, usuário, nome, motivo e termos curtos, em ordem de criação decrescente"""
+        self.assertTrue(search.uses_fts())
+        self.assertEqual(self.ids('furadeira'), [self.last.pk, self.first.pk])
+        self.assertEqual(self.ids('ser-00'), [self.saw.movements.get().pk])
+        self.assertEqual(len(self.ids('JSILVA')), 3)
+        self.assertEqual(len(self.ids('joana silva')), 3)
+        self.assertEqual(self.ids('balcão'), [self.last.pk])
+        self.assertEqual(self.ids('42'), [self.last.pk, self.first.pk])
+        self.assertEqual(self.ids('parafuso'), [])
+
+    def test_renomear_produto_ou_usuario(self):
+        """Testa os sinais reescrevendo os documentos e o comando de recálculo"""
+        self.drill.name = 'Parafusadeira'
+        self.drill.save()
+        self.assertEqual(self.ids('parafusadeira'), [self.last.pk, self.first.pk])
+        self.assertEqual(self.ids('furadeira'), [])
+
+        self.user.first_name = 'Joanna'
+        self.user.save()
+        self.assertEqual(len(self.ids('joanna')), 3)
+
+        # UPDATE em lote não dispara sinais: o comando confere e corrige
+        Product.objects.filter(pk=self.saw.pk).update(name='Serrote')
+        out = StringIO()
+        call_command('refresh_movement_search', '--check', stdout=out)
+        self.assertIn('1 documento(s) desatualizado(s)', out.getvalue())
+        call_command('refresh_movement_search', '--batch-size', '2', stdout=StringIO())
+        self.assertFalse(search.outdated_search_documents().exists())
+        self.assertEqual(len(self.ids('serrote')), 1)
+
+    def test_autocomplete(self):
+        """Testa o autocomplete de movimentações sobre o documento de busca"""
+        response = self.client.get(reverse('inventory:movement_autocomplete'), {'q': 'silva'})
+        results = response.json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['id'], self.last.pk)
+        self.assertEqual(results[0]['user'], 'Joana Silva')
+
+
+class AutocompleteCacheTest(TestCase):
+    """Testes do cache dos autocompletes (termo normalizado, prefixos, invalidação e métricas)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jsilva', password='senha123456', first_name='Joana')
+        category = Category.objects.create(name='Ferramentas')
+        self.drill = Product.objects.create(name='Furadeira de Impacto', sku='FUR-0042', price=300, category=category)
+        self.saw = Product.objects.create(name='Serra Circular', sku='SER-0007', price=500, category=category)
+        StockMovement.objects.create(product=self.drill, movement_type=StockMovement.IN, quantity=5, user=self.user)
+        StockMovement.objects.create(product=self.saw, movement_type=StockMovement.IN, quantity=2, user=self.user)
+        Supplier.objects.create(name='Distribuidora Paulista', phone='(11) 98765-4321', cnpj='12.345.678/0001-90')
+        Supplier.objects.create(name='Atacado Mineiro', phone='(31) 3333-1234', cnpj='12.399.000/0001-10')
+
+    def movements(self, term):
+        response = self.client.get(reverse('inventory:movement_autocomplete'), {'q': term})
+        return [r['product_name'] for r in response.json()['results']]
+
+    def requests(self, name):
+        values = autocomplete.requests.values()
+        return {result: values[(name, result)] for result in ('hit', 'prefix', 'miss')}
+
+    def test_termos_equivalentes_usam_a_mesma_entrada(self):
+        """Testa maiúsculas e espaços extras respondidos pelo cache (só a consulta da versão)"""
+        self.assertEqual(self.movements('Furadeira de'), ['Furadeira de Impacto'])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.movements('  FURADEIRA   de '), ['Furadeira de Impacto'])
+        self.assertEqual(self.requests('movements'), {'hit': 1, 'prefix': 0, 'miss': 1})
+
+    def test_prefixo_completo_responde_termos_mais_longos(self):
+        """Testa o filtro em memória da lista de um prefixo e a volta ao banco sem resultado"""
+        self.assertEqual(self.movements('jsil'), ['Serra Circular', 'Furadeira de Impacto'])
+        # Só a versão do autocomplete (reports.DataVersion)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.movements('jsilva joana'), ['Serra Circular', 'Furadeira de Impacto'])
+        self.assertEqual(self.movements('ser'), ['Serra Circular'])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.movements('serra cir'), ['Serra Circular'])
+        self.assertEqual(self.movements('serrote'), [])
+        self.assertEqual(self.requests('movements'), {'hit': 0, 'prefix': 2, 'miss': 3})
+
+        response = self.client.get(reverse('suppliers:supplier_autocomplete'), {'q': '12.3'})
+        self.assertEqual(len(response.json()['results']), 2)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('suppliers:supplier_autocomplete'), {'q': '12.345.678/0001-90'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Distribuidora Paulista'])
+
+    def test_gravacoes_invalidam(self):
+        """Testa a troca de versão após o commit de uma movimentação nova"""
+        self.assertEqual(self.movements('serra'), ['Serra Circular'])
+        with self.captureOnCommitCallbacks(execute=True):
+            StockMovement.objects.create(
+                product=self.saw, movement_type=StockMovement.OUT, quantity=1, user=self.user, reason='Serra vendida'
+            )
+        self.assertEqual(self.movements('serra'), ['Serra Circular', 'Serra Circular'])
+        self.assertEqual(self.requests('movements')['miss'], 2)
+
+    def test_versao_no_banco(self):
+        """Testa se a versão fica no banco: outro processo (cache próprio) vê a invalidação"""
+        self.assertEqual(self.movements('serra'), ['Serra Circular'])
+        before = autocomplete.version(autocomplete.MOVEMENTS)
+        autocomplete.invalidate(autocomplete.MOVEMENTS)
+        cache.clear()  # cache local de outro processo: nenhuma chave compartilhada
+
+        self.assertEqual(autocomplete.version(autocomplete.MOVEMENTS), before + 1)
+        self.assertEqual(DataVersion.objects.get(name='autocomplete:movements').version, before + 1)
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_metricas(self):
+        """Testa a exportação das métricas com token e o acesso negado sem ele"""
+        self.movements('serra')
+        self.movements('SERRA')
+
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer segredo')
+        body = response.content.decode()
+        self.assertIn('sistock_autocomplete_cache_requests_total{autocomplete="movements",result="hit"} 1', body)
+        self.assertIn('sistock_autocomplete_cache_hit_ratio{autocomplete="movements"} 0.5', body)
+
+
+class DashboardCacheTest(TestCase):
+    """Testes das métricas do dashboard em cache (invalidação por evento e trava de recálculo)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Ferramentas')
+        self.saw = Product.objects.create(
+            name='Serra Circular', sku='SER-0007', price=500, stock_quantity=1, minimum_stock=3, category=category
+        )
+        Supplier.objects.create(name='Distribuidora Paulista', cnpj='12.345.678/0001-90')
+
+    def dashboard(self):
+        """Contexto do dashboard e o SQL executado"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('inventory:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response.context, ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def loads(self):
+        return dashboard.loads.values()
+
+    def test_dashboard_em_cache_com_uma_consulta(self):
+        """Testa a segunda carga com uma única consulta do dashboard, a das versões (além das do login e do layout)"""
+        context, _ = self.dashboard()
+        self.assertEqual(context['low_stock_count'], 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            context = self.client.get(reverse('inventory:dashboard')).context
+        self.assertEqual(context['total_products'], 1)
+        self.assertEqual(context['total_suppliers'], 1)
+        self.assertEqual([p.name for p in context['low_stock_products']], ['Serra Circular'])
+        # Sessão, usuário logado e perfil (menu do layout) ficam de fora
+        sql = [
+            query['sql'] for query in queries.captured_queries
+            if not any(table in query['sql'] for table in ('"django_session"', '"auth_user"', '"accounts_profile"'))
+        ]
+        self.assertEqual(len(sql), 1, sql)
+        self.assertIn('"reports_dataversion"', sql[0])
+        for table in ('products_', 'suppliers_', 'inventory_', 'COUNT('):
+            self.assertNotIn(table, ' '.join(sql))
+        self.assertEqual(self.loads()[('hit',)], 1)
+
+    def test_gravacao_invalida_so_as_metricas_afetadas(self):
+        """Testa se um fornecedor novo recalcula só o total de fornecedores e uma movimentação, as suas"""
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            Supplier.objects.create(name='Atacado Mineiro', cnpj='12.399.000/0001-10')
+
+        context, sql = self.dashboard()
+        self.assertEqual(context['total_suppliers'], 2)
+        for table in ('products_', 'inventory_stockmovement', 'auth_user" WHERE "auth_user"."is_active"'):
+            self.assertNotIn(table, sql)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_deltas({self.saw.pk: 5})
+            movement = StockMovement.objects.create(
+                product=self.saw, movement_type=StockMovement.IN, quantity=5, user=self.user
+            )
+            on_movements_created([movement])
+        context, sql = self.dashboard()
+        self.assertEqual(context['total_movements'], 1)
+        self.assertEqual(context['low_stock_count'], 0)
+        self.assertEqual([a.quantity for a in context['recent_activities']], [5])
+        self.assertNotIn('suppliers_', sql)
+
+    def test_login_nao_invalida(self):
+        """Testa se a gravação de last_login (todo login) mantém as métricas em cache"""
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.login(username='gerente', password='senha123456')
+        self.dashboard()
+        self.assertEqual(self.loads()[('hit',)], 1)
+
+    def test_recalculo_em_andamento_exibe_valor_anterior(self):
+        """Testa a trava: sem obtê-la, a carga exibe o valor anterior em vez de recalcular"""
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            Supplier.objects.create(name='Atacado Mineiro', cnpj='12.399.000/0001-10')
+
+        cache.add(dashboard.lock_key(dashboard.SUPPLIERS), True)  # outro processo recalculando
+        context, sql = self.dashboard()
+        self.assertEqual(context['total_suppliers'], 1)
+        self.assertNotIn('inventory_', sql)
+        self.assertEqual(self.loads()[('stale',)], 1)
+
+        cache.delete(dashboard.lock_key(dashboard.SUPPLIERS))
+        context, _ = self.dashboard()
+        self.assertEqual(context['total_suppliers'], 2)
+
+    def test_versao_no_banco_vale_para_outros_processos(self):
+        """Testa se a invalidação feita por outro processo (outro cache local) chega pela versão no banco"""
+        self.dashboard()
+        Supplier.objects.bulk_create([Supplier(name='Atacado Mineiro', cnpj='12.399.000/0001-10')])
+        DataVersion.objects.filter(name=dashboard.version_name(dashboard.SUPPLIERS)).delete()
+        self.assertEqual(self.dashboard()[0]['total_suppliers'], 1)
+
+        DataVersion.objects.create(name=dashboard.version_name(dashboard.SUPPLIERS), version=1)
+        context, sql = self.dashboard()
+        self.assertEqual(context['total_suppliers'], 2)
+        self.assertNotIn('products_', sql)
+
+
+class GlobalSearchTest(TransactionTestCase):
+    """Testes da busca global (seções em paralelo, prazo por seção)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jsilva', password='senha123456')
+        category = Category.objects.create(name='Ferramentas')
+        saw = Product.objects.create(name='Serra Circular', sku='SER-0007', price=500, category=category)
+        StockMovement.objects.create(product=saw, movement_type=StockMovement.IN, quantity=2, user=self.user)
+        Supplier.objects.create(name='Serralheria Paulista', phone='(11) 98765-4321', cnpj='12.345.678/0001-90')
+        trigram.clear_indexes()
+        product_prefix_index.build()
+
+    def tearDown(self):
+        trigram.clear_indexes()
+        product_prefix_index.clear()
+
+    def sleeping(self, seconds, results):
+        def search(query):
+            time.sleep(seconds)
+            return results
+        return search
+
+    def test_secoes_agrupadas(self):
+        """Testa produtos, fornecedores e movimentações em uma resposta"""
+        url = reverse('inventory:global_search')
+        self.assertEqual(self.client.get(url, {'q': 'serra'}).status_code, 403)
+
+        self.client.force_login(self.user)
+        data = self.client.get(url, {'q': 'serra'}).json()
+        sections = data['sections']
+        self.assertEqual(list(sections), ['products', 'suppliers', 'movements'])
+        self.assertEqual([r['name'] for r in sections['products']['results']], ['Serra Circular'])
+        self.assertEqual([r['name'] for r in sections['suppliers']['results']], ['Serralheria Paulista'])
+        self.assertEqual([r['product_name'] for r in sections['movements']['results']], ['Serra Circular'])
+        self.assertFalse(data['partial'])
+
+        # Mesmo cache dos autocompletes
+        self.assertEqual(autocomplete.requests.values()[('suppliers', 'miss')], 1)
+        self.client.get(url, {'q': 'SERRA'})
+        self.assertEqual(autocomplete.requests.values()[('suppliers', 'hit')], 1)
+
+    def test_secoes_em_paralelo(self):
+        """Testa a latência da seção mais lenta (e não a soma das três)"""
+        started = time.monotonic()
+        sections = async_to_sync(global_search.search)('serra', {
+            name: self.sleeping(0.3, [name]) for name in autocomplete.AUTOCOMPLETES
+        }, timeout=2)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual({name: s['results'] for name, s in sections.items()}, {
+            'products': ['products'], 'suppliers': ['suppliers'], 'movements': ['movements'],
+        })
+        self.assertLess(elapsed, 0.6)
+
+    def test_secao_lenta_ou_com_erro_volta_vazia(self):
+        """Testa o resultado parcial: seção fora do prazo ou com erro, demais normais"""
+        def failing(query):
+            raise RuntimeError('banco indisponível')
+
+        started = time.monotonic()
+        sections = async_to_sync(global_search.search)('serra', {
+            'products': self.sleeping(0, ['Serra Circular']),
+            'suppliers': self.sleeping(1, ['Serralheria Paulista']),
+            'movements': failing,
+        }, timeout=0.2)
+
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual(sections['products'], {'results': ['Serra Circular'], 'count': 1, 'status': 'ok'})
+        self.assertEqual(sections['suppliers'], {'results': [], 'count': 0, 'status': 'timeout'})
+        self.assertEqual(sections['movements']['status'], 'error')
+        self.assertEqual(global_search.sections_total.values()[('suppliers', 'timeout')], 1)
+
+
+class RemoteSelectFilterTest(TestCase):
+    """Testes dos filtros de produto e categoria com Select2 carregado sob demanda"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='senha123456'))
+        self.category = Category.objects.create(name='Ferragens')
+        Category.objects.create(name='Elétricos')
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Parafuso {i:02d}', sku=f'PRF-{i:02d}', price=1, category=self.category)
+            for i in range(30)
+        ])
+
+    def select2(self, response, name, **params):
+        html = response.content.decode()
+        field_id = re.search(rf'name="{name}"[^>]*data-field_id="([^"]+)"|data-field_id="([^"]+)"[^>]*name="{name}"', html)
+        url = re.search(rf'name="{name}"[^>]*data-ajax--url="([^"]+)"|data-ajax--url="([^"]+)"[^>]*name="{name}"', html)
+        return self.client.get(next(filter(None, url.groups())), {'field_id': next(filter(None, field_id.groups())), **params})
+
+    def test_lista_de_movimentacoes_sem_o_catalogo(self):
+        """Testa a página só com o produto selecionado e o filtro validado pelo pk"""
+        selected = self.products[7]
+        response = self.client.get(reverse('inventory:movement_list'), {'product': selected.pk})
+        options = re.findall(r'<option value="(\d+)"', response.content.decode().split('name="product"')[1].split('</select>')[0])
+        self.assertEqual(options, [str(selected.pk)])
+        self.assertEqual(response.context['filter'].form.cleaned_data['product'], selected)
+
+    def test_respostas_paginadas_e_em_cache(self):
+        """Testa a busca, a próxima página sem COUNT e a resposta repetida sem consultas de produtos"""
+        page = self.client.get(reverse('inventory:movement_list'))
+        data = self.select2(page, 'product', term='parafuso').json()
+        self.assertEqual(len(data['results']), 25)
+        self.assertTrue(data['more'])
+
+        with CaptureQueriesContext(connection) as queries:
+            again = self.select2(page, 'product', term='PARAFUSO ').json()
+        self.assertEqual(again, data)
+        # Só a sessão, o usuário logado (login exigido) e a versão do autocomplete
+        self.assertEqual(len(queries), 3, queries.captured_queries)
+        self.assertIn('"reports_dataversion"', queries.captured_queries[2]['sql'])
+        self.assertNotIn('products_', ' '.join(query['sql'] for query in queries.captured_queries))
+
+        data = self.select2(page, 'product', term='parafuso', page=2).json()
+        self.assertEqual((len(data['results']), data['more']), (5, False))
+
+        page = self.client.get(reverse('products:product_list'))
+        data = self.select2(page, 'category', term='ferr').json()
+        self.assertEqual([r['text'] for r in data['results']], ['Ferragens'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Ferramentas')
+        data = self.select2(page, 'category', term='ferr').json()
+        self.assertEqual([r['text'] for r in data['results']], ['Ferragens', 'Ferramentas'])
+
+    def test_select2_de_produtos_sem_estado(self):
+        """Testa o token assinado (sem estado no cache), a projeção e o token adulterado"""
+        page = self.client.get(reverse('inventory:movement_create'))
+        cache.clear()  # outro processo: nada do widget no cache
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.select2(page, 'product', term='parafuso 07').json()
+        self.assertEqual(data['results'], [{'id': self.products[7].pk, 'text': 'Parafuso 07 (PRF-07)', 'stock': 0}])
+        self.assertNotIn('description', queries[-1]['sql'])
+
+        url = reverse('inventory:product_lookup')
+        self.assertEqual(self.client.get(url, {'field_id': 'eyJsaW1pdCI6MTAwMH0:x:y', 'term': 'par'}).status_code, 404)
+
+    def test_select2_de_produtos_exige_login_e_token_valido(self):
+        """Testa se o lookup de produtos exige login e recusa token expirado"""
+        page = self.client.get(reverse('inventory:movement_create'))
+        field_id = re.search(r'data-field_id="([^"]+)"', page.content.decode()).group(1)
+        url = reverse('inventory:product_lookup')
+
+        with override_settings(PRODUCT_WIDGET_TOKEN_MAX_AGE=-1):
+            self.assertEqual(self.client.get(url, {'field_id': field_id, 'term': 'par'}).status_code, 404)
+
+        self.client.logout()
+        response = self.client.get(url, {'field_id': field_id, 'term': 'par'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('accounts:login'), response['Location'])
@@ -0,0 +1,171 @@
+"""
+Busca aproximada por trigramas, para SKUs e nomes digitados pela metade ou
+com erro ("PRD-0045", "parafuzo sextavad").
+
+O texto é quebrado em trigramas como no pg_trgm (palavras em minúsculas,
+com dois espaços antes e um depois): "mouse" → "  m", " mo", "mou", "ous",
+"use", "se ". A similaridade é a fração dos trigramas do termo presentes no
+campo; entram os registros com similaridade mínima `SIMILARITY_THRESHOLD`
+em algum dos campos, do mais ao menos parecido.
+
+- PostgreSQL: extensão pg_trgm e índices GIN (gin_trgm_ops) nos campos
+  buscados, criados pelas migrações; filtro `termo <% campo` e ranking por
+  `word_similarity`.
+- Demais bancos (SQLite, desenvolvimento): índice em memória, em Python
+  (trigrama → ids), por processo. Construído na primeira busca, completado
+  com os registros novos (pk maior que o último indexado) a cada busca e com
+  as edições feitas por save() (sinais); reconstruído a cada
+  TRIGRAM_INDEX_TIMEOUT segundos para pegar edições de outros processos. O
+  índice só escolhe candidatos: a similaridade final é calculada sobre os
+  valores atuais do banco.
+
+Use `fuzzy_search(queryset, termo, campos, limite)`; os campos precisam
+estar carregados no queryset (ex.: `.only(...)`).
+"""
+
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from math import ceil
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+
+# Mesmo valor padrão de pg_trgm.word_similarity_threshold
+SIMILARITY_THRESHOLD = 0.6
+
+# Candidatos do índice em memória avaliados por busca
+CANDIDATES = 200
+
+
+def trigrams(text):
+    """Conjunto de trigramas de `text`, no formato do pg_trgm"""
+    result = set()
+    for word in re.findall(r'[^\W_]+', str(text or '').lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(term_trigrams, text):
+    """Fração dos trigramas do termo presentes em `text` (0 a 1)"""
+    if not term_trigrams:
+        return 0.0
+    return len(term_trigrams & trigrams(text)) / len(term_trigrams)
+
+
+class TrigramIndex:
+    """Índice invertido em memória (trigrama → pks) dos `fields` de `model`"""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = tuple(fields)
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.postings = defaultdict(list)
+        self.last_pk = 0
+        self.built_at = None
+
+    def add(self, pk, values):
+        for trigram in set().union(*(trigrams(value) for value in values)):
+            self.postings[trigram].append(pk)
+
+    def load(self, queryset):
+        for pk, *values in queryset.values_list('pk', *self.fields).order_by('pk').iterator(chunk_size=10_000):
+            self.add(pk, values)
+            self.last_pk = max(self.last_pk, pk)
+
+    def refresh(self):
+        """Constrói (ou reconstrói, se expirado) e indexa os registros criados desde a última busca"""
+        with self.lock:
+            if self.built_at is None or time.monotonic() - self.built_at > settings.TRIGRAM_INDEX_TIMEOUT:
+                self.clear()
+                self.built_at = time.monotonic()
+            self.load(self.model._default_manager.filter(pk__gt=self.last_pk))
+
+    def update(self, instance):
+        """Indexa os valores atuais de um registro editado (trigramas antigos ficam até a reconstrução)"""
+        if self.built_at is not None:
+            with self.lock:
+                self.add(instance.pk, [getattr(instance, field) for field in self.fields])
+
+    def candidates(self, term_trigrams, minimum):
+        """
+        Pks que podem ter `minimum` trigramas em comum com o termo, dos que
+        têm mais. Quem tem `minimum` dos n trigramas tem pelo menos um dos
+        n - minimum + 1 mais raros: só as listas desses são percorridas.
+        """
+        postings = sorted((self.postings.get(trigram, ()) for trigram in term_trigrams), key=len)
+        shared = Counter()
+        for pks in postings[:len(postings) - minimum + 1]:
+            shared.update(pks)
+        return [pk for pk, _ in shared.most_common(CANDIDATES)]
+
+
+_indexes = {}
+
+
+def get_index(model, fields):
+    key = (model._meta.label, tuple(fields))
+    if key not in _indexes:
+        _indexes[key] = TrigramIndex(model, fields)
+    return _indexes[key]
+
+
+def update_indexes(instance):
+    """Repassa a edição de `instance` aos índices em memória do seu modelo"""
+    for index in _indexes.values():
+        if isinstance(instance, index.model):
+            index.update(instance)
+
+
+def clear_indexes():
+    for index in _indexes.values():
+        with index.lock:
+            index.clear()
+
+
+def postgresql_search(queryset, term, fields):
+    table = queryset.model._meta.db_table
+    columns = [f'"{table}"."{queryset.model._meta.get_field(field).column}"' for field in fields]
+    params = [term] * len(columns)
+    match = ' OR '.join(f'%s <%% {column}' for column in columns)
+    rank = 'GREATEST({})'.format(', '.join(f'word_similarity(%s, {column})' for column in columns))
+    return queryset.alias(
+        trigram_match=RawSQL(f'({match})', params, output_field=BooleanField()),
+    ).filter(trigram_match=True).annotate(
+        similarity=RawSQL(rank, params, output_field=FloatField()),
+    ).order_by('-similarity', *fields)
+
+
+def python_search(queryset, term_trigrams, fields, limit):
+    index = get_index(queryset.model, fields)
+    index.refresh()
+    minimum = ceil(SIMILARITY_THRESHOLD * len(term_trigrams))
+
+    results = []
+    for obj in queryset.filter(pk__in=index.candidates(term_trigrams, minimum)):
+        obj.similarity = max(similarity(term_trigrams, getattr(obj, field)) for field in fields)
+        if obj.similarity >= SIMILARITY_THRESHOLD:
+            results.append(obj)
+    results.sort(key=lambda obj: (-obj.similarity, *(str(getattr(obj, field)) for field in fields)))
+    return results[:limit]
+
+
+def fuzzy_search(queryset, term, fields, limit=10):
+    """
+    Até `limit` registros de `queryset` parecidos com `term` em algum dos
+    `fields`, do mais ao menos parecido (atributo `similarity`).
+    """
+    term_trigrams = trigrams(term)
+    if not term_trigrams:
+        return []
+    if connection.vendor == 'postgresql':
+        return list(postgresql_search(queryset, term, fields)[:limit])
+    return python_search(queryset, term_trigrams, fields, limit)
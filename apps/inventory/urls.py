@@ -6,6 +6,10 @@ app_name = 'inventory'
 urlpatterns = [
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
     path('api/autocomplete/', views.MovementAutocompleteView.as_view(), name='movement_autocomplete'),
+    path('api/search/', views.GlobalSearchView.as_view(), name='global_search'),
+    path('api/products/lookup/', views.ProductLookupView.as_view(), name='product_lookup'),
+    path('api/select2/', views.Select2ResponseView.as_view(), name='select2_json'),
+    path('api/movements/batch/', views.MovementBatchCreateView.as_view(), name='movement_batch_create'),
 
     path('movements/', views.MovementListView.as_view(), name='movement_list'),
     path('movements/add/', views.MovementCreateView.as_view(), name='movement_create'),
@@ -1,23 +1,37 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.urls import reverse_lazy
-from django.shortcuts import render, redirect
 from django.views.generic import TemplateView, CreateView, ListView, DetailView
-from django.views.decorators.cache import cache_page
 from django.views import View
-from django.contrib.auth.models import User
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.contrib import messages
-from django.db.models import F, Q
-from django.http import JsonResponse
-from django.utils.decorators import method_decorator
+from django.core import signing
+from django.http import Http404, JsonResponse
+from django_select2.views import AutoResponseView
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
 
 from apps.products.models import Product
-from apps.suppliers.models import Supplier
+from apps.products.prefix_index import normalize
+from apps.products.search import lookup_products
+from apps.products.views import ProductAutocompleteView
+from apps.suppliers.views import SupplierAutocompleteView
 from apps.accounts.mixins import StaffOrAboveRequiredMixin
+from apps.accounts.permissions import StaffOrAbovePermission
 from .models import StockMovement
-from .forms import StockMovementForm
+from .forms import ProductWidget, StockMovementForm
 from .filters import StockMovementFilter
+from .pagination import EstimatedCountPaginator, KeysetPaginationMixin
+from .search import latest_movements, matches as search_matches
+from . import autocomplete, dashboard, global_search
+from .autocomplete import MOVEMENTS, AutocompleteCache
+from .serializers import StockMovementBatchItemSerializer, StockMovementBatchOptionsSerializer
+from .services import InsufficientStock, apply_stock_deltas, decrement_stock, ingest_movements, on_movements_created
 
 
 
@@ -31,46 +45,31 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Consultas dinâmicas para as métricas
-        total_products = Product.objects.count()
-        total_suppliers = Supplier.objects.count()
-        total_movements = StockMovement.objects.count()
-
-        # Conta produtos com estoque baixo ou zerado
-        low_stock_products = Product.objects.low_stock().select_related('category')
-        low_stock_count = low_stock_products.count()
-
-        # Busca as 10 movimentações mais recentes (MÉTRICA)
-        recent_activities = StockMovement.objects.select_related('product', 'user').order_by('-created_at')[:10]
-        # recent_activities = StockMovement.objects.select_related('product', 'user').only(
-        #     'id', 'created_at', 'movement_type', 'quantity', 'reason',
-        #     'product__name', 'product__sku',
-        #     'user__username', 'user__first_name', 'user__last_name'
-        # ).order_by('-created_at')[:10]
-
-        # Usuários Ativos (MÉTRICA)
-        active_users_count = User.objects.filter(is_active=True).count()
+        # Métricas em cache, recalculadas só quando uma gravação as afeta (ver dashboard.py)
+        metrics = dashboard.dashboard_metrics()
+        stock_totals = metrics[dashboard.STOCK]
 
         # Atualiza o contexto com as métricas (context = dicionário que armazena dados para a view renderizar)
         context.update({
-            'total_products': total_products,
-            'total_suppliers': total_suppliers,
-            'low_stock_count': low_stock_count,
-            'low_stock_products': low_stock_products[:5],   # <-- aparece 5 produtos abaixo do estoque
-            'total_movements': total_movements,
-            'recent_activities': recent_activities,
-            'active_users': active_users_count,
+            'total_products': stock_totals['total_products'],
+            'total_suppliers': metrics[dashboard.SUPPLIERS],
+            'low_stock_count': stock_totals['low_stock_count'],
+            'low_stock_products': metrics[dashboard.LOW_STOCK],   # <-- aparece 5 produtos abaixo do estoque
+            'total_movements': metrics[dashboard.MOVEMENTS],
+            'recent_activities': metrics[dashboard.RECENT_ACTIVITIES],
+            'active_users': metrics[dashboard.ACTIVE_USERS],
         })
         return context
 
 
 
-class MovementListView(LoginRequiredMixin, ListView):
-    """Lista Movimentação"""
+class MovementListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """Lista Movimentação (paginação por cursor: páginas profundas custam o mesmo que a primeira)"""
     model = StockMovement
     template_name = 'inventory/movement_list.html'
     context_object_name = 'movements'
     paginate_by = 20
+    page_sizes = [20, 50, 100]
 
     # Filtro de busca e tipo (get_queryset = é um método que retorna o conjunto de dados a ser exibido na view)
     def get_queryset(self):
@@ -86,24 +85,32 @@ class MovementListView(LoginRequiredMixin, ListView):
         """ Adiciona o objeto de filtro ao contexto """
         context = super().get_context_data(**kwargs)
         context['filter'] = self.filter
-        context['page_sizes'] = [20, 50, 100]
-        context['current_page_size'] = int(self.request.GET.get('page_size', 20))
+        context['page_sizes'] = self.page_sizes
+        context['current_page_size'] = self.get_paginate_by(None)
+        # Total (COUNT) só quando pedido: não é necessário para navegar
+        context['show_total'] = bool(self.request.GET.get('total'))
         return context
     
     # Permite paginação dinâmica via query parameter
     def get_paginate_by(self, queryset):
-        return self.request.GET.get('page_size', self.paginate_by)
+        try:
+            page_size = int(self.request.GET.get('page_size', self.paginate_by))
+        except ValueError:
+            return self.paginate_by
+        return page_size if page_size in self.page_sizes else self.paginate_by
 
 
 
-# Cache de 5 minutos para impedir múltiplas consultas idênticas em curto período
-@method_decorator(cache_page(60 * 5), name='dispatch')  # Cache de 5 minutos
 class MovementAutocompleteView(View):
     """
     API endpoint para autocomplete de movimentações.
     Busca por: nome do produto, SKU, tipo de movimentação, usuário.
+    Cache por termo normalizado, invalidado pelas gravações de movimentações,
+    produtos e usuários (ver autocomplete.py).
     """
 
+    autocomplete_cache = AutocompleteCache(MOVEMENTS, matches=search_matches)
+
     # GET method para busca de movimentações
     def get(self, request):
         query = request.GET.get('q', '').strip()
@@ -111,22 +118,27 @@ class MovementAutocompleteView(View):
         # Retorna vazio se query muito curta
         if len(query) < 2:
             return JsonResponse({'results': []})
-        
-        # Busca movimentações (case-insensitive, busca parcial)
-        movements = StockMovement.objects.filter(
-            Q(product__name__icontains=query) |
-            Q(product__sku__icontains=query) |
-            Q(user__username__icontains=query) |
-            Q(user__first_name__icontains=query) |
-            Q(user__last_name__icontains=query) |
-            Q(reason__icontains=query)
-        ).select_related(
+
+        results = self.autocomplete_cache.get(query, self.search)
+
+        # Retorna resposta JSON com resultados e contagem
+        return JsonResponse({
+            'results': results,
+            'count': len(results),
+            'query': query
+        })
+
+    def search(self, query):
+        """Resultados e documento de busca de cada um"""
+        # Busca movimentações (case-insensitive, busca parcial) no documento de
+        # busca indexado: produto, SKU, usuário, nome e motivo em uma só coluna
+        movements = latest_movements(query, StockMovement.objects.select_related(
             'product', 'user'
         ).only(
-            'id', 'created_at', 'movement_type', 'quantity', 'reason',
+            'id', 'created_at', 'movement_type', 'quantity', 'reason', 'search_document',
             'product__name', 'product__sku',
             'user__username', 'user__first_name', 'user__last_name'
-        ).order_by('-created_at')[:10]      # Limita a 10 resultados mais recentes
+        ), limit=10)      # Limita a 10 resultados mais recentes
 
         # Mapeamento de tipos para display
         type_display = {
@@ -152,14 +164,128 @@ class MovementAutocompleteView(View):
                 'created_at': movement.created_at.strftime('%d/%m/%Y %H:%M'),
                 'url': f'/inventory/movements/{movement.id}/'
             })
-        
-        # Retorna resposta JSON com resultados e contagem
+        return results, [movement.search_document for movement in movements]
+
+
+
+class GlobalSearchView(View):
+    """
+    API endpoint da busca global (caixa de busca do cabeçalho).
+    Produtos, fornecedores e movimentações em uma só resposta, agrupada por
+    seção; as três buscas (as dos autocompletes, com o mesmo cache) rodam em
+    paralelo, cada uma com prazo de GLOBAL_SEARCH_TIMEOUT segundos (ver
+    global_search.py).
+    """
+
+    autocompletes = {
+        autocomplete.PRODUCTS: ProductAutocompleteView,
+        autocomplete.SUPPLIERS: SupplierAutocompleteView,
+        MOVEMENTS: MovementAutocompleteView,
+    }
+
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Autenticação necessária'}, status=403)
+
+        query = request.GET.get('q', '').strip()
+
+        # Retorna vazio se query muito curta
+        if len(query) < autocomplete.MIN_LENGTH:
+            return JsonResponse({'sections': {}, 'partial': False, 'query': query})
+
+        sections = await global_search.search(query, {
+            name: self.section_search(view_class)
+            for name, view_class in self.autocompletes.items()
+        })
+
         return JsonResponse({
-            'results': results,
-            'count': len(results),
-            'query': query
+            'sections': sections,
+            'partial': any(section['status'] != 'ok' for section in sections.values()),
+            'query': query,
         })
 
+    @staticmethod
+    def section_search(view_class):
+        """Busca do autocomplete `view_class`, pelo cache dele"""
+        view = view_class()
+        return lambda query: view.autocomplete_cache.get(query, view.search)
+
+
+
+class Select2ResponseView(AutoResponseView):
+    """
+    Resultados dos Select2 com CachedSelect2Mixin (CategoryWidget: filtro da
+    lista e formulário de produtos).
+    Como o AutoResponseView do django-select2, mas sem COUNT(*) na paginação
+    (busca uma linha a mais para saber se há próxima página) e com a resposta
+    em cache por widget, termo e página, na versão do autocomplete do widget
+    (gravações em produtos e categorias invalidam, ver autocomplete.py).
+    """
+
+    def get(self, request, *args, **kwargs):
+        self.widget = self.get_widget_or_404()
+        self.term = kwargs.get('term', request.GET.get('term', ''))
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            page = 1
+
+        params = sorted((name, value) for name, value in request.GET.lists() if name not in ('term', 'page', '_type'))
+        payload = json.dumps([' '.join(self.term.lower().split()), page, params])
+        digest = hashlib.sha256(payload.encode()).hexdigest()[:24]
+        key = f'select2:{autocomplete.version(self.widget.autocomplete)}:{digest}'
+
+        def results():
+            size = self.widget.max_results
+            objects = list(self.get_queryset()[(page - 1) * size:page * size + 1])
+            return {
+                'results': [self.widget.result_from_instance(obj, request) for obj in objects[:size]],
+                'more': len(objects) > size,
+            }
+
+        return JsonResponse(cache.get_or_set(key, results, settings.AUTOCOMPLETE_CACHE_TIMEOUT))
+
+
+
+class ProductLookupView(LoginRequiredMixin, View):
+    """
+    Opções do Select2 de produtos (ProductWidget), sem estado no servidor.
+    `field_id` é o token assinado do widget, válido por
+    PRODUCT_WIDGET_TOKEN_MAX_AGE segundos; a busca usa o índice de texto
+    (`lookup_products`: id, nome, SKU e saldo) e a resposta fica em cache por
+    PRODUCT_LOOKUP_CACHE_TIMEOUT segundos, na versão do autocomplete de
+    produtos (gravações invalidam antes disso).
+    """
+
+    def get(self, request):
+        try:
+            config = ProductWidget.load_token(request.GET.get('field_id', ''))
+        except signing.BadSignature:
+            raise Http404('field_id inválido')
+        term = request.GET.get('term', '').strip()
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            page = 1
+        limit = config['limit']
+
+        payload = json.dumps([normalize(' '.join(term.split())), page, limit])
+        digest = hashlib.sha256(payload.encode()).hexdigest()[:24]
+        key = f'product_lookup:{autocomplete.version(autocomplete.PRODUCTS)}:{digest}'
+
+        def results():
+            rows = lookup_products(term, (page - 1) * limit, limit)
+            return {
+                'results': [
+                    {'id': pk, 'text': f'{name} ({sku})', 'stock': stock}
+                    for pk, name, sku, stock in rows[:limit]
+                ],
+                'more': len(rows) > limit,
+            }
+
+        return JsonResponse(cache.get_or_set(key, results, settings.PRODUCT_LOOKUP_CACHE_TIMEOUT))
+
 
 
 class MovementCreateView(StaffOrAboveRequiredMixin, LoginRequiredMixin, SuccessMessageMixin, CreateView):
@@ -186,27 +312,101 @@ class MovementCreateView(StaffOrAboveRequiredMixin, LoginRequiredMixin, SuccessM
 
         # Associa o usuário logado à movimentação
         form.instance.user = self.request.user
+        product = form.cleaned_data['product']
+        delta = StockMovement.signed(form.cleaned_data['movement_type'], form.cleaned_data['quantity'])
 
         # Usa uma transação para garantir a consistência dos dados (movimentação + atualização de estoque)
         with transaction.atomic():
-            response = super().form_valid(form)
+            # A validação do formulário leu o saldo antes da transação; a baixa
+            # condicional decide no banco, evitando que saídas concorrentes
+            # deixem o estoque negativo
+            if delta < 0:
+                if not decrement_stock(product.pk, -delta):
+                    product.refresh_from_db(fields=['stock_quantity'])
+                    form.add_error('quantity', f"Estoque insuficiente. Quantidade disponível: {product.stock_quantity}.")
+                    return self.form_invalid(form)
+            else:
+                apply_stock_deltas({product.pk: delta})
 
-            movement = self.object
-            product = movement.product
-
-            if movement.movement_type == StockMovement.IN:
-                product.stock_quantity = F('stock_quantity') + movement.quantity
-            elif movement.movement_type == StockMovement.OUT:
-                product.stock_quantity = F('stock_quantity') - movement.quantity
-            elif movement.movement_type == StockMovement.ADJ:
-                product.stock_quantity = F('stock_quantity') + movement.quantity  # Ajuste pode ser positivo ou negativo
-            
-            product.save()
+            response = super().form_valid(form)
+            on_movements_created([self.object])
         
         return response
 
 
 
+class MovementBatchCreateView(APIView):
+    """
+    API de ingestão em lote de movimentações (docas de recebimento, sincronização do PDV).
+
+    POST JSON: {"movements": [{"product": 1, "movement_type": "IN", "quantity": 10, "reason": "..."}, ...],
+                "atomic": false}
+
+    Todas as linhas são validadas juntas, inseridas com bulk_create e o estoque
+    é atualizado com um único UPDATE agrupado por produto. Retorna o resultado
+    de cada linha. Com "atomic": true, qualquer erro descarta o lote inteiro.
+    """
+    permission_classes = [StaffOrAbovePermission]
+    max_batch_size = 1000
+
+    def post(self, request):
+        rows = request.data.get('movements') if isinstance(request.data, dict) else None
+
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'detail': 'Envie uma lista não vazia em "movements".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        options = StockMovementBatchOptionsSerializer(data=request.data)
+        if not options.is_valid():
+            return Response(options.errors, status=status.HTTP_400_BAD_REQUEST)
+        atomic = options.validated_data['atomic']
+        
+        if len(rows) > self.max_batch_size:
+            return Response(
+                {'detail': f'Lote muito grande. Máximo: {self.max_batch_size} movimentações.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Valida o formato de cada linha; apenas as válidas seguem para o serviço
+        results = [None] * len(rows)
+        valid_rows, valid_indexes = [], []
+        for index, row in enumerate(rows):
+            serializer = StockMovementBatchItemSerializer(data=row)
+            if serializer.is_valid():
+                valid_rows.append(serializer.validated_data)
+                valid_indexes.append(index)
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+        if atomic and len(valid_rows) < len(rows):
+            for index in valid_indexes:
+                results[index] = {'index': index, 'status': 'skipped'}
+            valid_rows = []
+
+        if valid_rows:
+            try:
+                ingested = ingest_movements(request.user, valid_rows, atomic=atomic)
+            except InsufficientStock:
+                return Response(
+                    {'detail': 'O saldo de algum produto mudou durante a gravação. Nenhuma movimentação foi registrada; reenvie o lote.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            for index, result in zip(valid_indexes, ingested):
+                result['index'] = index
+                results[index] = result
+
+        created = sum(1 for result in results if result['status'] == 'created')
+        rejected = sum(1 for result in results if result['status'] == 'error')
+
+        return Response(
+            {'created': created, 'rejected': rejected, 'results': results},
+            status=status.HTTP_400_BAD_REQUEST if atomic and rejected else status.HTTP_200_OK
+        )
+
+
+
 class MovementDetailView(LoginRequiredMixin, DetailView):
     """Detalhe Movimentação"""
     model = StockMovement
@@ -228,6 +428,7 @@ class StockAlertsView(LoginRequiredMixin, ListView):
     template_name = 'inventory/stock_alerts.html'
     context_object_name = 'low_stock_products'
     paginate_by = 20
+    paginator_class = EstimatedCountPaginator
 
     # Retorna produtos com estoque baixo para Dashboard
     def get_queryset(self):
@@ -1,4 +1,7 @@
 from django.contrib import admin
+from django.db import transaction
+
+from apps.inventory.services import record_stock_adjustment
 from .models import Category, Product
 
 # Register your models here.
@@ -13,3 +16,15 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ["name", "sku"]
     list_display = ["name", "sku", "category", "price", "stock_quantity", "minimum_stock"]
     list_filter = ["category"]
+
+    def save_model(self, request, obj, form, change):
+        """Registra no ledger (ajuste) o saldo definido no cadastro ou na edição"""
+        with transaction.atomic():
+            before = 0
+            if change:
+                before = Product.objects.select_for_update().values_list('stock_quantity', flat=True).get(pk=obj.pk)
+            super().save_model(request, obj, form, change)
+            record_stock_adjustment(
+                obj, obj.stock_quantity - before, request.user,
+                'Ajuste na edição do produto (admin)' if change else 'Saldo inicial (cadastro do produto)',
+            )
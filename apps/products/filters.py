@@ -1,22 +1,34 @@
 import django_filters
+from .forms import CategoryWidget
 from .models import Product, Category
+from .search import search_products
 
 
 class ProductFilter(django_filters.FilterSet):
     """
     FilterSet para o modelo Product. Permite filtrar por nome e categoria.
+    A busca por nome usa o índice de texto (nome, SKU e descrição), ordenando
+    por relevância. A categoria é escolhida em um Select2 com busca sob demanda.
     """
 
     name = django_filters.CharFilter(
-        lookup_expr='icontains',
+        method='filter_search',
         label='Nome do Produto',
     )
     category = django_filters.ModelChoiceFilter(
         queryset=Category.objects.all(),
+        widget=CategoryWidget(attrs={
+            'data-placeholder': 'Todas as categorias',
+            'data-allow-clear': 'true',
+            'data-minimum-input-length': 0,
+        }),
         label='Categoria',
     )
 
     class Meta:
         model = Product
         fields = ['name', 'category']
+
+    def filter_search(self, queryset, name, value):
+        return search_products(value, queryset)
         
\ No newline at end of file
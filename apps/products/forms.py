@@ -3,6 +3,8 @@ from django.forms import widgets
 from .models import Category, Product
 from django_select2.forms import ModelSelect2Widget
 
+from apps.inventory.forms import CachedSelect2Mixin
+
 class CategoryForm(forms.ModelForm):
     """
     Formulário para criar e editar Categorias.
@@ -14,7 +16,8 @@ class CategoryForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'rows': 3}),
         }
 
-class CategoryWidget(ModelSelect2Widget):
+class CategoryWidget(CachedSelect2Mixin, ModelSelect2Widget):
+    """Select2 de categorias (gravações em categorias também trocam a versão de PRODUCTS)"""
     search_fields = [
         'name__icontains',
         'description__icontains',
@@ -0,0 +1,210 @@
+"""
+Management command de benchmark das buscas do autocomplete.
+Uso: python manage.py benchmark_search [opções]
+
+Cria produtos e fornecedores sintéticos dentro de uma transação e compara,
+para termos exatos, trechos de SKU e termos com erro de digitação:
+
+- `icontains` em nome/SKU/descrição (produtos) e nome/email/CNPJ
+  (fornecedores), a implementação anterior do autocomplete;
+- a busca textual (`search_products`, só produtos);
+- a busca por trigramas (`fuzzy_search`): pg_trgm no PostgreSQL, índice em
+  memória nos demais bancos (a construção do índice é medida à parte);
+- o índice de prefixos em memória do autocomplete de produtos
+  (`product_prefix_index`), com a construção medida à parte;
+- as chaves numéricas de CNPJ e telefone (`numeric_lookup`), para termos
+  numéricos de fornecedores;
+- o Select2 de produtos: a view genérica do django-select2 (widget no
+  cache, `icontains` em nome/SKU, COUNT na paginação) contra
+  `ProductLookupView` (token assinado, índice de texto), sem e com cache.
+
+Os dados são descartados ao final (rollback).
+"""
+
+import random
+import time
+from decimal import Decimal
+
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory
+from django.urls import reverse
+from django_select2.forms import ModelSelect2Widget
+from django_select2.views import AutoResponseView
+
+from apps.inventory import autocomplete, trigram
+from apps.inventory.forms import ProductWidget
+from apps.inventory.views import ProductLookupView
+from apps.products.models import Product, Category
+from apps.products.prefix_index import product_prefix_index
+from apps.products.search import search_products
+from apps.suppliers.keys import numeric_lookup, numeric_term
+from apps.suppliers.models import Supplier
+from .create_products import Command as CreateProducts
+
+
+PRODUCT_TERMS = [
+    ('prefixo curto', 'mo'),
+    ('exato', 'Mouse Gamer'),
+    ('trecho de SKU', '0004512'),
+    ('erro no nome', 'Impresora laserr'),
+    ('erro no SKU', 'BNCH-0004512'),
+]
+
+SELECT2_TERMS = [
+    ('prefixo curto', 'mo'),
+    ('exato', 'Mouse Gamer'),
+    ('trecho de SKU', '0004512'),
+]
+
+SUPPLIER_TERMS = [
+    ('exato', 'Distribuidora 1234'),
+    ('erro no nome', 'Distribuidro 1234'),
+    ('início do CNPJ', '00.000.000/0123'),
+    ('CNPJ completo', '00.000.000/0012-34'),
+    ('telefone', '(11) 90001-00'),
+]
+
+
+class Command(BaseCommand):
+    """
+    Compara icontains, busca textual e trigramas nos autocompletes.
+    """
+
+    help = 'Benchmark das buscas do autocomplete: icontains vs. busca textual vs. trigramas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200_000, help='Produtos gerados (padrão: 200000)')
+        parser.add_argument('--suppliers', type=int, default=20_000, help='Fornecedores gerados (padrão: 20000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Execuções de cada busca (padrão: 5)')
+
+    def create_data(self, products, suppliers):
+        rng = random.Random(42)
+        category = Category.objects.create(name='Benchmark busca')
+        for start in range(0, products, 10_000):
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        name=' '.join([
+                            rng.choice(CreateProducts.PRODUCT_TYPES),
+                            rng.choice(CreateProducts.PRODUCT_DESCRIPTORS),
+                            rng.choice(CreateProducts.PRODUCT_ADJECTIVES),
+                        ]),
+                        sku=f'BENCH-{i:07d}',
+                        description=f'Item de benchmark {i}',
+                        category=category,
+                        price=Decimal(10),
+                    )
+                    for i in range(start, min(start + 10_000, products))
+                ],
+                batch_size=2000,
+            )
+            self.stdout.write(f'   ⏳ {min(start + 10_000, products):,} produtos')
+        Supplier.objects.bulk_create(
+            [
+                Supplier(
+                    name=f'Distribuidora {i}',
+                    email=f'contato{i}@fornecedor.com.br',
+                    phone=f'(11) 9{i:04d}-{i % 10_000:04d}',
+                    cnpj='{0}{1}.{2}{3}{4}.{5}{6}{7}/{8}{9}{10}{11}-{12}{13}'.format(*f'{i:014d}'),
+                )
+                for i in range(suppliers)
+            ],
+            batch_size=2000,
+        )
+
+    def measure(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = len(run())
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000, found
+
+    def report(self, label, term, runs, repeat):
+        self.stdout.write(f'\n   {label}: "{term}"')
+        for name, run in runs:
+            elapsed, found = self.measure(run, repeat)
+            self.stdout.write(f'      {name:<22}{elapsed:>10.1f} ms{found:>6} resultados')
+
+    def select2_runs(self, term):
+        """Requisições do Select2 de produtos: view genérica anterior e ProductLookupView"""
+        factory = RequestFactory()
+        legacy = ModelSelect2Widget(model=Product, search_fields=['name__icontains', 'sku__icontains'])
+        legacy.render('product', None)  # registra o widget no cache, como a página faria
+        legacy_request = factory.get(reverse('django_select2:auto-json'), {'field_id': legacy.field_id, 'term': term})
+        token = ProductWidget().build_attrs({})['data-field_id']
+        lookup_request = factory.get(reverse('inventory:product_lookup'), {'field_id': token, 'term': term})
+
+        def results(view, request):
+            return json.loads(view(request).content)['results']
+
+        def cold_lookup():
+            autocomplete.invalidate(autocomplete.PRODUCTS)
+            return results(ProductLookupView.as_view(), lookup_request)
+
+        return [
+            ('select2 (anterior)', lambda: results(AutoResponseView.as_view(), legacy_request)),
+            ('lookup sem cache', cold_lookup),
+            ('lookup em cache', lambda: results(ProductLookupView.as_view(), lookup_request)),
+        ]
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        products = Product.objects.only('id', 'name', 'sku')
+        suppliers = Supplier.objects.only('id', 'name', 'email')
+
+        with transaction.atomic():
+            self.stdout.write(f'⏳ Gerando {options["products"]:,} produtos e {options["suppliers"]:,} fornecedores...')
+            self.create_data(options['products'], options['suppliers'])
+            trigram.clear_indexes()
+
+            if connection.vendor != 'postgresql':
+                for model, queryset, fields in ((Product, products, ('name', 'sku')), (Supplier, suppliers, ('name',))):
+                    started = time.perf_counter()
+                    trigram.fuzzy_search(queryset, 'x', fields)
+                    self.stdout.write(
+                        f'   🔄 Índice de trigramas de {model._meta.verbose_name_plural}: '
+                        f'{(time.perf_counter() - started) * 1000:.0f} ms (primeira busca do processo)'
+                    )
+
+            started = time.perf_counter()
+            product_prefix_index.build()
+            self.stdout.write(
+                f'   🔄 Índice de prefixos de produtos: {(time.perf_counter() - started) * 1000:.0f} ms '
+                f'({len(product_prefix_index.snapshot.tokens):,} palavras)'
+            )
+
+            self.stdout.write(f'\n📊 Buscas do autocomplete (melhor de {repeat}, 10 resultados)')
+            for label, term in PRODUCT_TERMS:
+                self.report(f'Produtos, {label}', term, [
+                    ('icontains (anterior)', lambda: list(products.filter(
+                        Q(name__icontains=term) | Q(sku__icontains=term) | Q(description__icontains=term)
+                    ).order_by('name')[:10])),
+                    ('busca textual', lambda: list(search_products(term, products)[:10])),
+                    ('trigramas', lambda: trigram.fuzzy_search(products, term, ('name', 'sku'))),
+                    ('índice de prefixos', lambda: product_prefix_index.search(term)),
+                ], repeat)
+            for label, term in SELECT2_TERMS:
+                self.report(f'Select2 de produtos, {label}', term, self.select2_runs(term), repeat)
+            for label, term in SUPPLIER_TERMS:
+                runs = [
+                    ('icontains (anterior)', lambda: list(suppliers.filter(
+                        Q(name__icontains=term) | Q(email__icontains=term) | Q(cnpj__icontains=term)
+                    ).order_by('name')[:10])),
+                    ('trigramas', lambda: trigram.fuzzy_search(suppliers, term, ('name',))),
+                ]
+                if numeric_term(term):
+                    runs.append(('chaves numéricas', lambda: list(
+                        suppliers.filter(numeric_lookup(numeric_term(term))).order_by('name')[:10]
+                    )))
+                self.report(f'Fornecedores, {label}', term, runs, repeat)
+
+            transaction.set_rollback(True)
+
+        trigram.clear_indexes()
+        product_prefix_index.clear()
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (dados descartados)\n'))
@@ -0,0 +1,134 @@
+"""
+Management command de benchmark da valorização do estoque.
+Uso: python manage.py benchmark_valuation [opções]
+
+Cria produtos sintéticos (padrão: 200 mil) dentro de uma transação e compara,
+para os totais do índice de relatórios (valor em estoque, produtos e alertas):
+
+- a soma em Python sobre o queryset anotado (implementação anterior);
+- a agregação no banco sobre todos os produtos;
+- a leitura da valorização mantida por categoria (CategoryValuation).
+
+Mede também o custo extra que a manutenção incremental acrescenta a cada
+movimentação. Os dados são descartados ao final (rollback).
+"""
+
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.test.utils import CaptureQueriesContext
+
+from apps.inventory.services import apply_stock_deltas
+from apps.products.models import Product, Category
+from apps.products.valuation import recompute_valuation, valuation_totals
+
+
+class Command(BaseCommand):
+    """
+    Compara as formas de calcular os totais de valorização do estoque.
+    """
+
+    help = 'Benchmark da valorização do estoque: soma em Python vs. agregação vs. totais mantidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200_000, help='Produtos gerados (padrão: 200000)')
+        parser.add_argument('--categories', type=int, default=50, help='Categorias geradas (padrão: 50)')
+        parser.add_argument('--repeat', type=int, default=3, help='Execuções de cada leitura (padrão: 3)')
+
+    def create_data(self, total, categories_count):
+        categories = Category.objects.bulk_create([
+            Category(name=f'Benchmark valorização {i}') for i in range(categories_count)
+        ])
+        for start in range(0, total, 10_000):
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        name=f'Produto {i}',
+                        sku=f'BENCH-VAL-{i:07d}',
+                        category=categories[i % len(categories)],
+                        price=Decimal(10 + i % 500) / 4,
+                        stock_quantity=i % 120,
+                        minimum_stock=10,
+                    )
+                    for i in range(start, min(start + 10_000, total))
+                ],
+                batch_size=2000,
+            )
+            self.stdout.write(f'   ⏳ {min(start + 10_000, total):,} produtos')
+
+    def python_sum(self):
+        """Implementação anterior: uma instância por produto e soma em Python"""
+        products = Product.objects.annotate(
+            total_value=ExpressionWrapper(
+                F('stock_quantity') * F('price'),
+                output_field=DecimalField(max_digits=15, decimal_places=2)
+            )
+        )
+        return {
+            'total_products': Product.objects.count(),
+            'total_stock_value': sum(p.total_value for p in products),
+            'low_stock_count': Product.objects.filter(stock_quantity__lte=F('minimum_stock')).count(),
+        }
+
+    def database_aggregate(self):
+        return Product.objects.aggregate(
+            total_products=Count('id'),
+            total_stock_value=Sum(
+                ExpressionWrapper(F('stock_quantity') * F('price'), output_field=DecimalField())
+            ),
+            low_stock_count=Count('id', filter=Q(stock_quantity__lte=F('minimum_stock'))),
+        )
+
+    def measure(self, label, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                result = run()
+                timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f'   {label:<34}{min(timings) * 1000:>10.1f} ms{len(queries):>10}'
+            f'   R$ {Decimal(result["total_stock_value"]):,.2f}'
+        )
+
+    def handle(self, *args, **options):
+        total = options['products']
+        repeat = max(1, options['repeat'])
+
+        with transaction.atomic():
+            self.stdout.write(f'⏳ Gerando {total:,} produtos...')
+            self.create_data(total, max(1, options['categories']))
+
+            started = time.perf_counter()
+            recompute_valuation()
+            self.stdout.write(f'   🔄 recompute_valuation: {(time.perf_counter() - started) * 1000:.0f} ms')
+
+            self.stdout.write(f'\n📊 Totais de valorização com {total:,} produtos\n')
+            self.stdout.write(f'   {"Leitura":<34}{"Tempo":>13}{"Consultas":>10}')
+            self.measure('Soma em Python (anterior)', self.python_sum, repeat)
+            self.measure('Agregação no banco', self.database_aggregate, repeat)
+            self.measure('Valorização mantida', valuation_totals, repeat)
+
+            # Custo da manutenção incremental por movimentação
+            product_ids = list(Product.objects.order_by('?').values_list('pk', flat=True)[:500])
+            started = time.perf_counter()
+            for pk in product_ids:
+                apply_stock_deltas({pk: 1})
+            with_valuation = (time.perf_counter() - started) / len(product_ids)
+
+            started = time.perf_counter()
+            for pk in product_ids:
+                Product.objects.filter(pk=pk).update(stock_quantity=F('stock_quantity') + 1)
+            update_only = (time.perf_counter() - started) / len(product_ids)
+
+            self.stdout.write(
+                f'\n   Escrita de saldo: {update_only * 1000:.2f} ms sem valorização | '
+                f'{with_valuation * 1000:.2f} ms com valorização (por movimentação)'
+            )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (dados descartados)\n'))
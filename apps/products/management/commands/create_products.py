@@ -9,6 +9,11 @@ from django.db.models import F
 from decimal import Decimal
 from faker import Faker
 from apps.products.models import Product, Category
+from apps.products.valuation import recompute_valuation
+from apps.inventory.counts import add_rows
+from apps.inventory.models import StockMovement
+from apps.inventory.services import on_movements_created
+from django.contrib.auth import get_user_model
 import random
 
 
@@ -203,6 +208,30 @@ class Command(BaseCommand):
         price = Decimal(f"{base_price}.{cents:02d}")
         return price
     
+    def record_opening_stock(self, products):
+        """
+        Registra o saldo inicial dos produtos no ledger (ajustes), atribuído ao
+        primeiro superusuário: sem isso, reconcile_stock --fix zeraria os saldos.
+        """
+        user = get_user_model().objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            self.stdout.write(self.style.WARNING(
+                '   ⚠️  Nenhum superusuário: saldos iniciais sem ajuste no ledger '
+                '(reconcile_stock os reportará como divergência)'
+            ))
+            return
+        movements = StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    product=product, movement_type=StockMovement.ADJ, quantity=product.stock_quantity,
+                    user=user, reason='Saldo inicial (create_products)',
+                )
+                for product in products if product.stock_quantity
+            ],
+            batch_size=1000,
+        )
+        on_movements_created(movements)
+
     def generate_stock_quantity(self, fake, is_low_stock=False):
         """
         Gera quantidade em estoque.
@@ -358,6 +387,10 @@ class Command(BaseCommand):
                         products_list,
                         batch_size=100
                     )
+                    # bulk_create não dispara sinais: recalcula a valorização por categoria
+                    recompute_valuation()
+                    add_rows(Product, len(products_list))
+                    self.record_opening_stock(products_list)
                     
                     self.stdout.write(
                         self.style.SUCCESS(
@@ -0,0 +1,63 @@
+"""
+Management command para recalcular a valorização do estoque por categoria.
+Uso: python manage.py recompute_valuation [opções]
+
+A valorização (CategoryValuation) é mantida de forma incremental pelos
+serviços de inventário e pelos sinais de Product. Rode este comando depois de
+cargas que não passam por eles (bulk_create, importação direta no banco,
+UPDATE manual) ou com --check para conferir se os totais mantidos conferem.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.products.models import CategoryValuation
+from apps.products.valuation import FIELDS, recompute_valuation
+
+
+class Command(BaseCommand):
+    """
+    Recalcula CategoryValuation a partir dos produtos com um GROUP BY por categoria.
+    """
+
+    help = 'Recalcula a valorização do estoque por categoria (CategoryValuation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Apenas compara os totais mantidos com o recálculo, sem gravar'
+        )
+
+    def snapshot(self):
+        return {
+            row[0]: row[1:]
+            for row in CategoryValuation.objects.values_list('category_id', *FIELDS)
+        }
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            before = self.snapshot()
+            count = recompute_valuation()
+            after = self.snapshot()
+
+            differences = [pk for pk in after if before.get(pk) != after[pk]]
+            for pk in differences:
+                old = dict(zip(FIELDS, before.get(pk) or [None] * len(FIELDS)))
+                new = dict(zip(FIELDS, after[pk]))
+                changed = ', '.join(f'{field}: {old[field]} → {new[field]}' for field in FIELDS if old[field] != new[field])
+                self.stdout.write(f'   ⚠️  Categoria #{pk}: {changed}')
+
+            if options['check']:
+                transaction.set_rollback(True)
+
+        if options['check']:
+            if differences:
+                self.stdout.write(self.style.WARNING(f'\n⚠️  {len(differences)} categoria(s) divergente(s) de {count}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ Valorização confere ({count} categorias)'))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Valorização recalculada: {count} categorias ({len(differences)} corrigida(s))')
+        )
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Q, Sum
+
+
+def fill_valuation(apps, schema_editor):
+    """Calcula a valorização inicial a partir dos produtos existentes"""
+    Product = apps.get_model('products', 'Product')
+    CategoryValuation = apps.get_model('products', 'CategoryValuation')
+
+    rows = Product.objects.order_by().values('category_id').annotate(
+        product_count=Count('id'),
+        total_quantity=Sum('stock_quantity'),
+        total_value=Sum(F('stock_quantity') * F('price'), output_field=DecimalField(max_digits=18, decimal_places=2)),
+        low_stock_count=Count('id', filter=Q(stock_quantity__lte=F('minimum_stock'))),
+        out_of_stock_count=Count('id', filter=Q(stock_quantity=0)),
+    )
+    CategoryValuation.objects.bulk_create([
+        CategoryValuation(
+            category_id=row['category_id'],
+            product_count=row['product_count'],
+            stock_quantity=row['total_quantity'] or 0,
+            total_value=row['total_value'] or 0,
+            low_stock_count=row['low_stock_count'],
+            out_of_stock_count=row['out_of_stock_count'],
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_product_search_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryValuation',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='valuation', serialize=False, to='products.category')),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('stock_quantity', models.BigIntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('low_stock_count', models.PositiveIntegerField(default=0)),
+                ('out_of_stock_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Valorização por Categoria',
+                'verbose_name_plural': 'Valorização por Categoria',
+            },
+        ),
+        migrations.RunPython(fill_valuation, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,113 @@
+# Índice de busca textual de produtos (ver apps/products/search.py):
+# PostgreSQL: coluna gerada search_vector (tsvector, português) + índice GIN.
+# SQLite: tabela virtual FTS5 products_product_fts mantida por triggers.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE products_product ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(sku, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX product_search_vector_idx ON products_product USING GIN (search_vector)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS product_search_vector_idx",
+    "ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE products_product_fts USING fts5(
+        name, sku, description,
+        content='products_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER products_product_fts_insert AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_product_fts(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_delete AFTER DELETE ON products_product BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_update AFTER UPDATE OF name, sku, description ON products_product BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+        INSERT INTO products_product_fts(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END
+    """,
+    # Indexa os produtos existentes e grava os pesos do ranking (nome, SKU, descrição)
+    "INSERT INTO products_product_fts(products_product_fts) VALUES ('rebuild')",
+    "INSERT INTO products_product_fts(products_product_fts, rank) VALUES ('rank', 'bm25(10.0, 10.0, 1.0)')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS products_product_fts_insert",
+    "DROP TRIGGER IF EXISTS products_product_fts_delete",
+    "DROP TRIGGER IF EXISTS products_product_fts_update",
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+
+def sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run(schema_editor, POSTGRESQL_FORWARD)
+    elif vendor == 'sqlite' and sqlite_has_fts5(schema_editor):
+        run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run(schema_editor, POSTGRESQL_REVERSE)
+    elif vendor == 'sqlite':
+        run(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_categoryvaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchEntry',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='products.product')),
+                ('document', models.TextField(db_column='products_product_fts')),
+                ('rank', models.FloatField(db_column='rank')),
+            ],
+            options={
+                'db_table': 'products_product_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Busca aproximada por trigramas (ver apps/inventory/trigram.py): extensão
+# pg_trgm e índices GIN em SKU e nome. Fora do PostgreSQL não há o que criar
+# (índice em memória).
+
+from django.db import migrations
+
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS product_sku_trgm_idx ON products_product USING GIN (sku gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON products_product USING GIN (name gin_trgm_ops)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS product_sku_trgm_idx",
+    "DROP INDEX IF EXISTS product_name_trgm_idx",
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_REVERSE:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
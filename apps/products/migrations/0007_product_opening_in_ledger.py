@@ -0,0 +1,49 @@
+# Produtos já cadastrados não têm o saldo inicial no ledger (False); os
+# cadastrados daqui em diante registram o ajuste de abertura (True). Ver
+# reconcile_stock --seed-opening.
+# No SQLite, adicionar/remover a coluna recria products_product e descarta os
+# triggers do índice FTS5 (0005_product_search): são recriados em seguida.
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+search_migration = import_module('apps.products.migrations.0005_product_search')
+
+SQLITE_TRIGGERS = [
+    statement for statement in search_migration.SQLITE_FORWARD
+    if 'CREATE TRIGGER' in statement
+]
+
+
+def recreate_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite' or not search_migration.sqlite_has_fts5(schema_editor):
+        return
+    search_migration.run(schema_editor, [
+        statement for statement in search_migration.SQLITE_REVERSE if 'DROP TRIGGER' in statement
+    ])
+    search_migration.run(schema_editor, SQLITE_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_trigram_indexes'),
+    ]
+
+    operations = [
+        # Na reversão, roda depois da remoção da coluna
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name='product',
+            name='opening_in_ledger',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='opening_in_ledger',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
@@ -31,6 +31,9 @@ class Product(models.Model):
     stock_quantity = models.PositiveIntegerField(default=0)
     minimum_stock = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Saldo inicial registrado no ledger como ajuste (produtos cadastrados
+    # antes disso: False; ver reconcile_stock --seed-opening)
+    opening_in_ledger = models.BooleanField(default=True, editable=False)
 
     objects = ProductManager()
     
@@ -63,4 +66,47 @@ class Product(models.Model):
             return 'low_stock'      # <- estoque baixo
         else:
             return 'normal'         # <- com estoque normalizado
-    
\ No newline at end of file
+    
+
+class ProductSearchEntry(models.Model):
+    """
+    Linha do índice de busca textual no SQLite: tabela virtual FTS5
+    `products_product_fts`, criada pela migração 0005 e mantida por triggers
+    (ver `search.py`). Não é gerenciada pelo Django e não existe no
+    PostgreSQL, que usa a coluna `search_vector` do próprio produto.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_entry',
+    )
+    # Coluna oculta com o nome da tabela: alvo do MATCH em todas as colunas
+    document = models.TextField(db_column='products_product_fts')
+    # Relevância (bm25 com os pesos configurados na migração; menor = melhor)
+    rank = models.FloatField(db_column='rank')
+
+    class Meta:
+        managed = False
+        db_table = 'products_product_fts'
+
+
+class CategoryValuation(models.Model):
+    """
+    Valorização do estoque por categoria (quantidade, valor e produtos em
+    alerta), mantida de forma incremental a cada movimentação e edição de
+    produto (ver `valuation.py`). Relatórios somam estas linhas em vez de
+    percorrer todos os produtos.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='valuation')
+    product_count = models.PositiveIntegerField(default=0)
+    stock_quantity = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    low_stock_count = models.PositiveIntegerField(default=0)
+    out_of_stock_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Valorização por Categoria"
+        verbose_name_plural = "Valorização por Categoria"
+
+    def __str__(self):
+        return f"{self.category} - R$ {self.total_value}"
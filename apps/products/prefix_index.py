@@ -0,0 +1,238 @@
+"""
+Índice de prefixos em memória para o autocomplete de produtos.
+
+O autocomplete dispara a cada tecla (após o debounce do autocomplete.js) e
+cada termo novo é uma falta no cache do autocomplete. Este índice responde
+sem consultar o banco: cada processo guarda as palavras de nome e SKU dos
+produtos (minúsculas, sem acentos) em uma lista ordenada, com o pk de cada
+ocorrência em um array paralelo, e os dados exibidos no autocomplete por pk.
+Um prefixo é um intervalo da lista (bisect); com várias palavras, percorre-se
+o intervalo mais estreito e confere-se as demais nas palavras do produto.
+Resultados em ordem de palavra completada e, dentro dela, de nome ("mou" →
+os "Mouse ..." antes dos "Mousepad ...").
+
+- Construído na primeira busca do processo, em uma thread: enquanto isso
+  (índice frio) o autocomplete consulta o banco. Não é construído dentro de
+  uma transação (a thread não veria as escritas dela).
+- Mantido pelos sinais post_save/post_delete de Product; escritas que não
+  passam por eles (ex.: saldo alterado por movimentações) aparecem na
+  reconstrução, feita em segundo plano a cada PRODUCT_PREFIX_INDEX_TIMEOUT
+  segundos (mesma validade do cache do autocomplete). Por isso o
+  autocomplete lê o saldo dos produtos encontrados no banco (uma consulta
+  por pk), em vez de usar o `stock` guardado aqui.
+- Sem nenhum resultado no índice (erro de digitação, termo só na descrição),
+  o autocomplete também volta ao banco (busca textual + trigramas).
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+# Palavras consideradas por busca (o restante é ignorado)
+MAX_TERMS = 8
+
+FIELDS = ('pk', 'name', 'sku', 'category__name', 'stock_quantity', 'price')
+
+# Dados exibidos no autocomplete
+Entry = namedtuple('Entry', 'id name sku category stock price')
+
+
+def normalize(text):
+    """Minúsculas e sem acentos ("Mecânico" → "mecanico")"""
+    text = str(text or '').lower()
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(*texts):
+    return sorted({token for text in texts for token in re.findall(r'\w+', normalize(text))})
+
+
+def index_words(name, sku):
+    """Palavras indexadas de um produto, no formato " palavra1 palavra2 ..." (ver `matches`)"""
+    return ' ' + ' '.join(tokenize(name, sku))
+
+
+def search_terms(term):
+    return re.findall(r'\w+', normalize(term))[:MAX_TERMS]
+
+
+def matches(term, words):
+    """True se todas as palavras de `term` são prefixo de alguma de `words` (critério da busca)"""
+    return all(' ' + token in words for token in search_terms(term))
+
+
+def make_entry(row):
+    pk, name, sku, category, stock, price = row
+    return Entry(pk, name, sku, category or 'Sem categoria', stock, float(price))
+
+
+class Snapshot:
+    """
+    Palavras ordenadas + pks (arrays paralelos) e os dados de cada produto.
+    Dentro de cada palavra os pks ficam em ordem de nome, então uma busca
+    para nos primeiros `limit` produtos encontrados.
+    """
+
+    def __init__(self, rows=()):
+        self.entries = {}
+        self.words = {}  # pk → " palavra1 palavra2 ..." (conferência de prefixo em C: " termo" in words)
+        for row in rows:
+            entry = make_entry(row)
+            self.entries[entry.id] = entry
+            self.words[entry.id] = index_words(entry.name, entry.sku)
+
+        pairs = [
+            (token, pk)
+            for pk in sorted(self.entries, key=self.sort_key)
+            for token in self.words[pk].split()
+        ]
+        pairs.sort(key=itemgetter(0))  # estável: mantém a ordem de nome dentro da palavra
+        self.tokens = [token for token, _ in pairs]
+        self.pks = array('q', (pk for _, pk in pairs))
+
+    def sort_key(self, pk):
+        return self.entries[pk].name.lower(), pk
+
+    def token_range(self, token):
+        return bisect_left(self.tokens, token), bisect_right(self.tokens, token)
+
+    def add(self, entry):
+        self.remove(entry.id)
+        self.entries[entry.id] = entry
+        self.words[entry.id] = index_words(entry.name, entry.sku)
+        key = self.sort_key(entry.id)
+        for token in self.words[entry.id].split():
+            start, end = self.token_range(token)
+            position = bisect_left(range(start, end), key, key=lambda i: self.sort_key(self.pks[i]))
+            self.tokens.insert(start + position, token)
+            self.pks.insert(start + position, entry.id)
+
+    def remove(self, pk):
+        for token in self.words.pop(pk, '').split():
+            start, end = self.token_range(token)
+            position = start + bisect_left(range(start, end), self.sort_key(pk), key=lambda i: self.sort_key(self.pks[i]))
+            del self.tokens[position]
+            del self.pks[position]
+        self.entries.pop(pk, None)
+
+    def prefix_range(self, term):
+        return bisect_left(self.tokens, term), bisect_left(self.tokens, term + '\U0010ffff')
+
+    def search(self, terms, limit):
+        # Percorre o intervalo da palavra mais rara e confere as demais
+        ranges = sorted(((self.prefix_range(term), term) for term in terms), key=lambda r: r[0][1] - r[0][0])
+        (start, end), _ = ranges[0]
+        others = [' ' + term for _, term in ranges[1:]]
+
+        seen, results = set(), []
+        for position in range(start, end):
+            pk = self.pks[position]
+            if pk in seen:
+                continue
+            seen.add(pk)
+            words = self.words[pk]
+            if all(term in words for term in others):
+                results.append(self.entries[pk])
+                if len(results) == limit:
+                    break
+        return results
+
+
+class ProductPrefixIndex:
+    """Índice do processo: construção em segundo plano, atualização pelos sinais"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.snapshot = None
+        self.built_at = None
+        self.building = False
+        self.changed = set()
+
+    def build(self):
+        """Lê os produtos e troca o snapshot (reaplicando as escritas feitas durante a leitura)"""
+        with self.lock:
+            self.building = True
+        snapshot = Snapshot(Product.objects.values_list(*FIELDS).iterator(chunk_size=10_000))
+        with self.lock:
+            changed, self.changed = self.changed, set()
+            self.snapshot = snapshot
+            self.built_at = time.monotonic()
+            self.building = False
+        for pk in changed:
+            self.refresh_product(pk)
+
+    def build_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Falha ao construir o índice de prefixos de produtos')
+            with self.lock:
+                self.building = False
+        finally:
+            connection.close()
+
+    def warm_up(self):
+        """Inicia a (re)construção em uma thread, se ainda não estiver em andamento"""
+        if connection.in_atomic_block:
+            return
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+        threading.Thread(target=self.build_in_background, daemon=True).start()
+
+    def search(self, term, limit=10):
+        """
+        Até `limit` produtos com todas as palavras de `term` como prefixo de
+        palavras do nome ou SKU. None se o índice está frio.
+        """
+        terms = search_terms(term)
+        with self.lock:
+            snapshot, built_at = self.snapshot, self.built_at
+        if snapshot is None or time.monotonic() - built_at > settings.PRODUCT_PREFIX_INDEX_TIMEOUT:
+            self.warm_up()
+        if snapshot is None:
+            return None
+        if not terms:
+            return []
+        with self.lock:
+            return snapshot.search(terms, limit)
+
+    def refresh_product(self, pk):
+        """Atualiza um produto a partir do banco (criado, editado ou removido)"""
+        with self.lock:
+            if self.building:
+                self.changed.add(pk)
+            if self.snapshot is None:
+                return
+        row = Product.objects.filter(pk=pk).values_list(*FIELDS).first()
+        with self.lock:
+            if self.snapshot is None:
+                return
+            if row is None:
+                self.snapshot.remove(pk)
+            else:
+                self.snapshot.add(make_entry(row))
+
+
+product_prefix_index = ProductPrefixIndex()
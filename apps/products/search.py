@@ -0,0 +1,155 @@
+"""
+Busca textual de produtos (nome, SKU e descrição) com ranking.
+
+`icontains` com curinga no início não usa índice: cada busca percorre a
+tabela inteira. Aqui a busca passa por um índice de texto, escolhido pelo
+banco em uso:
+
+- PostgreSQL: coluna gerada `search_vector` (tsvector: nome e SKU com peso A,
+  descrição com peso C; dicionário `portuguese`, com stemming) e índice GIN.
+  Ranking por `ts_rank_cd`.
+- SQLite: tabela virtual FTS5 `products_product_fts` (conteúdo externo,
+  sem acentos), mantida por triggers de INSERT/UPDATE/DELETE em
+  `products_product`, inclusive bulk_create e UPDATE em lote. Ranking por
+  bm25 (nome e SKU pesam 10, descrição 1).
+- Outros bancos (ou SQLite sem FTS5): `icontains`, ordenado por nome.
+
+Cada palavra digitada vira um prefixo ("mou gam" encontra "Mouse Gamer")
+e todas precisam aparecer. Use `search_products(termo, queryset)`; o
+resultado vem anotado com `search_rank` (maior = mais relevante) e ordenado
+por ele. O autocomplete (`autocomplete_products`) completa os resultados com
+a busca aproximada por trigramas (apps/inventory/trigram.py), para trechos de
+SKU e erros de digitação.
+"""
+
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Lookup, Q, Value
+from django.db.models.expressions import RawSQL
+
+from apps.inventory.trigram import fuzzy_search
+from .models import Product, ProductSearchEntry
+
+
+# Palavras consideradas por busca (o restante é ignorado)
+MAX_TERMS = 8
+
+FTS_TABLE = ProductSearchEntry._meta.db_table
+SEARCH_VECTOR_COLUMN = 'search_vector'
+
+
+def search_terms(term):
+    """Palavras do termo de busca, em minúsculas (pontuação vira separador)"""
+    return re.findall(r'\w+', (term or '').lower())[:MAX_TERMS]
+
+
+class Match(Lookup):
+    """`coluna MATCH consulta` do FTS5"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+ProductSearchEntry._meta.get_field('document').register_lookup(Match)
+
+
+class SearchBackend:
+    """Interface dos backends: `search` filtra, anota `search_rank` e ordena"""
+
+    def search(self, queryset, terms):
+        raise NotImplementedError
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+
+    def search(self, queryset, terms):
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        table = queryset.model._meta.db_table
+        vector = f'"{table}"."{SEARCH_VECTOR_COLUMN}"'
+        return queryset.alias(
+            search_match=RawSQL(f"{vector} @@ to_tsquery('portuguese', %s)", [tsquery], output_field=BooleanField()),
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(f"ts_rank_cd({vector}, to_tsquery('portuguese', %s))", [tsquery], output_field=FloatField()),
+        ).order_by('-search_rank', 'name')
+
+
+class SQLiteSearchBackend(SearchBackend):
+
+    def search(self, queryset, terms):
+        query = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(search_entry__document__match=query).annotate(
+            search_rank=-F('search_entry__rank'),
+        ).order_by('-search_rank', 'name')
+
+
+class SimpleSearchBackend(SearchBackend):
+
+    fields = ('name', 'sku', 'description')
+
+    def search(self, queryset, terms):
+        matches = [
+            reduce(or_, (Q(**{f'{field}__icontains': term}) for field in self.fields))
+            for term in terms
+        ]
+        return queryset.filter(reduce(and_, matches)).annotate(
+            search_rank=Value(0.0, output_field=FloatField()),
+        ).order_by('name')
+
+
+_backends = {}
+
+
+def get_search_backend():
+    """Backend do banco em uso (verifica uma vez por banco se o índice existe)"""
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == 'postgresql':
+            _backends[vendor] = PostgreSQLSearchBackend()
+        elif vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backends[vendor] = SQLiteSearchBackend()
+        else:
+            _backends[vendor] = SimpleSearchBackend()
+    return _backends[vendor]
+
+
+def search_products(term, queryset=None):
+    """Produtos que contêm todas as palavras de `term` (como prefixo), do mais ao menos relevante"""
+    queryset = Product.objects.all() if queryset is None else queryset
+    terms = search_terms(term)
+    if not terms:
+        return queryset.none()
+    return get_search_backend().search(queryset, terms)
+
+
+# Colunas do Select2 de produtos (ProductLookupView)
+LOOKUP_FIELDS = ('id', 'name', 'sku', 'stock_quantity')
+
+
+def lookup_products(term, offset=0, limit=25):
+    """
+    Uma página do Select2 de produtos: (id, nome, SKU, saldo) da busca textual,
+    por relevância (termo vazio: todos, por nome), com uma linha a mais que
+    `limit` quando há próxima página.
+    """
+    queryset = search_products(term) if term.strip() else Product.objects.order_by('name')
+    return list(queryset.values_list(*LOOKUP_FIELDS)[offset:offset + limit + 1])
+
+
+def autocomplete_products(term, queryset=None, limit=10):
+    """
+    Até `limit` produtos para o autocomplete: primeiro os da busca textual,
+    depois os parecidos por trigramas em nome ou SKU (ex.: "parafuzo").
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    products = list(search_products(term, queryset)[:limit])
+    if len(products) < limit:
+        found = {product.pk for product in products}
+        similar = [product for product in fuzzy_search(queryset, term, ('name', 'sku'), limit) if product.pk not in found]
+        products += similar[:limit - len(products)]
+    return products
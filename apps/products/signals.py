@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.inventory.signals import stock_changed
+from .models import Product
+from .prefix_index import product_prefix_index
+from . import valuation
+
+
+VALUATION_FIELDS = ('category_id', 'price', 'minimum_stock', 'stock_quantity')
+
+
+def is_expression(*values):
+    return any(hasattr(value, 'resolve_expression') for value in values)
+
+
+@receiver(pre_save, sender=Product)
+def remember_valuation(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guarda a parcela atual do produto na valorização antes da edição"""
+    instance._valuation_before = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    if update_fields is not None and not {'category', 'price', 'minimum_stock', 'stock_quantity'} & set(update_fields):
+        return
+    instance._valuation_before = (
+        Product.objects.filter(pk=instance.pk).values_list(*VALUATION_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=Product)
+def update_valuation_on_save(sender, instance, created, raw=False, **kwargs):
+    """Soma à valorização a diferença causada pela criação ou edição do produto"""
+    if raw:
+        return
+
+    before = getattr(instance, '_valuation_before', None)
+    if not created and before is None:
+        return
+
+    if is_expression(instance.price, instance.minimum_stock, instance.stock_quantity):
+        # Ex.: save() com F(); o valor final só existe no banco
+        valuation.recompute_valuation({instance.category_id, *([before[0]] if before else [])})
+        return
+
+    changes = valuation.new_changes()
+    if before:
+        category_id, price, minimum, quantity = before
+        valuation.add_change(changes, category_id, before=valuation.contribution(quantity, price, minimum))
+    valuation.add_change(
+        changes, instance.category_id,
+        after=valuation.contribution(instance.stock_quantity, instance.price, instance.minimum_stock),
+    )
+    valuation.apply_changes(changes)
+
+
+@receiver(post_delete, sender=Product)
+def update_valuation_on_delete(sender, instance, **kwargs):
+    changes = valuation.new_changes()
+    valuation.add_change(
+        changes, instance.category_id,
+        before=valuation.contribution(instance.stock_quantity, instance.price, instance.minimum_stock),
+    )
+    valuation.apply_changes(changes)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_prefix_index(sender, instance, raw=False, **kwargs):
+    """Leva a escrita ao índice de prefixos do autocomplete (deste processo) após o commit"""
+    if not raw:
+        pk = instance.pk
+        transaction.on_commit(lambda: product_prefix_index.refresh_product(pk))
+
+
+@receiver(stock_changed)
+def recompute_on_stock_changed(sender, product_ids=(), **kwargs):
+    """Saldos corrigidos fora das movimentações: recalcula as categorias envolvidas"""
+    category_ids = set(
+        Product.objects.filter(pk__in=product_ids).values_list('category_id', flat=True).distinct()
+    )
+    if category_ids:
+        valuation.recompute_valuation(category_ids)
@@ -1,6 +1,14 @@
 from django.test import TestCase, Client
+from django.core.cache import cache
 from django.urls import reverse
-from apps.products.models import Product, Category
+from django.contrib.auth.models import User
+from apps.products.models import Product, Category, CategoryValuation
+from apps.products.filters import ProductFilter
+from apps.products.search import SQLiteSearchBackend, get_search_backend, lookup_products, search_products
+from apps.products.prefix_index import product_prefix_index
+from apps.products.valuation import FIELDS, recompute_valuation, valuation_totals
+from apps.inventory.services import apply_stock_deltas, decrement_stock
+from decimal import Decimal
 import json
 
 # Create your tests here.
@@ -115,3 +123,230 @@ class ProductAutocompleteAPITest(TestCase):
         self.assertIn('stock', result)
         self.assertIn('price', result)
         self.assertIn('url', result)
+
+
+class ProductSearchTest(TestCase):
+    """Testes da busca textual de produtos (índice FTS5 no SQLite)"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Ferramentas')
+        self.wrench = Product.objects.create(
+            name='Chave Inglesa', sku='CHV-010', description='Aço carbono',
+            price=40, stock_quantity=5, category=self.category
+        )
+        self.kit = Product.objects.create(
+            name='Kit Oficina', sku='KIT-001', description='Inclui chave de fenda e alicate',
+            price=90, stock_quantity=5, category=self.category
+        )
+        self.lathe = Product.objects.create(
+            name='Torno Mecânico', sku='TOR-001', description='Bancada',
+            price=900, stock_quantity=1, category=self.category
+        )
+
+    def names(self, term):
+        return [product.name for product in search_products(term)]
+
+    def test_usa_indice_fts5(self):
+        """Testa se o SQLite de teste usa o backend FTS5"""
+        self.assertIsInstance(get_search_backend(), SQLiteSearchBackend)
+
+    def test_ranking_nome_antes_da_descricao(self):
+        """Testa se o termo no nome vale mais que na descrição"""
+        self.assertEqual(self.names('chave'), ['Chave Inglesa', 'Kit Oficina'])
+
+    def test_prefixo_acentos_e_varias_palavras(self):
+        """Testa busca por prefixo, sem acentos, exigindo todas as palavras"""
+        self.assertEqual(self.names('mecanico'), ['Torno Mecânico'])
+        self.assertEqual(self.names('tor mec'), ['Torno Mecânico'])
+        self.assertEqual(self.names('kit-001'), ['Kit Oficina'])
+        self.assertEqual(self.names('chave alicate'), ['Kit Oficina'])
+        self.assertEqual(self.names('"*'), [])
+
+    def test_indice_acompanha_escritas(self):
+        """Testa se os triggers mantêm o índice em edições, exclusões e bulk_create"""
+        self.lathe.name = 'Furadeira de Bancada'
+        self.lathe.save()
+        self.assertEqual(self.names('torno'), [])
+        self.assertEqual(self.names('furadeira'), ['Furadeira de Bancada'])
+
+        Product.objects.filter(pk=self.wrench.pk).update(description='Cromo vanádio')
+        self.assertEqual(self.names('vanadio'), ['Chave Inglesa'])
+
+        self.kit.delete()
+        self.assertEqual(self.names('alicate'), [])
+
+        Product.objects.bulk_create([
+            Product(name=f'Alicate {i}', sku=f'ALC-{i}', price=1, category=self.category)
+            for i in range(3)
+        ])
+        self.assertEqual(len(self.names('alicate')), 3)
+
+    def test_filtro_e_widget_usam_a_busca(self):
+        """Testa o filtro da lista de produtos e o Select2 de movimentações"""
+        products = ProductFilter({'name': 'mecanico'}, queryset=Product.objects.all()).qs
+        self.assertEqual([product.name for product in products], ['Torno Mecânico'])
+
+        self.assertEqual(
+            [name for _, name, _, _ in lookup_products('chave')],
+            ['Chave Inglesa', 'Kit Oficina']
+        )
+
+
+class ProductPrefixIndexTest(TestCase):
+    """Testes do índice de prefixos em memória do autocomplete"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Periféricos')
+        self.mouse = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150, stock_quantity=50, category=self.category
+        )
+        Product.objects.create(name='Teclado Mecânico', sku='TECL-001', price=300, stock_quantity=30, category=self.category)
+        Product.objects.create(name='Mousepad Grande', sku='PAD-001', price=40, stock_quantity=8, category=self.category)
+        product_prefix_index.build()
+
+    def tearDown(self):
+        product_prefix_index.clear()
+
+    def names(self, term):
+        return [entry.name for entry in product_prefix_index.search(term)]
+
+    def test_prefixos_de_nome_e_sku(self):
+        """Testa prefixos, várias palavras, acentos e ordem por nome"""
+        self.assertEqual(self.names('mous'), ['Mouse Gamer', 'Mousepad Grande'])
+        self.assertEqual(self.names('mou gam'), ['Mouse Gamer'])
+        self.assertEqual(self.names('MECAN'), ['Teclado Mecânico'])
+        self.assertEqual(self.names('tecl-00'), ['Teclado Mecânico'])
+        self.assertEqual(self.names('cadeira'), [])
+        entry = product_prefix_index.search('gamer')[0]
+        self.assertEqual((entry.category, entry.stock, entry.price), ('Periféricos', 50, 150.0))
+
+    def test_sinais_mantem_o_indice(self):
+        """Testa criação, edição e exclusão refletidas no índice após o commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Monitor Curvo', sku='MON-001', price=900, category=self.category)
+        self.assertEqual(self.names('monitor'), ['Monitor Curvo'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mouse.name = 'Trackball'
+            self.mouse.save()
+        self.assertEqual(self.names('gamer'), [])
+        self.assertEqual(self.names('track'), ['Trackball'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mouse.delete()
+        self.assertEqual(self.names('track'), [])
+
+    def test_autocomplete_pelo_indice(self):
+        """Testa o autocomplete respondido pelo índice (saldo do banco) e a volta ao banco sem resultado"""
+        # Versão do autocomplete (reports.DataVersion) e saldo dos encontrados, sem busca no banco
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('products:product_autocomplete'), {'q': 'mous'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Mouse Gamer', 'Mousepad Grande'])
+
+        # Erro de digitação: índice sem resultado, busca no banco (trigramas)
+        response = self.client.get(reverse('products:product_autocomplete'), {'q': 'teclado mecanco'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Teclado Mecânico'])
+
+
+    def test_saldo_atual_com_indice_desatualizado(self):
+        """Testa se o autocomplete mostra o saldo do banco, não o do índice (só atualizado na reconstrução)"""
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_deltas({self.mouse.pk: -20})
+        self.assertEqual(product_prefix_index.search('gamer')[0].stock, 50)
+
+        response = self.client.get(reverse('products:product_autocomplete'), {'q': 'mouse gamer'})
+        self.assertEqual([r['stock'] for r in response.json()['results']], [30])
+
+    def test_cache_do_autocomplete(self):
+        """Testa termo sem acentos/maiúsculas, prefixo reaproveitado e invalidação por edição"""
+        url = reverse('products:product_autocomplete')
+        self.client.get(url, {'q': 'Mecâ'})
+        product_prefix_index.clear()  # daqui em diante, só o cache responde sem o índice
+
+        # Só a versão do autocomplete (reports.DataVersion)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'q': 'meca'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Teclado Mecânico'])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'q': 'MECANICO tec'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Teclado Mecânico'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(name='Teclado Mecânico').get().delete()
+        response = self.client.get(url, {'q': 'meca'})
+        self.assertEqual(response.json()['results'], [])
+
+
+class CategoryValuationTest(TestCase):
+    """Testes da valorização do estoque mantida por categoria"""
+
+    def setUp(self):
+        self.electronics = Category.objects.create(name='Eletrônicos')
+        self.office = Category.objects.create(name='Escritório')
+        self.mouse = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=50, minimum_stock=10, category=self.electronics
+        )
+        self.pen = Product.objects.create(
+            name='Caneta', sku='CAN-001', price=Decimal('2.50'),
+            stock_quantity=4, minimum_stock=10, category=self.office
+        )
+
+    def assertMatchesRecompute(self):
+        maintained = list(CategoryValuation.objects.order_by('pk').values_list('category_id', *FIELDS))
+        recompute_valuation()
+        self.assertEqual(maintained, list(CategoryValuation.objects.order_by('pk').values_list('category_id', *FIELDS)))
+
+    def test_totais_mantidos_nas_escritas(self):
+        """Testa se movimentações e edições de produto mantêm os totais iguais ao recálculo"""
+        self.assertEqual(valuation_totals(), {
+            'total_products': 2,
+            'total_stock_value': Decimal('7510.00'),
+            'low_stock_count': 1,
+            'out_of_stock_count': 0,
+        })
+
+        apply_stock_deltas({self.mouse.pk: -45, self.pen.pk: 20})
+        self.assertTrue(decrement_stock(self.mouse.pk, 5))
+        totals = valuation_totals()
+        self.assertEqual(totals['total_stock_value'], Decimal('60.00'))
+        self.assertEqual(totals['low_stock_count'], 1)
+        self.assertEqual(totals['out_of_stock_count'], 1)
+        self.assertMatchesRecompute()
+
+        self.pen.refresh_from_db()
+        self.pen.price = Decimal('3.00')
+        self.pen.category = self.electronics
+        self.pen.save()
+        self.assertEqual(self.electronics.valuation.product_count, 2)
+        self.assertEqual(CategoryValuation.objects.get(pk=self.electronics.pk).total_value, Decimal('72.00'))
+        self.assertEqual(CategoryValuation.objects.get(pk=self.office.pk).product_count, 0)
+        self.assertMatchesRecompute()
+
+        self.pen.delete()
+        self.assertEqual(valuation_totals()['total_products'], 1)
+        self.assertMatchesRecompute()
+
+    def test_indice_de_relatorios_le_os_totais(self):
+        """Testa o índice de relatórios lendo a valorização sem percorrer os produtos"""
+        user = User.objects.create_user(username='gerente', password='senha123456')
+        self.client.force_login(user)
+        Product.objects.bulk_create([
+            Product(name=f'Item {i}', sku=f'ITEM-{i}', price=1, stock_quantity=1, category=self.office)
+            for i in range(30)
+        ])
+        recompute_valuation()
+
+        # Sessão, usuário, perfil, versão dos dados, totais, movimentações do mês e categorias
+        cache.clear()
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('reports:report_index'))
+        self.assertEqual(response.context['total_products'], 32)
+        self.assertEqual(response.context['total_stock_value'], Decimal('7540.00'))
+        self.assertContains(response, 'Valor em Estoque por Categoria')
+
+        # Repetido sem escritas: só a versão além da sessão
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('reports:report_index'))
+        self.assertEqual(response.context['total_products'], 32)
@@ -0,0 +1,157 @@
+"""
+Valorização do estoque mantida por categoria (CategoryValuation).
+
+Cada escrita de saldo ou de produto soma a sua diferença às linhas de
+categoria com um UPDATE ... SET campo = campo + diferença, então os
+relatórios leem poucos registros já somados em vez de percorrer os produtos:
+
+- `record_stock_deltas`: chamada por `inventory.services` depois de alterar
+  `stock_quantity` com UPDATE (movimentações e baixas).
+- sinais de Product (`signals.py`): criação, edição (preço, mínimo,
+  categoria, saldo) e exclusão.
+- `recompute_valuation`: recálculo completo ou por categoria, usado após
+  cargas em lote (bulk_create/update não disparam sinais) e pelo comando
+  `recompute_valuation`.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Category, CategoryValuation, Product
+
+
+FIELDS = ('product_count', 'stock_quantity', 'total_value', 'low_stock_count', 'out_of_stock_count')
+
+
+def contribution(quantity, price, minimum):
+    """Parcela de um produto nos totais da categoria (na ordem de FIELDS)"""
+    return (
+        1,
+        quantity,
+        quantity * Decimal(str(price)),
+        int(quantity <= minimum),
+        int(quantity == 0),
+    )
+
+
+def add_change(changes, category_id, after=None, before=None):
+    """Acumula em `changes` a diferença entre duas parcelas da mesma categoria"""
+    totals = changes[category_id]
+    for index in range(len(FIELDS)):
+        totals[index] += (after[index] if after else 0) - (before[index] if before else 0)
+
+
+def new_changes():
+    return defaultdict(lambda: [0] * len(FIELDS))
+
+
+def apply_changes(changes):
+    """Soma as diferenças acumuladas às linhas de cada categoria (uma UPDATE por categoria)"""
+    now = timezone.now()
+    for category_id, values in changes.items():
+        if not any(values):
+            continue
+        updated = CategoryValuation.objects.filter(category_id=category_id).update(
+            updated_at=now,
+            **{field: F(field) + value for field, value in zip(FIELDS, values) if value},
+        )
+        if not updated:
+            # Categoria ainda sem linha: calcula a partir dos produtos (já inclui esta escrita)
+            recompute_valuation([category_id])
+
+
+def record_stock_deltas(deltas):
+    """
+    Atualiza a valorização depois de aplicar `deltas` ({product_id: variação})
+    ao saldo dos produtos. Lê os produtos alterados (saldo já atualizado) em
+    uma consulta para saber quem entrou ou saiu do alerta de estoque baixo.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    changes = new_changes()
+    rows = Product.objects.filter(pk__in=deltas).values_list(
+        'pk', 'category_id', 'price', 'minimum_stock', 'stock_quantity'
+    )
+    for pk, category_id, price, minimum, quantity in rows:
+        add_change(
+            changes, category_id,
+            after=contribution(quantity, price, minimum),
+            before=contribution(quantity - deltas[pk], price, minimum),
+        )
+    apply_changes(changes)
+
+
+def recompute_valuation(category_ids=None):
+    """
+    Recalcula a valorização a partir dos produtos (todas as categorias ou só
+    `category_ids`) em um GROUP BY e grava com um único upsert.
+    Retorna o número de categorias recalculadas.
+    """
+    products = Product.objects.order_by()
+    categories = Category.objects.order_by()
+    if category_ids is not None:
+        products = products.filter(category_id__in=category_ids)
+        categories = categories.filter(pk__in=category_ids)
+
+    zero = Value(0)
+    rows = products.values('category_id').annotate(
+        product_count=Count('id'),
+        total_quantity=Coalesce(Sum('stock_quantity'), zero),
+        total_value=Coalesce(
+            Sum(F('stock_quantity') * F('price'), output_field=DecimalField(max_digits=18, decimal_places=2)),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=18, decimal_places=2),
+        ),
+        low_stock_count=Count('id', filter=Q(stock_quantity__lte=F('minimum_stock'))),
+        out_of_stock_count=Count('id', filter=Q(stock_quantity=0)),
+    )
+    by_category = {
+        row['category_id']: CategoryValuation(
+            category_id=row['category_id'],
+            product_count=row['product_count'],
+            stock_quantity=row['total_quantity'],
+            total_value=row['total_value'],
+            low_stock_count=row['low_stock_count'],
+            out_of_stock_count=row['out_of_stock_count'],
+        )
+        for row in rows
+    }
+
+    valuations = [
+        by_category.get(pk) or CategoryValuation(category_id=pk)
+        for pk in categories.values_list('pk', flat=True)
+    ]
+    CategoryValuation.objects.bulk_create(
+        valuations,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['category'],
+        update_fields=[*FIELDS, 'updated_at'],
+    )
+    return len(valuations)
+
+
+def valuation_totals(**extra):
+    """Totais gerais do estoque (soma das categorias, uma agregação, mais as colunas `extra`)"""
+    zero = Value(0)
+    return CategoryValuation.objects.aggregate(
+        **extra,
+        total_products=Coalesce(Sum('product_count'), zero),
+        total_stock_value=Coalesce(
+            Sum('total_value'), Value(Decimal('0')),
+            output_field=DecimalField(max_digits=18, decimal_places=2),
+        ),
+        low_stock_count=Coalesce(Sum('low_stock_count'), zero),
+        out_of_stock_count=Coalesce(Sum('out_of_stock_count'), zero),
+    )
+
+
+def category_valuations():
+    """Valorização por categoria, da mais valiosa para a menos valiosa"""
+    return CategoryValuation.objects.select_related('category').order_by('-total_value')
@@ -11,21 +11,27 @@ from django.views.generic import (
     DeleteView,
 )
 from django.views import View
-from django.views.decorators.cache import cache_page
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
 from django.http import JsonResponse
-from django.db.models import Q, ProtectedError
+from django.db import transaction
+from django.db.models import ProtectedError
 from django.utils.decorators import method_decorator
 from django.shortcuts import redirect
 
 from .models import Product, Category
 from .forms import ProductForm, CategoryForm
 from .filters import ProductFilter
+from .search import autocomplete_products
+from . import prefix_index
+from .prefix_index import Entry, product_prefix_index
 
 from apps.accounts.mixins import AdminRequiredMixin, ManagerOrAdminRequiredMixin, admin_required
+from apps.inventory.autocomplete import PRODUCTS, AutocompleteCache
+from apps.inventory.pagination import EstimatedCountPaginator
+from apps.inventory.services import record_stock_adjustment
 from django_ratelimit.decorators import ratelimit
 
 
@@ -42,6 +48,7 @@ class ProductListView(LoginRequiredMixin, ListView):
     success_url = reverse_lazy('products:product_list')
     context_object_name = 'products'
     paginate_by = 15
+    paginator_class = EstimatedCountPaginator
 
     def get_queryset(self):
         """Adiciona busca simples ao queryset"""
@@ -86,15 +93,18 @@ class ProductDetailView(LoginRequiredMixin, DetailView):
 
 
 @method_decorator(ratelimit(key='ip', rate='30/m', method='GET'), name='dispatch')  # Rate limiting para prevenir abuso API
-@method_decorator(cache_page(60 * 5), name='dispatch')      # Cache de 5 minutos
 class ProductAutocompleteView(View):
     """
     API endpoint para autocomplete de produtos.
     API com rate limit: máximo 30 requisições por minuto por IP.
     Retorna JSON com produtos que correspondem ao termo de busca.
-    Cache: 5 minutos para reduzir carga no DB.
+    Cache por termo normalizado (maiúsculas, acentos e espaços não importam),
+    invalidado pelas gravações; termos mais longos reaproveitam a lista de
+    um prefixo (ver apps/inventory/autocomplete.py).
     """
 
+    autocomplete_cache = AutocompleteCache(PRODUCTS, matches=prefix_index.matches, fold_accents=True)
+
     def get(self, request):
         # Pega o termo de busca
         query = request.GET.get('q', '').strip()
@@ -104,15 +114,41 @@ class ProductAutocompleteView(View):
             return JsonResponse({'results': []})
         
         logger.info(f"Autocomplete search: query='{query}' ip={request.META.get('REMOTE_ADDR')}")
-        
-        # Busca produtos (case-insensitive, busca parcial)
-        products = Product.objects.filter(
-            Q(name__icontains=query) |
-            Q(sku__icontains=query) |
-            Q(description__icontains=query)
-        ).select_related('category').only(
-            'id', 'name', 'sku', 'stock_quantity', 'price', 'category__name'
-        ).order_by('name')[:10]  # Limita a 10 resultados
+
+        results = self.autocomplete_cache.get(query, self.search)
+
+        return JsonResponse({
+            'results': results,
+            'count': len(results),
+            'query': query
+        })
+
+    def search(self, query):
+        """Resultados e palavras indexadas de cada um (None quando vêm do banco)"""
+        # Prefixos de nome/SKU no índice em memória do processo (sem a busca no banco)
+        products = product_prefix_index.search(query, limit=10)
+        if products:
+            # Saldo lido do banco: o do índice só acompanha as movimentações na reconstrução
+            current = Product.objects.only('stock_quantity').in_bulk([p.id for p in products])
+            products = [p._replace(stock=current[p.id].stock_quantity) for p in products if p.id in current]
+        words = [prefix_index.index_words(p.name, p.sku) for p in products] if products else None
+
+        if not products:
+            # Índice frio ou sem resultado: índice de texto (nome, SKU e descrição),
+            # por relevância, completando com os parecidos por trigramas (erros de digitação)
+            products = [
+                Entry(
+                    p.id, p.name, p.sku, p.category.name if p.category else 'Sem categoria',
+                    p.stock_quantity, float(p.price),
+                )
+                for p in autocomplete_products(
+                    query,
+                    Product.objects.select_related('category').only(
+                        'id', 'name', 'sku', 'stock_quantity', 'price', 'category__name'
+                    ),
+                    limit=10,
+                )
+            ]
 
         # Formata resultados como JSON
         results = [
@@ -120,19 +156,14 @@ class ProductAutocompleteView(View):
                 'id': p.id,
                 'name': p.name,
                 'sku': p.sku,
-                'category': p.category.name if p.category else 'Sem categoria',
-                'stock': p.stock_quantity,
-                'price': float(p.price),
+                'category': p.category,
+                'stock': p.stock,
+                'price': p.price,
                 'url': f'/products/{p.id}/',  # URL para detalhes
             }
             for p in products
         ]
-
-        return JsonResponse({
-            'results': results,
-            'count': len(results),
-            'query': query
-        })
+        return results, words
 
 
 
@@ -151,6 +182,15 @@ class ProductCreateView(ManagerOrAdminRequiredMixin, LoginRequiredMixin, Success
         context['form_title'] = 'Criar Produto'
         return context
 
+    def form_valid(self, form):
+        """Salva o produto e registra o saldo inicial no ledger (ajuste)"""
+        with transaction.atomic():
+            response = super().form_valid(form)
+            record_stock_adjustment(
+                self.object, self.object.stock_quantity, self.request.user, 'Saldo inicial (cadastro do produto)'
+            )
+        return response
+
 
 
 class ProductUpdateView(ManagerOrAdminRequiredMixin, LoginRequiredMixin, SuccessMessageMixin, UpdateView):
@@ -167,6 +207,16 @@ class ProductUpdateView(ManagerOrAdminRequiredMixin, LoginRequiredMixin, Success
         context = super().get_context_data(**kwargs)
         context['form_title'] = 'Editar Produto'
         return context
+
+    def form_valid(self, form):
+        """Salva o produto e registra no ledger a alteração de saldo feita no formulário (ajuste)"""
+        with transaction.atomic():
+            before = Product.objects.select_for_update().values_list('stock_quantity', flat=True).get(pk=self.object.pk)
+            response = super().form_valid(form)
+            record_stock_adjustment(
+                self.object, self.object.stock_quantity - before, self.request.user, 'Ajuste na edição do produto'
+            )
+        return response
     
 
 
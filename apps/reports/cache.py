@@ -0,0 +1,32 @@
+"""
+Cache dos resultados dos relatórios (páginas de linhas).
+
+A chave combina o nome do relatório, os filtros canônicos
+(`ReportQuery.normalized()`: todos os filtros presentes, com padrão, datas em
+AAAA-MM-DD, em ordem), os parâmetros da página e a versão dos dados
+(`versioning.data_version`). Qualquer escrita em movimentações ou produtos
+muda a versão, então uma entrada nunca é lida depois de uma escrita: as
+entradas antigas só deixam de ser usadas e expiram em
+REPORT_RESULT_CACHE_TIMEOUT.
+
+A versão é lida na mesma consulta dos totais (ver `queries.py`): um
+acerto custa essa consulta, em vez de totais + linhas.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def result_key(report, version, part, filters, **params):
+    """Chave do cache: relatório, versão dos dados e hash dos filtros/parâmetros canônicos"""
+    payload = json.dumps({'filters': filters, 'params': params}, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:24]
+    return f'reports:{report}:{part}:{version}:{digest}'
+
+
+def cached_result(key, compute):
+    """Lê `key` do cache ou calcula com `compute()` e grava"""
+    return cache.get_or_set(key, compute, settings.REPORT_RESULT_CACHE_TIMEOUT)
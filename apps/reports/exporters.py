@@ -0,0 +1,93 @@
+"""
+Formatos de exportação disponíveis para os jobs de exportação.
+
+Cada formato é uma subclasse de `Exporter` registrada com `@register`; para
+adicionar um formato basta implementar `write` e registrá-lo. Os relatórios
+(colunas, linhas e filtros) vêm de `exports.EXPORT_REPORTS`.
+"""
+
+from pathlib import Path
+
+from django.conf import settings
+
+from . import pdf
+from .exports import stream_csv, write_xlsx
+
+
+EXPORTERS = {}
+
+
+def register(cls):
+    EXPORTERS[cls.format] = cls()
+    return cls
+
+
+class Exporter:
+    """Formato de exportação: grava as linhas de um relatório em `path`"""
+
+    format = None
+    label = None
+    extension = None
+    content_type = 'application/octet-stream'
+
+    def output_path(self, job, report):
+        path = Path(settings.REPORT_CACHE_DIR) / 'exports'
+        path.mkdir(parents=True, exist_ok=True)
+        return path / f'{job.pk}-{report.filename}.{self.extension}'
+
+    def is_cached(self, path):
+        """Indica se `path` já contém o arquivo pronto (o job termina sem gerar nada)"""
+        return False
+
+    def write(self, report, filters, rows, path):
+        raise NotImplementedError
+
+    def published(self, report, filters, path):
+        """Chamado depois que o arquivo foi movido para `path`"""
+
+
+@register
+class CsvExporter(Exporter):
+    format = 'csv'
+    label = 'CSV'
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def write(self, report, filters, rows, path):
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            for chunk in stream_csv(report.header, (report.csv_row(row) for row in rows)):
+                output.write(chunk)
+
+
+@register
+class XlsxExporter(Exporter):
+    format = 'xlsx'
+    label = 'Excel'
+    extension = 'xlsx'
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    def write(self, report, filters, rows, path):
+        write_xlsx(report.title, report.header, (report.xlsx_row(row) for row in rows), report.xlsx_formats, output=path)
+
+
+@register
+class PdfExporter(Exporter):
+    """PDFs ficam no cache por filtros + versão dos dados e são compartilhados entre jobs"""
+
+    format = 'pdf'
+    label = 'PDF'
+    extension = 'pdf'
+    content_type = 'application/pdf'
+
+    def output_path(self, job, report):
+        return pdf.cached_path(report.name, job.filters)
+
+    def is_cached(self, path):
+        return path.exists()
+
+    def write(self, report, filters, rows, path):
+        with open(path, 'wb') as output:
+            pdf.RENDERERS[report.name](output, filters, rows)
+
+    def published(self, report, filters, path):
+        pdf.publish(report.name, filters, path)
@@ -0,0 +1,167 @@
+"""
+Exportações dos relatórios: cabeçalhos, conversões de cada formato e
+gravação em CSV/XLSX.
+
+As linhas vêm das consultas de `queries.py` (mesmos filtros e projeção da
+página do relatório); views, PDFs e jobs de exportação usam os relatórios de
+`EXPORT_REPORTS`, para que todas as saídas tenham os mesmos filtros e colunas.
+"""
+
+import csv
+import io
+import tempfile
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from .queries import MovementReportQuery, StockReportQuery
+
+
+# -- Cabeçalhos --
+STOCK_EXPORT_HEADER = [
+    'Produto', 'SKU', 'Categoria',
+    'Estoque Atual', 'Estoque Mínimo',
+    'Preço Unit.', 'Valor Total', 'Status'
+]
+
+MOVEMENT_EXPORT_HEADER = [
+    'Data/Hora', 'Produto', 'SKU',
+    'Tipo', 'Quantidade', 'Responsável',
+    'Motivo'
+]
+
+
+# -- Gravação --
+def stream_csv(header, rows, chunk_rows=1000):
+    """
+    Gera o CSV em blocos de `chunk_rows` linhas. O cabeçalho sai antes da
+    primeira consulta, então o primeiro byte chega sem esperar o banco.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+# Formatos numéricos por coluna nas planilhas (índice da coluna -> formato)
+STOCK_XLSX_FORMATS = {5: '#,##0.00', 6: '#,##0.00'}
+MOVEMENT_XLSX_FORMATS = {0: 'dd/mm/yyyy hh:mm'}
+
+
+def write_xlsx(title, header, rows, formats=None, output=None):
+    """
+    Grava as linhas em uma planilha no modo write-only do openpyxl (linhas
+    vão direto para o arquivo, sem montar a planilha inteira em memória).
+    Sem `output`, grava em um arquivo temporário e o retorna posicionado
+    no início.
+    """
+    formats = formats or {}
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.freeze_panes = 'A2'
+
+    header_cells = []
+    for value in header:
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    sheet.append(header_cells)
+
+    for row in rows:
+        row = list(row)
+        for index, number_format in formats.items():
+            cell = WriteOnlyCell(sheet, value=row[index])
+            cell.number_format = number_format
+            row[index] = cell
+        sheet.append(row)
+
+    if output is not None:
+        workbook.save(output)
+        return output
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+# -- Relatórios exportáveis --
+class ExportReport:
+    """
+    Relatório exportável: cabeçalho, consulta (`queries.ReportQuery`) e
+    conversões de cada formato. `normalize` reduz a querystring aos filtros
+    usados pelo relatório (gravados nos jobs de exportação e usados em
+    chaves de cache).
+    """
+
+    def __init__(self, name, title, filename, header, query, csv_row=None, xlsx_row=None, xlsx_formats=None):
+        self.name = name
+        self.title = title
+        self.filename = filename
+        self.header = header
+        self.query = query
+        self.csv_row = csv_row or (lambda row: row)
+        self.xlsx_row = xlsx_row or (lambda row: row)
+        self.xlsx_formats = xlsx_formats or {}
+
+    def normalize(self, params):
+        return self.query(params).normalized()
+
+    def rows(self, filters):
+        """Linhas tipadas do relatório inteiro, lidas em blocos"""
+        return self.query(filters).export_rows()
+
+    def count(self, filters):
+        return self.query(filters).total_rows()
+
+
+def stock_csv_row(row):
+    name, sku, category, quantity, minimum, price, total_value, status = row
+    return (name, sku, category, quantity, minimum, f'{price:.2f}', f'{total_value:.2f}', status)
+
+
+def movement_csv_row(row):
+    created_at, *rest = row
+    return (created_at.strftime('%d/%m/%Y %H:%M'), *rest)
+
+
+def movement_xlsx_row(row):
+    # Excel não guarda fuso horário: grava a data/hora local sem tzinfo
+    created_at, *rest = row
+    return (created_at.replace(tzinfo=None), *rest)
+
+
+EXPORT_REPORTS = {
+    'stock': ExportReport(
+        name='stock',
+        title='Estoque',
+        filename='relatorio_estoque',
+        header=STOCK_EXPORT_HEADER,
+        query=StockReportQuery,
+        csv_row=stock_csv_row,
+        xlsx_formats=STOCK_XLSX_FORMATS,
+    ),
+    'movements': ExportReport(
+        name='movements',
+        title='Movimentações',
+        filename='relatorio_movimentacoes',
+        header=MOVEMENT_EXPORT_HEADER,
+        query=MovementReportQuery,
+        csv_row=movement_csv_row,
+        xlsx_row=movement_xlsx_row,
+        xlsx_formats=MOVEMENT_XLSX_FORMATS,
+    ),
+}
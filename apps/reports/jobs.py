@@ -0,0 +1,175 @@
+"""
+Fila de jobs de exportação (ExportJob), processada por
+`python manage.py run_export_worker`.
+
+- `submit_export` cria o job com os filtros normalizados do relatório.
+- O worker pega jobs com `claim_next_job`: um UPDATE condicional
+  (`status = 'pending'` e vaga abaixo de EXPORT_MAX_RUNNING, contada no
+  próprio UPDATE) que precisa alterar exatamente uma linha, para que dois
+  workers não peguem o mesmo job, mesmo no SQLite (onde select_for_update
+  não trava nada). O limite mantém as exportações longe do tráfego
+  interativo; no PostgreSQL, claims no mesmo instante podem passar dele por
+  um job cada, o que não duplica trabalho.
+- `run_job` grava o arquivo em um temporário, atualiza `rows_written` e o
+  `heartbeat_at` a cada bloco e publica o arquivo com um rename atômico.
+- `requeue_stale_jobs` devolve à fila só jobs sem heartbeat há mais de
+  EXPORT_STALE_MINUTES (worker interrompido), não os que estão demorando.
+"""
+
+import logging
+import os
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from .exporters import EXPORTERS
+from .exports import EXPORT_REPORTS
+from .models import ExportJob
+
+
+logger = logging.getLogger(__name__)
+
+# Linhas entre atualizações de progresso do job
+PROGRESS_EVERY = 1000
+
+# Jobs da fila tentados por `claim_next_job` (os demais foram pegos por outros workers)
+CLAIM_ATTEMPTS = 5
+
+
+class ExportLimitExceeded(Exception):
+    """O usuário já tem o máximo de exportações na fila ou em andamento"""
+
+
+def submit_export(user, report_name, export_format, params):
+    """
+    Cria (ou reaproveita) o job de exportação de `report_name` no formato
+    `export_format` com os filtros de `params`. Um job idêntico do mesmo
+    usuário ainda na fila ou em andamento é reaproveitado.
+    """
+    report = EXPORT_REPORTS[report_name]
+    filters = report.normalize(params)
+
+    active = ExportJob.objects.filter(user=user, status__in=ExportJob.ACTIVE_STATUSES)
+    existing = active.filter(report=report_name, format=export_format, filters=filters).first()
+    if existing:
+        return existing
+
+    if active.count() >= settings.EXPORT_MAX_ACTIVE_PER_USER:
+        raise ExportLimitExceeded()
+
+    job = ExportJob.objects.create(user=user, report=report_name, format=export_format, filters=filters)
+
+    if settings.EXPORT_JOBS_INLINE:
+        now = timezone.now()
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.RUNNING, started_at=now, heartbeat_at=now)
+        run_job(job)
+        job.refresh_from_db()
+
+    return job
+
+
+def claim_next_job():
+    """Marca o job mais antigo da fila como em andamento e o retorna (None se não houver vaga ou job)"""
+    # Vaga conferida no próprio UPDATE (sem depender de trava de linha, que o
+    # SQLite ignora): jobs em andamento < EXPORT_MAX_RUNNING
+    running = Coalesce(Subquery(
+        ExportJob.objects.filter(status=ExportJob.RUNNING).order_by()
+        .values('status').annotate(count=Count('pk')).values('count')
+    ), 0)
+    has_slot = LessThan(running, settings.EXPORT_MAX_RUNNING)
+
+    pending = (
+        ExportJob.objects.filter(status=ExportJob.PENDING)
+        .order_by('created_at')
+        .values_list('pk', flat=True)[:CLAIM_ATTEMPTS]
+    )
+    for pk in pending:
+        now = timezone.now()
+        # Só um worker muda a linha de "pending" para "running": quem não
+        # alterou exatamente uma linha perdeu o job (ou a vaga) e tenta o próximo
+        claimed = ExportJob.objects.filter(has_slot, pk=pk, status=ExportJob.PENDING).update(
+            status=ExportJob.RUNNING, started_at=now, heartbeat_at=now
+        )
+        if claimed == 1:
+            return ExportJob.objects.get(pk=pk)
+    return None
+
+
+def heartbeat(job, **fields):
+    """Renova o sinal de vida do job (junto com `fields`, ex.: progresso)"""
+    ExportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now(), **fields)
+
+
+def counted(rows, job):
+    """Repassa as linhas atualizando `rows_written` do job a cada bloco"""
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % PROGRESS_EVERY == 0:
+            heartbeat(job, rows_written=written)
+    job.rows_written = written
+
+
+def run_job(job):
+    """Gera o arquivo de um job já marcado como em andamento"""
+    report = EXPORT_REPORTS[job.report]
+    exporter = EXPORTERS[job.format]
+    path = exporter.output_path(job, report)
+
+    try:
+        if not exporter.is_cached(path):
+            job.total_rows = report.count(job.filters)
+            heartbeat(job, total_rows=job.total_rows)
+
+            tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+            try:
+                exporter.write(report, job.filters, counted(report.rows(job.filters), job), tmp)
+                os.replace(tmp, path)
+            finally:
+                tmp.unlink(missing_ok=True)
+            exporter.published(report, job.filters, path)
+        else:
+            job.rows_written = job.total_rows = report.count(job.filters)
+
+        job.status = ExportJob.DONE
+        job.file_path = str(path)
+    except Exception as exc:
+        logger.exception('Falha no job de exportação #%s', job.pk)
+        job.status = ExportJob.FAILED
+        job.error = str(exc)[:1000]
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'rows_written', 'total_rows', 'file_path', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Devolve à fila jobs em andamento sem heartbeat há mais de
+    EXPORT_STALE_MINUTES (worker interrompido). Jobs longos que continuam
+    renovando o heartbeat não são tocados.
+    """
+    limit = timezone.now() - timedelta(minutes=settings.EXPORT_STALE_MINUTES)
+    stale = Q(heartbeat_at__lt=limit) | Q(heartbeat_at__isnull=True, started_at__lt=limit)
+    return ExportJob.objects.filter(stale, status=ExportJob.RUNNING).update(
+        status=ExportJob.PENDING, started_at=None, heartbeat_at=None, rows_written=0
+    )
+
+
+def purge_expired_jobs():
+    """Remove jobs concluídos há mais de EXPORT_RETENTION_HOURS e seus arquivos (exceto PDFs do cache)"""
+    limit = timezone.now() - timedelta(hours=settings.EXPORT_RETENTION_HOURS)
+    expired = ExportJob.objects.filter(status__in=[ExportJob.DONE, ExportJob.FAILED], finished_at__lt=limit)
+
+    for job in expired.exclude(format='pdf').exclude(file_path='').only('file_path').iterator():
+        Path(job.file_path).unlink(missing_ok=True)
+
+    deleted, _ = expired.delete()
+    return deleted
@@ -0,0 +1,131 @@
+"""
+Management command de benchmark das exportações (tempo e memória).
+Uso: python manage.py benchmark_exports [opções]
+
+Cria movimentações sintéticas (padrão: 500 mil) dentro de uma transação,
+executa as exportações de movimentações (CSV em streaming e XLSX write-only)
+consumindo a resposta inteira e mede tempo até o primeiro byte, tempo total
+e pico de memória alocada (tracemalloc). Com --compare-standard, mede também
+uma planilha montada no modo padrão do openpyxl, para comparação.
+Os dados são descartados ao final (rollback).
+"""
+
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from openpyxl import Workbook
+
+from apps.inventory.models import StockMovement
+from apps.products.models import Product, Category
+from apps.reports import exports, views
+from apps.reports.queries import MovementReportQuery
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Mede tempo e memória das exportações de movimentações.
+    """
+
+    help = 'Benchmark de tempo e memória das exportações CSV/XLSX de movimentações'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000, help='Movimentações geradas (padrão: 500000)')
+        parser.add_argument('--products', type=int, default=1000, help='Produtos gerados (padrão: 1000)')
+        parser.add_argument(
+            '--compare-standard',
+            action='store_true',
+            help='Mede também o XLSX no modo padrão do openpyxl (planilha inteira em memória)'
+        )
+
+    def create_data(self, rows, products_count):
+        user = User.objects.create_user('benchmark_exports')
+        category = Category.objects.create(name='Benchmark exportações')
+        products = Product.objects.bulk_create([
+            Product(name=f'Produto {i}', sku=f'BENCH-EXP-{i:06d}', category=category, price=10, stock_quantity=0)
+            for i in range(products_count)
+        ])
+
+        types = [StockMovement.IN, StockMovement.OUT, StockMovement.ADJ]
+        for start in range(0, rows, 10_000):
+            StockMovement.objects.bulk_create(
+                [
+                    StockMovement(
+                        product=products[i % len(products)],
+                        movement_type=types[i % 3],
+                        quantity=1 + i % 50,
+                        reason='Benchmark',
+                        user=user,
+                    )
+                    for i in range(start, min(start + 10_000, rows))
+                ],
+                batch_size=2000,
+            )
+            self.stdout.write(f'   ⏳ {min(start + 10_000, rows):,} movimentações')
+
+    def consume(self, view, request):
+        """Chama a view e consome a resposta; retorna (segundos até o 1º bloco, bytes)"""
+        started = time.perf_counter()
+        response = view(request)
+        first = None
+        size = 0
+        for chunk in response.streaming_content:
+            if first is None:
+                first = time.perf_counter() - started
+            size += len(chunk)
+        # Sem response.close(): o sinal request_finished fecharia a conexão no meio da transação
+        return first, size
+
+    def standard_xlsx(self, request):
+        """XLSX no modo padrão do openpyxl, para comparação com o write-only"""
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(exports.MOVEMENT_EXPORT_HEADER)
+        for created_at, *rest in MovementReportQuery(request.GET).export_rows():
+            sheet.append([created_at.replace(tzinfo=None), *rest])
+        with tempfile.TemporaryFile() as output:
+            workbook.save(output)
+            return output.tell()
+
+    def measure(self, label, run):
+        """Executa `run` duas vezes: uma para o tempo e outra com tracemalloc para o pico de memória"""
+        started = time.perf_counter()
+        first, size = run()
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        first_text = f'{first * 1000:>9.0f} ms' if first is not None else f'{"-":>12}'
+        self.stdout.write(
+            f'   {label:<28}{first_text}{elapsed:>10.2f} s{peak / 1024 / 1024:>11.1f} MB{size / 1024 / 1024:>10.1f} MB'
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        factory = RequestFactory()
+        request = factory.get('/reports/export/')
+
+        with transaction.atomic():
+            self.stdout.write(f'⏳ Gerando {rows:,} movimentações...')
+            self.create_data(rows, max(1, options['products']))
+
+            self.stdout.write(f'\n📊 Exportação de {rows:,} movimentações\n')
+            self.stdout.write(f'   {"Formato":<28}{"1º byte":>12}{"Total":>12}{"Pico mem.":>14}{"Arquivo":>13}')
+
+            self.measure('CSV (streaming)', lambda: self.consume(views.export_movements_csv, request))
+            self.measure('XLSX (write-only)', lambda: self.consume(views.export_movements_xlsx, request))
+            if options['compare_standard']:
+                self.measure('XLSX (modo padrão)', lambda: (None, self.standard_xlsx(request)))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (dados descartados)\n'))
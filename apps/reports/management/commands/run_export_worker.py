@@ -0,0 +1,110 @@
+"""
+Management command do worker de exportações.
+Uso: python manage.py run_export_worker [opções]
+
+Processa os jobs de exportação (ExportJob) na ordem da fila, com até
+--concurrency jobs por processo e no máximo EXPORT_MAX_RUNNING em andamento
+no total. Roda com prioridade reduzida de CPU (--nice) para não competir com
+os workers web. Jobs interrompidos são devolvidos à fila e jobs antigos são
+removidos periodicamente.
+"""
+
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.reports import jobs
+
+
+class Command(BaseCommand):
+    """
+    Worker local dos jobs de exportação.
+    """
+
+    help = 'Processa os jobs de exportação em segundo plano (CSV, Excel, PDF)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.EXPORT_WORKER_CONCURRENCY,
+            help=f'Jobs simultâneos neste processo (padrão: {settings.EXPORT_WORKER_CONCURRENCY})'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Segundos entre consultas à fila quando ela está vazia (padrão: 2)'
+        )
+        parser.add_argument(
+            '--nice',
+            type=int,
+            default=10,
+            help='Incremento de prioridade do processo (os.nice; padrão: 10, 0 desliga)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Processa os jobs da fila e encerra'
+        )
+
+    def worker(self, stop, options):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = jobs.claim_next_job()
+
+                if job is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'   ▶️  #{job.pk} {job.report}.{job.format}')
+                job = jobs.run_job(job)
+                if job.status == job.DONE:
+                    self.stdout.write(self.style.SUCCESS(f'   ✅ #{job.pk} pronto ({job.rows_written} linhas)'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'   ❌ #{job.pk} falhou: {job.error}'))
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        if options['nice'] and hasattr(os, 'nice'):
+            os.nice(options['nice'])
+
+        requeued = jobs.requeue_stale_jobs()
+        purged = jobs.purge_expired_jobs()
+        self.stdout.write(
+            f'📤 Worker de exportações: {options["concurrency"]} job(s) simultâneo(s) '
+            f'| {requeued} job(s) devolvido(s) à fila | {purged} job(s) antigo(s) removido(s)'
+        )
+
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.worker, args=(stop, options), daemon=True)
+            for _ in range(max(1, options['concurrency']))
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            last_maintenance = time.monotonic()
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(1)
+                if time.monotonic() - last_maintenance > 600:
+                    close_old_connections()
+                    jobs.requeue_stale_jobs()
+                    jobs.purge_expired_jobs()
+                    last_maintenance = time.monotonic()
+        except KeyboardInterrupt:
+            self.stdout.write('\n⏹️  Encerrando após os jobs em andamento...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS('✅ Worker encerrado'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_dataversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(max_length=30)),
+                ('format', models.CharField(max_length=10)),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('PENDING', 'Na fila'), ('RUNNING', 'Gerando'), ('DONE', 'Pronto'), ('FAILED', 'Falhou')], default='PENDING', max_length=10)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('file_path', models.CharField(blank=True, max_length=500)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Job de Exportação',
+                'verbose_name_plural': 'Jobs de Exportação',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='exportjob_status_created_idx'), models.Index(fields=['user', '-created_at'], name='exportjob_user_created_idx')],
+            },
+        ),
+    ]
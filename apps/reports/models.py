@@ -1,3 +1,77 @@
+from django.conf import settings
 from django.db import models
 
 # Create your models here.
+
+
+class DataVersion(models.Model):
+    """
+    Contador de versão de dados que alimentam relatórios e não têm um id
+    crescente próprio (edições de produtos e categorias, correções diretas
+    de saldo). Ver `apps.reports.versioning.data_version`.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Versão de Dados"
+        verbose_name_plural = "Versões de Dados"
+
+    def __str__(self):
+        return f"{self.name} (v{self.version})"
+
+
+class ExportJob(models.Model):
+    """
+    Exportação executada fora da requisição pelo worker
+    (`python manage.py run_export_worker`). O usuário acompanha o status e
+    as linhas gravadas e baixa o arquivo quando estiver pronto.
+    """
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUSES = [
+        (PENDING, 'Na fila'),
+        (RUNNING, 'Gerando'),
+        (DONE, 'Pronto'),
+        (FAILED, 'Falhou'),
+    ]
+    ACTIVE_STATUSES = (PENDING, RUNNING)
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='export_jobs')
+    report = models.CharField(max_length=30)
+    format = models.CharField(max_length=10)
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    rows_written = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Sinal de vida do worker, renovado durante a geração (ver jobs.requeue_stale_jobs)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Job de Exportação"
+        verbose_name_plural = "Jobs de Exportação"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='exportjob_status_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='exportjob_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.report}.{self.format} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percentual concluído (None enquanto o total não é conhecido)"""
+        if self.status == self.DONE:
+            return 100
+        if not self.total_rows:
+            return None
+        return min(99, self.rows_written * 100 // self.total_rows)
@@ -0,0 +1,163 @@
+"""
+Relatórios em PDF (reportlab), gerados pelo worker de exportações e
+guardados em disco.
+
+O arquivo é identificado pelos filtros normalizados e pela versão dos dados
+(`versioning.data_version`): enquanto nada mudar, downloads repetidos do
+mesmo relatório só leem o arquivo pronto (ver `exporters.PdfExporter`).
+"""
+
+import hashlib
+import json
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+from .exports import STOCK_EXPORT_HEADER, MOVEMENT_EXPORT_HEADER
+from .versioning import data_version
+
+
+# Linhas por tabela: tabelas menores deixam a paginação do reportlab bem mais rápida
+ROWS_PER_TABLE = 500
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#343a40')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 7),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f2f2f2')]),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#cccccc')),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+
+def money(value):
+    return f'R$ {value:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def truncate(value, size=45):
+    value = value or ''
+    return value if len(value) <= size else value[:size - 1] + '…'
+
+
+def table_flowables(header, rows, col_widths):
+    """Quebra as linhas em várias tabelas (cabeçalho repetido em cada página)"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == ROWS_PER_TABLE:
+            yield LongTable([header, *chunk], colWidths=col_widths, repeatRows=1, style=TABLE_STYLE)
+            chunk = []
+    if chunk:
+        yield LongTable([header, *chunk], colWidths=col_widths, repeatRows=1, style=TABLE_STYLE)
+
+
+def build_document(output, title, subtitle, flowables, summary):
+    styles = getSampleStyleSheet()
+
+    def footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 7)
+        canvas.drawString(10 * mm, 7 * mm, f'SISTOCK - {title}')
+        canvas.drawRightString(doc.pagesize[0] - 10 * mm, 7 * mm, f'Página {doc.page}')
+        canvas.restoreState()
+
+    doc = SimpleDocTemplate(
+        output, pagesize=landscape(A4), title=title,
+        leftMargin=10 * mm, rightMargin=10 * mm, topMargin=10 * mm, bottomMargin=12 * mm,
+    )
+    story = [
+        Paragraph(title, styles['Title']),
+        Paragraph(subtitle, styles['Normal']),
+        Spacer(1, 4 * mm),
+        *flowables,
+        Spacer(1, 4 * mm),
+        *[Paragraph(line, styles['Normal']) for line in summary],
+    ]
+    doc.build(story, onFirstPage=footer, onLaterPages=footer)
+
+
+def render_stock_pdf(output, filters, rows):
+    """Relatório de valorização do estoque (`rows`: linhas de `StockReportQuery.export_rows`)"""
+    totals = {'products': 0, 'value': Decimal('0')}
+
+    def table_rows():
+        for name, sku, category, quantity, minimum, price, total_value, status in rows:
+            totals['products'] += 1
+            totals['value'] += total_value or 0
+            yield [truncate(name), sku, truncate(category, 25), quantity, minimum, money(price), money(total_value), status]
+
+    generated = timezone.localtime().strftime('%d/%m/%Y %H:%M')
+    status_label = {'low': 'Estoque baixo', 'out': 'Sem estoque', 'ok': 'Normal'}.get(filters['status'], 'Todos')
+    widths = [x * mm for x in (75, 35, 45, 20, 20, 25, 30, 25)]
+
+    # O resumo é lido depois que as tabelas consumiram as linhas
+    flowables = list(table_flowables(STOCK_EXPORT_HEADER, table_rows(), widths))
+    build_document(
+        output,
+        'Relatório de Valorização do Estoque',
+        f'Gerado em {generated} | Status: {status_label}',
+        flowables,
+        [f'<b>Produtos:</b> {totals["products"]}', f'<b>Valor total em estoque:</b> {money(totals["value"])}'],
+    )
+
+
+def render_movements_pdf(output, filters, rows):
+    """Relatório de movimentações (`rows`: linhas de `MovementReportQuery.export_rows`)"""
+    count = {'rows': 0}
+
+    def table_rows():
+        for created_at, name, sku, label, quantity, username, reason in rows:
+            count['rows'] += 1
+            yield [created_at.strftime('%d/%m/%Y %H:%M'), truncate(name), sku, label, quantity, username, truncate(reason, 40)]
+
+    period = f'{filters["start"] or "início"} a {filters["end"] or "hoje"}'
+    generated = timezone.localtime().strftime('%d/%m/%Y %H:%M')
+    widths = [x * mm for x in (28, 70, 35, 20, 20, 30, 72)]
+
+    flowables = list(table_flowables(MOVEMENT_EXPORT_HEADER, table_rows(), widths))
+    build_document(
+        output,
+        'Relatório de Movimentações',
+        f'Gerado em {generated} | Período: {period} | Tipo: {filters["type"] or "Todos"}',
+        flowables,
+        [f'<b>Movimentações:</b> {count["rows"]}'],
+    )
+
+
+# Renderização por relatório (ver `exports.EXPORT_REPORTS`)
+RENDERERS = {
+    'stock': render_stock_pdf,
+    'movements': render_movements_pdf,
+}
+
+
+def cache_dir():
+    path = Path(settings.REPORT_CACHE_DIR) / 'pdf'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def filters_key(report, filters):
+    payload = json.dumps({'report': report, 'filters': filters}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+def cached_path(report, filters, version=None):
+    """Caminho do PDF destes filtros na versão atual (ou informada) dos dados"""
+    version = version or data_version()
+    return cache_dir() / f'{report}-{filters_key(report, filters)}-{version}.pdf'
+
+
+def publish(report, filters, path):
+    """Remove versões anteriores do mesmo relatório/filtros, que não serão mais servidas"""
+    for old in path.parent.glob(f'{report}-{filters_key(report, filters)}-*.pdf'):
+        if old != path:
+            old.unlink(missing_ok=True)
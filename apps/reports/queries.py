@@ -0,0 +1,327 @@
+"""
+Consultas dos relatórios, compartilhadas por páginas HTML, JSON e exportações.
+
+Cada relatório é uma subclasse de `ReportQuery`, criada a partir da
+querystring (ou dos filtros normalizados gravados em um job):
+
+- os filtros são lidos e validados uma única vez (`filters`, `errors`);
+- `totals()` traz todos os totais em uma única agregação condicional, já
+  com o total de linhas usado na paginação (sem COUNT na tabela);
+- `projection()` lê só as colunas do relatório (values_list nomeado), a
+  mesma projeção usada na página, no JSON e nas exportações;
+- `page()` pagina a projeção: por OFFSET com o total dos totais, ou por
+  cursor (movimentações, ver `inventory.pagination`).
+
+Uma página de relatório custa no máximo duas consultas: totais e linhas.
+A versão dos dados e a fronteira do arquivo frio vêm como colunas a mais da
+agregação dos totais (`versioning.state_columns`), e as linhas ficam em
+cache por essa versão (ver `cache.py`): repetida sem escritas no meio, a
+página custa só a dos totais.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import F, ExpressionWrapper, DecimalField
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from apps.products.models import Product
+from apps.products.valuation import valuation_totals
+from apps.inventory.models import StockMovement, ArchivedStockMovement, MovementDailyRollup
+from apps.inventory.archive import with_archive
+from apps.inventory.pagination import KeysetPage, KeysetPaginator, decode_cursor
+from .cache import cached_result, result_key
+from .versioning import pop_state, state_columns
+
+
+# Linhas lidas por bloco ao percorrer um relatório inteiro (exportações)
+EXPORT_CHUNK_SIZE = 2000
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def stock_status(quantity, minimum):
+    """Status exibido para o saldo de um produto"""
+    if quantity == 0:
+        return 'Sem Estoque'
+    if quantity <= minimum:
+        return 'Estoque Baixo'
+    return 'Normal'
+
+
+class KnownCountPaginator(Paginator):
+    """Paginator que recebe o total pronto (vindo dos totais do relatório) em vez de executar COUNT"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def count(self):
+        return self._known_count
+
+
+def page_number(paginator, value):
+    """Número de página como em `Paginator.get_page`: inválido vira 1, além do fim vira a última"""
+    try:
+        return paginator.validate_number(value)
+    except PageNotAnInteger:
+        return 1
+    except EmptyPage:
+        return paginator.num_pages
+
+
+class ReportQuery:
+    """
+    Consulta de um relatório a partir de `params` (querystring ou filtros
+    normalizados). Subclasses definem `name`, `parse`, `normalized`,
+    `totals`, `total_rows`, `projection` e `export_row`.
+    """
+
+    name = None
+    page_sizes = (50, 100, 200)
+
+    def __init__(self, params):
+        self.errors = {}
+        self.filters = self.parse(params)
+        self.page_size = self.parse_page_size(params.get('page_size'))
+
+    def parse(self, params):
+        raise NotImplementedError
+
+    def parse_page_size(self, value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return self.page_sizes[0]
+        return value if value in self.page_sizes else self.page_sizes[0]
+
+    def normalized(self):
+        """Filtros em texto, estáveis (usados em jobs de exportação e chaves de cache)"""
+        raise NotImplementedError
+
+    def totals(self, **extra):
+        """Totais do relatório em uma agregação, com as colunas `extra` na mesma consulta"""
+        raise NotImplementedError
+
+    def total_rows(self):
+        """Total de linhas do relatório, lido de `totals()`"""
+        raise NotImplementedError
+
+    def projection(self):
+        raise NotImplementedError
+
+    def export_row(self, row):
+        """Linha tipada das exportações (CSV, XLSX, PDF) a partir de uma linha da projeção"""
+        raise NotImplementedError
+
+    def json_row(self, row):
+        return row._asdict()
+
+    @cached_property
+    def cached_totals(self):
+        """`totals()` da requisição, lidos junto com o estado dos dados (`state`)"""
+        totals = self.totals(**state_columns())
+        self._state = pop_state(totals)
+        return totals
+
+    @property
+    def state(self):
+        """(versão dos dados, fronteira do arquivo), lidas na consulta dos totais"""
+        self.cached_totals
+        return self._state
+
+    @property
+    def version(self):
+        return self.state[0]
+
+    def cache_key(self, part, **params):
+        return result_key(self.name, self.version, part, self.normalized(), **params)
+
+    def page(self, params, object_list=None):
+        """Página `params['page']` da projeção (o total vem de `totals()`, sem COUNT; linhas em cache)"""
+        object_list = self.projection() if object_list is None else object_list
+        paginator = KnownCountPaginator(object_list, self.page_size, self.total_rows())
+        number = page_number(paginator, params.get('page'))
+        rows = cached_result(
+            self.cache_key('page', number=number, page_size=self.page_size),
+            lambda: list(paginator.page(number).object_list),
+        )
+        return paginator._get_page(rows, number, paginator)
+
+    def export_rows(self):
+        """Percorre o relatório inteiro em blocos, sem guardar o resultado em memória"""
+        for row in self.projection().iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield self.export_row(row)
+
+
+class MovementReportQuery(ReportQuery):
+    """Relatório de movimentações: período (`start`, `end`) e tipo (`type`)"""
+
+    name = 'movements'
+    fields = ('id', 'created_at', 'product_name', 'product_sku', 'movement_type', 'quantity', 'username', 'reason')
+
+    def parse(self, params):
+        """Lê `start`, `end` (AAAA-MM-DD) e `type`. Valores inválidos são ignorados e anotados em `errors`"""
+        filters = {'start_day': None, 'end_day': None, 'movement_type': None}
+
+        for key, param in (('start_day', 'start'), ('end_day', 'end')):
+            value = params.get(param)
+            if value:
+                try:
+                    filters[key] = datetime.strptime(value, '%Y-%m-%d').date()
+                except ValueError:
+                    self.errors[param] = 'Data inválida (use AAAA-MM-DD).'
+
+        movement_type = params.get('type')
+        if movement_type in dict(StockMovement.MOVEMENT_TYPES):
+            filters['movement_type'] = movement_type
+        elif movement_type:
+            self.errors['type'] = 'Tipo de movimentação inválido.'
+
+        return filters
+
+    def normalized(self):
+        return {
+            'start': self.filters['start_day'].isoformat() if self.filters['start_day'] else '',
+            'end': self.filters['end_day'].isoformat() if self.filters['end_day'] else '',
+            'type': self.filters['movement_type'] or '',
+        }
+
+    def filter(self, queryset):
+        """Aplica os filtros a um queryset de movimentações (ativas ou arquivadas)"""
+        if self.filters['start_day']:
+            queryset = queryset.filter(created_at__gte=day_start(self.filters['start_day']))
+        if self.filters['end_day']:
+            # dia seguinte para incluir todo o dia final
+            queryset = queryset.filter(created_at__lt=day_start(self.filters['end_day'] + timedelta(days=1)))
+        if self.filters['movement_type']:
+            queryset = queryset.filter(movement_type=self.filters['movement_type'])
+        return queryset
+
+    def totals(self, **extra):
+        """Totais (geral e por tipo) do período em uma agregação sobre os resumos diários"""
+        rollups = MovementDailyRollup.objects.all()
+        if self.filters['start_day']:
+            rollups = rollups.filter(day__gte=self.filters['start_day'])
+        if self.filters['end_day']:
+            rollups = rollups.filter(day__lte=self.filters['end_day'])
+        if self.filters['movement_type']:
+            rollups = rollups.filter(movement_type=self.filters['movement_type'])
+        return rollups.totals(**extra)
+
+    def total_rows(self):
+        return self.cached_totals['total_movements']
+
+    def projection(self):
+        """
+        Movimentações filtradas em ordem decrescente de data, só com as colunas
+        do relatório. Se o período alcança o arquivo frio, lê a tabela
+        principal e depois o arquivo.
+        """
+        querysets = [
+            self.filter(model.objects.order_by('-created_at'))
+            .annotate(product_name=F('product__name'), product_sku=F('product__sku'), username=F('user__username'))
+            .values_list(*self.fields, named=True)
+            for model in (StockMovement, ArchivedStockMovement)
+        ]
+        start = day_start(self.filters['start_day']) if self.filters['start_day'] else None
+        return with_archive(*querysets, start, boundary=self.state[1])
+
+    def page(self, params, object_list=None):
+        """Página por cursor (`after` / `before`): custo constante em qualquer profundidade"""
+        object_list = self.projection() if object_list is None else object_list
+        paginator = KeysetPaginator(object_list, self.page_size, count=self.total_rows)
+        after, before = params.get('after'), params.get('before')
+
+        def load():
+            page = paginator.page(after=after, before=before)
+            return page.object_list, page.has_next(), page.has_previous()
+
+        rows, has_next, has_previous = cached_result(
+            self.cache_key(
+                'page', page_size=self.page_size,
+                after=decode_cursor(after), before=decode_cursor(before),
+            ),
+            load,
+        )
+        return KeysetPage(rows, paginator, has_next=has_next, has_previous=has_previous)
+
+    def export_row(self, row):
+        """Data local, rótulo do tipo e quantidade com sinal"""
+        return (
+            timezone.localtime(row.created_at),
+            row.product_name,
+            row.product_sku,
+            dict(StockMovement.MOVEMENT_TYPES).get(row.movement_type, 'Desconhecido'),
+            -row.quantity if row.movement_type == StockMovement.OUT else row.quantity,
+            row.username,
+            row.reason or '-',
+        )
+
+    def json_row(self, row):
+        data = row._asdict()
+        data['created_at'] = timezone.localtime(row.created_at).isoformat()
+        data['signed_quantity'] = StockMovement.signed(row.movement_type, row.quantity)
+        return data
+
+
+class StockReportQuery(ReportQuery):
+    """Relatório de estoque: status do saldo (`status`: low, out ou ok)"""
+
+    name = 'stock'
+    STATUSES = ('low', 'out', 'ok')
+    fields = ('name', 'sku', 'category_name', 'stock_quantity', 'minimum_stock', 'price', 'total_value')
+
+    def parse(self, params):
+        status = params.get('status')
+        if status and status not in self.STATUSES:
+            self.errors['status'] = 'Status inválido.'
+        return {'status': status if status in self.STATUSES else ''}
+
+    def normalized(self):
+        return dict(self.filters)
+
+    def filter(self, queryset):
+        status = self.filters['status']
+        if status == 'low':
+            return queryset.filter(stock_quantity__lte=F('minimum_stock'))
+        if status == 'out':
+            return queryset.filter(stock_quantity=0)
+        if status == 'ok':
+            return queryset.filter(stock_quantity__gt=F('minimum_stock'))
+        return queryset
+
+    def totals(self, **extra):
+        """Totais do estoque lidos da valorização mantida por categoria (uma agregação)"""
+        return valuation_totals(**extra)
+
+    def total_rows(self):
+        totals = self.cached_totals
+        return {
+            'low': totals['low_stock_count'],
+            'out': totals['out_of_stock_count'],
+            'ok': totals['total_products'] - totals['low_stock_count'],
+        }.get(self.filters['status'], totals['total_products'])
+
+    def projection(self):
+        return self.filter(Product.objects.order_by('name')).annotate(
+            category_name=F('category__name'),
+            total_value=ExpressionWrapper(
+                F('stock_quantity') * F('price'),
+                output_field=DecimalField(max_digits=15, decimal_places=2)
+            ),
+        ).values_list(*self.fields, named=True)
+
+    def export_row(self, row):
+        return (*row, stock_status(row.stock_quantity, row.minimum_stock))
+
+    def json_row(self, row):
+        data = row._asdict()
+        data['price'] = str(row.price)
+        data['total_value'] = str(row.total_value)
+        data['status'] = stock_status(row.stock_quantity, row.minimum_stock)
+        return data
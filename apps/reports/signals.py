@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.inventory.models import StockMovement
+from apps.inventory.signals import stock_changed
+from apps.products.models import Product, Category
+from . import versioning
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_catalog_version(sender, **kwargs):
+    """Edições de produtos/categorias invalidam relatórios gerados"""
+    versioning.bump()
+
+
+@receiver(post_save, sender=StockMovement)
+def bump_on_movement_edit(sender, instance, created, **kwargs):
+    """Movimentações novas já mudam a versão (maior id); edições precisam do contador"""
+    if not created:
+        versioning.bump()
+
+
+@receiver(post_delete, sender=StockMovement)
+def bump_on_movement_delete(sender, **kwargs):
+    """Excluir a movimentação de maior id não muda a versão (maior id): conta no contador"""
+    versioning.bump()
+
+
+@receiver(stock_changed)
+def bump_on_stock_changed(sender, **kwargs):
+    versioning.bump()
@@ -1,3 +1,508 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import connection, OperationalError
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.utils import timezone
+from apps.products.models import Product, Category
+from apps.inventory.models import StockMovement, MovementDailyRollup
+from apps.inventory.services import on_movements_created
+from apps.inventory.archive import archive_movements
+from apps.reports import jobs, pdf, versioning
+from apps.reports.models import DataVersion, ExportJob
+from apps.reports.queries import MovementReportQuery
+from datetime import datetime, timedelta
+from io import BytesIO
+from openpyxl import load_workbook
+import shutil
+import tempfile
+import threading
 
 # Create your tests here.
+
+
+class MovementReportViewTest(TestCase):
+    """Testes para o relatório de movimentações"""
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('reports:movement_report')
+
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        self.client.force_login(self.user)
+
+        category = Category.objects.create(name='Eletrônicos')
+        self.product = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=100, minimum_stock=10, category=category
+        )
+
+        today = timezone.now()
+        movements = [
+            self.create_movement('IN', 10, today),
+            self.create_movement('OUT', 2, today),
+            self.create_movement('OUT', 3, today - timedelta(days=40)),
+        ]
+        on_movements_created(movements)
+
+    def create_movement(self, movement_type, quantity, created_at):
+        movement = StockMovement.objects.create(
+            product=self.product, movement_type=movement_type, quantity=quantity, user=self.user
+        )
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=created_at)
+        movement.created_at = created_at
+        return movement
+
+    def test_totais_lidos_dos_resumos_diarios(self):
+        """Testa se os totais do relatório vêm dos resumos diários e respeitam os filtros"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_movements'], 3)
+        self.assertEqual(response.context['total_out'], 2)
+
+        start = (timezone.localdate() - timedelta(days=7)).isoformat()
+        response = self.client.get(self.url, {'start': start, 'type': 'OUT'})
+        self.assertEqual(response.context['total_movements'], 1)
+        self.assertEqual(response.context['total_in'], 0)
+        self.assertEqual(len(response.context['movements']), 1)
+
+    def test_periodo_arquivado_lido_do_arquivo(self):
+        """Testa se relatório e CSV leem movimentações arquivadas quando o período as alcança"""
+        archive_movements(timezone.now() - timedelta(days=30))
+        self.assertEqual(StockMovement.objects.count(), 2)
+
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['movements']), 3)
+        self.assertEqual(response.context['movements'][-1].quantity, 3)
+
+        recent = (timezone.localdate() - timedelta(days=7)).isoformat()
+        response = self.client.get(self.url, {'start': recent})
+        self.assertEqual(len(response.context['movements']), 2)
+
+        response = self.client.get(reverse('reports:export_movements_csv'), {'type': 'OUT'})
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count('Saída'), 2)
+        self.assertIn('-3', content)
+
+    def test_xlsx_com_celulas_tipadas_e_filtros(self):
+        """Testa se o XLSX respeita os filtros do relatório e grava números e datas tipados"""
+        response = self.client.get(reverse('reports:export_movements_xlsx'), {'type': 'OUT'})
+
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'Data/Hora')
+        self.assertEqual(len(rows), 3)
+        self.assertIsInstance(rows[1][0], datetime)
+        self.assertEqual(rows[1][4], -2)
+
+    def test_data_invalida_e_ignorada(self):
+        """Testa se datas inválidas não quebram o relatório"""
+        response = self.client.get(self.url, {'start': 'ontem', 'end': '2025-13-40'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_movements'], MovementDailyRollup.objects.totals()['total_movements'])
+
+
+class StockExportTest(TestCase):
+    """Testes da exportação de estoque"""
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username='gerente', password='senha123456'))
+
+        category = Category.objects.create(name='Eletrônicos')
+        Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=3, minimum_stock=10, category=category
+        )
+        Product.objects.create(
+            name='Teclado Mecânico', sku='TECL-001', price=300.00,
+            stock_quantity=0, minimum_stock=1, category=category
+        )
+
+    def test_csv_em_streaming(self):
+        """Testa se o CSV de estoque é enviado em streaming com valores e status"""
+        response = self.client.get(reverse('reports:export_stock_csv'))
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1], 'Mouse Gamer,MOUSE-001,Eletrônicos,3,10,150.00,450.00,Estoque Baixo')
+        self.assertTrue(lines[2].endswith('Sem Estoque'))
+
+    def test_csv_exige_login(self):
+        """Testa se as exportações CSV redirecionam usuários anônimos ao login"""
+        self.client.logout()
+        for name in ('reports:export_stock_csv', 'reports:export_movements_csv'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(reverse('accounts:login'), response['Location'])
+
+    def test_xlsx_com_valores_numericos(self):
+        """Testa se preço e valor total saem como números no XLSX de estoque"""
+        response = self.client.get(reverse('reports:export_stock_xlsx'))
+
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet['F2'].value, 150)
+        self.assertEqual(sheet['G2'].value, 450)
+        self.assertEqual(sheet['F2'].number_format, '#,##0.00')
+
+    def test_xlsx_exige_login(self):
+        """Testa se as exportações XLSX redirecionam usuários anônimos ao login"""
+        self.client.logout()
+        for name in ('reports:export_stock_xlsx', 'reports:export_movements_xlsx'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(reverse('accounts:login'), response['Location'])
+
+
+class PdfExportTest(TestCase):
+    """Testes dos relatórios em PDF com cache em disco"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(REPORT_CACHE_DIR=self.cache_dir, EXPORT_JOBS_INLINE=True)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username='gerente', password='senha123456'))
+
+        category = Category.objects.create(name='Eletrônicos')
+        self.product = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=3, minimum_stock=10, category=category
+        )
+        self.url = reverse('reports:export_pdf', args=['stock'])
+
+    def test_pdf_reaproveitado_ate_os_dados_mudarem(self):
+        """Testa se o mesmo PDF é servido do disco até a versão dos dados mudar"""
+        response = self.client.get(self.url, {'status': 'low'})
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, reverse('reports:export_job_detail', args=[job.pk]))
+        self.assertEqual(job.status, ExportJob.DONE)
+
+        response = self.client.get(reverse('reports:export_job_download', args=[job.pk]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        # Mesmos filtros normalizados e dados iguais: arquivo pronto, sem novo job
+        response = self.client.get(self.url, {'status': 'low', 'ignorado': '1'})
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+        self.product.price = 200
+        self.product.save()
+        response = self.client.get(self.url, {'status': 'low'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ExportJob.objects.count(), 2)
+        self.assertEqual(len(list(pdf.cache_dir().glob('stock-*.pdf'))), 1)
+
+    def test_pdf_de_movimentacoes_e_relatorio_desconhecido(self):
+        """Testa o PDF de movimentações e o 404 para relatórios inexistentes"""
+        response = self.client.get(reverse('reports:export_pdf', args=['movements']), {'type': 'OUT'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ExportJob.objects.get().status, ExportJob.DONE)
+
+        response = self.client.get(reverse('reports:export_pdf', args=['usuarios']))
+        self.assertEqual(response.status_code, 404)
+
+
+class ExportJobTest(TestCase):
+    """Testes dos jobs de exportação em segundo plano"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(REPORT_CACHE_DIR=self.cache_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+        category = Category.objects.create(name='Eletrônicos')
+        self.product = Product.objects.create(
+            name='Mouse Gamer', sku='MOUSE-001', price=150.00,
+            stock_quantity=30, minimum_stock=10, category=category
+        )
+        on_movements_created([
+            StockMovement.objects.create(
+                product=self.product, movement_type=StockMovement.OUT, quantity=quantity, user=self.user
+            )
+            for quantity in (5, 7)
+        ])
+
+    def test_job_processado_pelo_worker(self):
+        """Testa criação do job, processamento, status em JSON e download"""
+        response = self.client.post(reverse('reports:export_job_create'), {
+            'report': 'movements', 'format': 'csv', 'type': 'OUT', 'start': '', 'end': '',
+        })
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, reverse('reports:export_job_detail', args=[job.pk]))
+        self.assertEqual(job.status, ExportJob.PENDING)
+        self.assertEqual(job.filters, {'start': '', 'end': '', 'type': 'OUT'})
+
+        status = self.client.get(reverse('reports:export_job_status', args=[job.pk])).json()
+        self.assertEqual(status['status'], ExportJob.PENDING)
+        self.assertIsNone(status['download_url'])
+
+        claimed = jobs.claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        jobs.run_job(claimed)
+
+        status = self.client.get(reverse('reports:export_job_status', args=[job.pk])).json()
+        self.assertEqual(status['status'], ExportJob.DONE)
+        self.assertEqual(status['rows_written'], 2)
+        self.assertEqual(status['total_rows'], 2)
+        self.assertEqual(status['progress'], 100)
+
+        response = self.client.get(status['download_url'])
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('MOUSE-001', lines[1])
+
+        # Outro usuário não enxerga o job
+        other = Client()
+        other.force_login(User.objects.create_user(username='outro', password='senha123456'))
+        self.assertEqual(other.get(reverse('reports:export_job_status', args=[job.pk])).status_code, 404)
+
+    def test_limites_da_fila(self):
+        """Testa o reaproveitamento de jobs iguais, o limite por usuário e o de jobs em andamento"""
+        first = jobs.submit_export(self.user, 'stock', 'csv', {'status': 'low'})
+        self.assertEqual(jobs.submit_export(self.user, 'stock', 'csv', {'status': 'low'}).pk, first.pk)
+
+        with override_settings(EXPORT_MAX_ACTIVE_PER_USER=2):
+            jobs.submit_export(self.user, 'stock', 'xlsx', {})
+            with self.assertRaises(jobs.ExportLimitExceeded):
+                jobs.submit_export(self.user, 'movements', 'csv', {})
+
+            response = self.client.post(reverse('reports:export_job_create'), {'report': 'movements', 'format': 'pdf'})
+            self.assertRedirects(response, reverse('reports:export_job_list'))
+
+        with override_settings(EXPORT_MAX_RUNNING=1):
+            self.assertIsNotNone(jobs.claim_next_job())
+            self.assertIsNone(jobs.claim_next_job())
+
+    def test_job_xlsx_e_requeue(self):
+        """Testa o job XLSX e a devolução à fila de jobs interrompidos"""
+        job = jobs.submit_export(self.user, 'stock', 'xlsx', {})
+        job = jobs.run_job(jobs.claim_next_job())
+        self.assertEqual(job.status, ExportJob.DONE)
+        sheet = load_workbook(job.file_path, read_only=True).active
+        self.assertEqual(len(list(sheet.iter_rows(values_only=True))), 2)
+
+        stuck = jobs.submit_export(self.user, 'stock', 'csv', {})
+        ExportJob.objects.filter(pk=stuck.pk).update(
+            status=ExportJob.RUNNING, started_at=timezone.now() - timedelta(hours=2)
+        )
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        self.assertEqual(ExportJob.objects.get(pk=stuck.pk).status, ExportJob.PENDING)
+
+    def test_requeue_respeita_heartbeat(self):
+        """Testa se um job longo com heartbeat recente continua em andamento e um sem heartbeat volta à fila"""
+        jobs.submit_export(self.user, 'stock', 'csv', {})
+        jobs.submit_export(self.user, 'stock', 'xlsx', {})
+        long_running, dead = jobs.claim_next_job(), jobs.claim_next_job()
+        self.assertIsNotNone(long_running.heartbeat_at)
+
+        two_hours_ago = timezone.now() - timedelta(hours=2)
+        ExportJob.objects.filter(pk__in=[long_running.pk, dead.pk]).update(started_at=two_hours_ago, heartbeat_at=two_hours_ago)
+        jobs.heartbeat(long_running, rows_written=5000)
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        self.assertEqual(ExportJob.objects.get(pk=long_running.pk).status, ExportJob.RUNNING)
+        self.assertEqual(ExportJob.objects.get(pk=dead.pk).status, ExportJob.PENDING)
+
+
+
+class ExportJobClaimTest(TransactionTestCase):
+    """Testes de concorrência do claim de jobs de exportação (UPDATE condicional)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analista', password='senha123456')
+        for _ in range(6):
+            ExportJob.objects.create(user=self.user, report='stock', format='csv')
+
+    @override_settings(EXPORT_MAX_RUNNING=3)
+    def test_workers_concorrentes_nao_pegam_o_mesmo_job(self):
+        """Testa se 8 workers ao mesmo tempo pegam jobs distintos, sem passar do limite"""
+        claimed = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        job = jobs.claim_next_job()
+                        break
+                    except OperationalError:
+                        continue    # <- SQLite: tabela travada por outra thread
+                if job is not None:
+                    with lock:
+                        claimed.append(job.pk)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(len(set(claimed)), 3)
+        self.assertEqual(ExportJob.objects.filter(status=ExportJob.RUNNING).count(), 3)
+
+    def test_job_ja_pego_nao_e_pego_de_novo(self):
+        """Testa se o claim ignora o job que outro worker mudou para "running" e segue para o próximo"""
+        first, second = ExportJob.objects.order_by('created_at')[:2]
+        ExportJob.objects.filter(pk=first.pk).update(status=ExportJob.RUNNING)
+
+        self.assertEqual(jobs.claim_next_job().pk, second.pk)
+
+class ReportQueryBudgetTest(TestCase):
+    """Testes da camada de consultas dos relatórios (filtros, projeção e número de consultas)"""
+
+    # Consultas da requisição que não são do relatório (sessão, usuário e perfil)
+    REQUEST_TABLES = ('django_session', 'auth_user', 'accounts_profile')
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='gerente', password='senha123456')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+        category = Category.objects.create(name='Eletrônicos')
+        products = [
+            Product.objects.create(
+                name=f'Produto {i:02d}', sku=f'PROD-{i:02d}', price=10,
+                stock_quantity=i, minimum_stock=5, category=category
+            )
+            for i in range(60)
+        ]
+        on_movements_created(StockMovement.objects.bulk_create([
+            StockMovement(
+                product=products[i], movement_type=StockMovement.OUT if i % 2 else StockMovement.IN,
+                quantity=1 + i, user=self.user, created_at=timezone.now(),
+            )
+            for i in range(60)
+        ]))
+
+    def report_queries(self, url, params=None):
+        """Faz a requisição e retorna (resposta, consultas do relatório)"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+        report = [
+            query['sql'] for query in queries.captured_queries
+            if not any(f'FROM "{table}"' in query['sql'] for table in self.REQUEST_TABLES)
+        ]
+        return response, report
+
+    def test_paginas_com_no_maximo_duas_consultas(self):
+        """Testa se as páginas HTML e JSON dos relatórios usam no máximo duas consultas (totais e linhas)"""
+        after = self.client.get(reverse('reports:movement_report_json')).json()['next']
+        cases = [
+            (reverse('reports:movement_report'), {}),
+            (reverse('reports:movement_report'), {'type': 'OUT'}),
+            (reverse('reports:movement_report'), {'after': after}),
+            (reverse('reports:movement_report_json'), {'start': timezone.localdate().isoformat()}),
+            (reverse('reports:stock_report'), {'status': 'low'}),
+            (reverse('reports:stock_report'), {'page_size': 100}),
+            (reverse('reports:stock_report_json'), {'status': 'ok'}),
+        ]
+        for url, params in cases:
+            with self.subTest(url=url, params=params):
+                response, queries = self.report_queries(url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(queries), 2, queries)
+
+                # Repetida: linhas em cache, só os totais (com a versão) são lidos
+                response, queries = self.report_queries(url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(queries), 1, queries)
+                self.assertIn('"reports_dataversion"', queries[0])
+
+    def test_versao_lida_com_os_totais(self):
+        """Testa se a versão lida na consulta dos totais é a mesma de data_version (com ou sem contadores gravados)"""
+        DataVersion.objects.all().delete()
+        query = MovementReportQuery({})
+        with self.assertNumQueries(1):
+            query.cached_totals
+            version, archived_until = query.state
+        self.assertEqual(version, versioning.data_version())
+        self.assertIsNone(archived_until)
+
+        # Outros contadores na tabela não mudam a versão dos relatórios
+        versioning.bump('dashboard:stock')
+        self.assertEqual(versioning.data_version(), version)
+        versioning.bump()
+        self.assertNotEqual(versioning.data_version(), version)
+        self.assertEqual(MovementReportQuery({}).version, versioning.data_version())
+
+    def test_cache_por_filtros_canonicos(self):
+        """Testa se filtros equivalentes (ordem, padrões, valores inválidos) usam a mesma entrada"""
+        url = reverse('reports:movement_report_json')
+        first = self.client.get(url, {'type': 'OUT', 'start': ''}).json()
+        for params in ({'type': 'OUT'}, {'start': 'ontem', 'type': 'OUT', 'page_size': 'x'}):
+            response, queries = self.report_queries(url, params)
+            self.assertEqual(len(queries), 1, queries)  # só os totais, com a versão
+            self.assertEqual(response.json()['results'], first['results'])
+
+    def test_escrita_invalida_o_cache(self):
+        """Testa se uma movimentação ou edição de produto nova aparece na próxima leitura"""
+        url = reverse('reports:movement_report_json')
+        self.assertEqual(self.client.get(url, {'type': 'IN'}).json()['count'], 30)
+
+        product = Product.objects.get(sku='PROD-00')
+        on_movements_created([StockMovement.objects.create(
+            product=product, movement_type=StockMovement.IN, quantity=5, user=self.user
+        )])
+        data = self.client.get(url, {'type': 'IN'}).json()
+        self.assertEqual(data['count'], 31)
+        self.assertEqual(data['results'][0]['quantity'], 5)
+
+        stock_url = reverse('reports:stock_report_json')
+        self.assertEqual(self.client.get(stock_url).json()['results'][0]['name'], 'Produto 00')
+        product.name = 'AAA Produto renomeado'
+        product.save()
+        self.assertEqual(self.client.get(stock_url).json()['results'][0]['name'], 'AAA Produto renomeado')
+
+    def test_exclusao_invalida_o_cache(self):
+        """Testa se a exclusão de uma movimentação que não é a de maior id some da próxima leitura"""
+        url = reverse('reports:movement_report_json')
+        newest_in = self.client.get(url, {'type': 'IN'}).json()['results'][0]['id']
+        self.assertLess(newest_in, StockMovement.objects.order_by('-pk').values_list('pk', flat=True)[0])
+
+        StockMovement.objects.filter(pk=newest_in).get().delete()
+        self.assertNotEqual(self.client.get(url, {'type': 'IN'}).json()['results'][0]['id'], newest_in)
+
+    def test_paginacao_usa_os_totais(self):
+        """Testa se o total da paginação vem dos totais e confere com as linhas"""
+        response = self.client.get(reverse('reports:movement_report'), {'type': 'OUT'})
+        self.assertEqual(response.context['paginator'].count, 30)
+        self.assertEqual(len(response.context['movements']), 30)
+        self.assertEqual(response.context['total_out'], 30)
+
+        data = self.client.get(reverse('reports:stock_report_json'), {'status': 'low'}).json()
+        self.assertEqual(data['count'], 6)
+        self.assertEqual(len(data['results']), 6)
+        self.assertEqual(data['results'][0]['status'], 'Sem Estoque')
+
+    def test_mesma_projecao_no_html_json_e_csv(self):
+        """Testa se página, JSON e CSV usam os mesmos filtros e linhas"""
+        params = {'type': 'IN', 'start': 'ontem'}
+        response = self.client.get(reverse('reports:movement_report'), params)
+        self.assertIn('start', response.context['filter_errors'])
+        html_skus = [row.product_sku for row in response.context['movements']]
+
+        data = self.client.get(reverse('reports:movement_report_json'), params).json()
+        self.assertEqual(data['filters'], {'start': '', 'end': '', 'type': 'IN'})
+        self.assertEqual([row['product_sku'] for row in data['results']], html_skus)
+
+        response = self.client.get(reverse('reports:export_movements_csv'), params)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()[1:]
+        self.assertEqual([line.split(',')[2] for line in lines], html_skus)
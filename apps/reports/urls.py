@@ -7,8 +7,18 @@ urlpatterns = [
     path('', views.ReportIndexView.as_view(), name='report_index'),
     path('stock/', views.StockReportView.as_view(), name='stock_report'),
     path('movements/', views.MovementReportView.as_view(), name='movement_report'),
+    path('stock/json/', views.stock_report_json, name='stock_report_json'),
+    path('movements/json/', views.movement_report_json, name='movement_report_json'),
     path('export/stock/', views.export_stock_csv, name='export_stock_csv'),
     path('export/movements/', views.export_movements_csv, name='export_movements_csv'),
+    path('export/stock/xlsx/', views.export_stock_xlsx, name='export_stock_xlsx'),
+    path('export/movements/xlsx/', views.export_movements_xlsx, name='export_movements_xlsx'),
+    path('export/<str:report>/pdf/', views.export_pdf, name='export_pdf'),
+    path('exports/', views.ExportJobListView.as_view(), name='export_job_list'),
+    path('exports/new/', views.export_job_create, name='export_job_create'),
+    path('exports/<int:pk>/', views.export_job_detail, name='export_job_detail'),
+    path('exports/<int:pk>/status/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:pk>/download/', views.export_job_download, name='export_job_download'),
 
     path('users/', views.UserReportView.as_view(), name='user_report'),
 ]
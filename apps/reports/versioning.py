@@ -0,0 +1,91 @@
+"""
+Versão dos dados dos relatórios, usada como parte da chave de caches
+(PDFs gerados, relatórios em cache).
+
+A versão combina:
+- o maior id de movimentação (tabela principal e arquivo): toda movimentação
+  nova muda a versão sem nenhuma escrita extra no caminho de gravação;
+- o maior id de produto (cobre produtos criados com bulk_create);
+- o contador `catalog`, incrementado pelos sinais de Product/Category, por
+  edições e exclusões de movimentações e por `stock_changed` (correções de
+  saldo fora do fluxo de movimentações).
+
+A mesma consulta traz a fronteira do arquivo frio (`data_state`), para que
+as páginas de movimentações não a consultem à parte. `state_columns` lê as
+duas como colunas a mais de uma agregação (os totais dos relatórios), sem
+consulta própria.
+"""
+
+from django.db.models import Count, F, Subquery
+
+from apps.inventory.models import StockMovement, ArchivedStockMovement
+from apps.products.models import Product
+from .models import DataVersion
+
+
+CATALOG = 'catalog'
+
+
+def bump(*names):
+    """
+    Incrementa contadores de versão (padrão: `catalog`), criando-os na
+    primeira vez. Um UPDATE para todos os contadores já existentes.
+    """
+    names = names or (CATALOG,)
+    counters = DataVersion.objects.filter(name__in=names)
+    if counters.update(version=F('version') + 1) < len(names):
+        DataVersion.objects.bulk_create([DataVersion(name=name) for name in names], ignore_conflicts=True)
+        counters.update(version=F('version') + 1)
+
+
+def versions(names):
+    """{nome: versão} dos contadores `names` (0 para os que ainda não existem), em uma consulta"""
+    found = dict(DataVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return {name: found.get(name, 0) for name in names}
+
+
+class StateColumn(Subquery):
+    """
+    Subconsulta escalar aceita por `aggregate()`: não depende das linhas
+    agregadas, então é só uma coluna a mais no SELECT dos totais.
+    """
+    contains_aggregate = True
+
+
+# Colunas do estado dos dados: as partes da versão e, por último, a fronteira do arquivo
+STATE_COLUMNS = ('version', 'last_movement', 'last_archived', 'last_product', 'archived_until')
+
+
+def state_columns():
+    """Expressões de STATE_COLUMNS (prefixadas com `state_`), para `aggregate(**state_columns())`"""
+    subqueries = {
+        'version': DataVersion.objects.filter(name=CATALOG).values('version'),
+        'last_movement': StockMovement.objects.order_by('-pk').values('pk'),
+        'last_archived': ArchivedStockMovement.objects.order_by('-pk').values('pk'),
+        'last_product': Product.objects.order_by('-pk').values('pk'),
+        'archived_until': ArchivedStockMovement.objects.order_by('-created_at').values('created_at'),
+    }
+    return {f'state_{name}': StateColumn(subqueries[name][:1]) for name in STATE_COLUMNS}
+
+
+def pop_state(row):
+    """Remove de `row` (resultado de `aggregate`) as colunas de `state_columns` e retorna o estado como em `data_state`"""
+    *version, archived_until = (row.pop(f'state_{name}') for name in STATE_COLUMNS)
+    # Sem o contador `catalog` (nunca incrementado) a versão é 0, como na linha recém-criada
+    return '-'.join(str(value or 0) for value in version), archived_until
+
+
+def data_state():
+    """
+    (versão atual dos dados dos relatórios, como texto; data/hora da
+    movimentação arquivada mais recente ou None), em uma consulta
+    """
+    # COUNT: uma linha de resultado mesmo sem nenhum contador gravado
+    row = DataVersion.objects.aggregate(counters=Count('pk'), **state_columns())
+    row.pop('counters')
+    return pop_state(row)
+
+
+def data_version():
+    """Versão atual dos dados dos relatórios, como texto (uma consulta)"""
+    return data_state()[0]
@@ -1,17 +1,31 @@
-from django.shortcuts import render, HttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
-from django.db.models import F, ExpressionWrapper, DecimalField, Count, Sum, Q
-import csv
 
-from apps.products.models import Product
-from apps.inventory.models import StockMovement
+from apps.products.valuation import valuation_totals, category_valuations
+from apps.inventory.models import MovementDailyRollup
+from apps.inventory.pagination import KeysetPage, cursor_links
 from apps.accounts.mixins import AdminRequiredMixin
 from apps.accounts.models import Profile
-from datetime import datetime, timedelta
+from datetime import timedelta
 from django.utils import timezone
 
+from . import pdf
+from .cache import cached_result, result_key
+from .exporters import EXPORTERS
+from .exports import EXPORT_REPORTS, stream_csv, write_xlsx
+from .jobs import ExportLimitExceeded, submit_export
+from .models import ExportJob
+from .queries import MovementReportQuery, StockReportQuery
+from .versioning import data_version
+
 # Create your views here.
 
 
@@ -22,151 +36,80 @@ class ReportIndexView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        start_month = timezone.localdate().replace(day=1)
+        key = result_key('index', data_version(), 'summary', {'month': start_month.isoformat()})
+        context.update(cached_result(key, lambda: self.summary(start_month)))
+        return context
 
-        # Total de produtos
-        context['total_products'] = Product.objects.count()
+    def summary(self, start_month):
+        """Totais do índice (em cache pela versão dos dados)"""
+        # Totais do estoque lidos da valorização mantida por categoria
+        summary = valuation_totals()
+        summary['category_valuations'] = list(category_valuations()[:10])
 
-        # Valor total em estoque
-        products = Product.objects.annotate(
-            total_value=ExpressionWrapper(
-                F('stock_quantity') * F('price'),
-                output_field=DecimalField(max_digits=15, decimal_places=2)
-            )
-        )
-        context['total_stock_value'] = sum(p.total_value for p in products)
+        # Movimentações neste mês (lidas dos totais diários)
+        summary['monthly_movements'] = MovementDailyRollup.objects.filter(day__gte=start_month).totals()['total_movements']
+        return summary
 
-        # Produtos em alerta (baixo estoque)
-        context['low_stock_count'] = Product.objects.filter(
-            stock_quantity__lte=F('minimum_stock')
-        ).count()
 
-        # Movimentações neste mês
-        start_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        context['monthly_movements'] = StockMovement.objects.filter(created_at__gte=start_month).count()
+class ReportQueryMixin:
+    """
+    Lê os filtros uma única vez (`query_class`) e pagina a projeção do
+    relatório com `query.page` (total vindo dos totais, sem COUNT): a página
+    custa uma consulta de totais e uma de linhas, ou só a da versão dos
+    dados quando já está em cache.
+    """
+    query_class = None
 
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.query = self.query_class(request.GET)
+
+    def get_queryset(self):
+        return self.query.projection()
+
+    def get_paginate_by(self, queryset):
+        return self.query.page_size
+
+    def paginate_queryset(self, queryset, page_size):
+        page = self.query.page(self.request.GET, queryset)
+        return page.paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if isinstance(context['page_obj'], KeysetPage):
+            context.update(cursor_links(self.request.GET, context['page_obj']))
+        context.update(self.query.cached_totals)
+        context['filter_errors'] = self.query.errors
+        context['page_sizes'] = self.query.page_sizes
+        context['current_page_size'] = self.query.page_size
         return context
 
 
-class StockReportView(LoginRequiredMixin, ListView):
-    """Relatório Estoque"""
-    model = Product
+class StockReportView(LoginRequiredMixin, ReportQueryMixin, ListView):
+    """Relatório Estoque (totais lidos da valorização por categoria)"""
+    query_class = StockReportQuery
     template_name = 'reports/stock_report.html'
     context_object_name = 'products'
-    paginate_by = 50
 
-    def get_queryset(self):
-        """
-        Retorna produtos com cálculo de valor em estoque
-        """
-        queryset = Product.objects.select_related('category').annotate(
-            total_value=ExpressionWrapper(
-                F('stock_quantity') * F('price'),
-                output_field=DecimalField(max_digits=15, decimal_places=2)
-            )
-        ).only(
-            'id', 'name', 'sku', 'stock_quantity', 'minimum_stock', 'price',
-            'category__name'
-        ).order_by('name')
-
-        # Filtro por status estoque
-        status = self.request.GET.get('status')
-        if status == 'low':
-            queryset = queryset.filter(stock_quantity__lte=F('minimum_stock'))
-        elif status == 'out':
-            queryset = queryset.filter(stock_quantity=0)
-        elif status == 'ok':
-            queryset = queryset.filter(stock_quantity__gt=F('minimum_stock'))
-
-        return queryset
-    
     def get_context_data(self, **kwargs):
-        """
-        Adiciona estatísticas gerais ao contexto.
-        """
         context = super().get_context_data(**kwargs)
-
-        # Cálculos agregados otimizados (executados no banco)
-        stats = Product.objects.aggregate(
-            total_products=Count('id'),
-            total_stock_value=Sum(
-                ExpressionWrapper(
-                    F('stock_quantity') * F('price'),
-                    output_field=DecimalField()
-                )
-            ),
-            low_stock_count=Count(
-                'id',
-                filter=Q(stock_quantity__lte=F('minimum_stock'))
-            )
-        )
-
-        context.update(stats)
-        context['page_sizes'] = [50, 100, 200]
-        context['current_page_size'] = int(self.request.GET.get('page_size', 50))
         context['page_total_value'] = sum(p.total_value for p in context['products'])
         return context
-    
-    def get_paginate_by(self, queryset):
-        return self.request.GET.get('page_size', self.paginate_by)
 
 
-class MovementReportView(LoginRequiredMixin, ListView):
-    """Relatório Movimentações"""
-    model = StockMovement
+class MovementReportView(LoginRequiredMixin, ReportQueryMixin, ListView):
+    """
+    Relatório Movimentações (filtros por data e tipo; inclui o arquivo
+    quando o período alcança movimentações arquivadas)
+    """
+    query_class = MovementReportQuery
     template_name = 'reports/movement_report.html'
     context_object_name = 'movements'
-    paginate_by = 50
 
-    def get_queryset(self):
-        """
-        Retorna movimentações filtradas por data e tipo
-        """
-        queryset = StockMovement.objects.select_related('product', 'user').order_by('-created_at')
-
-        # Filtro por período
-        start_date = self.request.GET.get('start')
-        end_date = self.request.GET.get('end')
-
-        if start_date:
-            try:
-                start = datetime.strptime(start_date, '%Y-%m-%d')
-                queryset = queryset.filter(created_at__gte=start)
-            except ValueError:
-                pass    # <- ignore se formato inválido
-        
-        if end_date:
-            try:
-                end = datetime.strptime(end_date, '%Y-%m-%d')
-                end = end + timedelta(days=1)   # <- add 1 dia para incluir todo o dia final
-                queryset = queryset.filter(created_at__lt=end)
-            except ValueError:
-                pass    # <- ignore se formato inválido
-        
-        if start_date and end_date:
-            if end > start:
-                queryset = queryset.filter(created_at__range=[start, end])
-        
-        # Filtro tipo movimentação
-        movement_type = self.request.GET.get('type')
-        if movement_type in dict(StockMovement.MOVEMENT_TYPES):
-            queryset = queryset.filter(movement_type=movement_type)
-        
-        return queryset
-    
     def get_context_data(self, **kwargs):
-        """
-        Adiciona estatísticas ao contexto
-        """
         context = super().get_context_data(**kwargs)
 
-        # Calcula totais baseados no queryset filtrado
-        movements = self.get_queryset()
-
-        context['total_movements'] = movements.count()
-        context['total_in'] = movements.filter(movement_type='IN').count()
-        context['total_out'] = movements.filter(movement_type='OUT').count()
-        context['total_adj'] = movements.filter(movement_type='ADJ').count()
-
         # Preserva valores dos filtros para os campos
         context['start_date'] = self.request.GET.get('start', '')
         context['end_date'] = self.request.GET.get('end', '')
@@ -175,6 +118,34 @@ class MovementReportView(LoginRequiredMixin, ListView):
         return context
 
 
+def report_json(request, query_class):
+    """Página do relatório em JSON (mesma projeção, filtros e totais da página HTML)"""
+    query = query_class(request.GET)
+    page = query.page(request.GET)
+    data = {
+        'filters': query.normalized(),
+        'errors': query.errors,
+        'totals': query.cached_totals,
+        'count': page.paginator.count,
+    }
+    if isinstance(page, KeysetPage):
+        data.update(next=page.next_cursor, previous=page.previous_cursor)
+    else:
+        data.update(page=page.number, num_pages=page.paginator.num_pages)
+    data['results'] = [query.json_row(row) for row in page]
+    return JsonResponse(data)
+
+
+@login_required
+def stock_report_json(request):
+    return report_json(request, StockReportQuery)
+
+
+@login_required
+def movement_report_json(request):
+    return report_json(request, MovementReportQuery)
+
+
 class UserReportView(AdminRequiredMixin, LoginRequiredMixin, TemplateView):
     """
     Relatório detalhado de usuários, papéis e atividades recentes.
@@ -218,103 +189,156 @@ class UserReportView(AdminRequiredMixin, LoginRequiredMixin, TemplateView):
         return context
 
 
+# -- Exportações --
+def csv_response(report, params):
+    """Exportação CSV em streaming durante a requisição"""
+    filters = report.normalize(params)
+    rows = (report.csv_row(row) for row in report.rows(filters))
+    response = StreamingHttpResponse(stream_csv(report.header, rows), content_type=EXPORTERS['csv'].content_type)
+    response['Content-Disposition'] = f'attachment; filename="{report.filename}.csv"'
+    return response
 
-def export_stock_csv(request):
-    """Export CSV Estoque"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="relatorio_estoque.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'Produto', 'SKU', 'Categoria',
-        'Estoque Atual', 'Estoque Mínimo',
-        'Preço Unit.', 'Valor Total', 'Status'
-    ])
-
-    # Busca produtos do banco
-    products = Product.objects.select_related('category').annotate(
-        total_value=ExpressionWrapper(
-            F('stock_quantity') * F('price'),
-            output_field=DecimalField(max_digits=15, decimal_places=2)
-        )
+
+def xlsx_response(report, params):
+    """Exportação XLSX (write-only) durante a requisição"""
+    filters = report.normalize(params)
+    rows = (report.xlsx_row(row) for row in report.rows(filters))
+    output = write_xlsx(report.title, report.header, rows, report.xlsx_formats)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{report.filename}.xlsx',
+        content_type=EXPORTERS['xlsx'].content_type,
     )
 
-    for product in products:
-        # Determina status
-        if product.stock_quantity == 0:
-            status = 'Sem Estoque'
-        elif product.stock_quantity <= product.minimum_stock:
-            status = 'Estoque Baixo'
-        else:
-            status = 'Normal'
-        
-        writer.writerow([
-            product.name,
-            product.sku,
-            product.category.name,
-            product.stock_quantity,
-            product.minimum_stock,
-            f'{product.price:.2f}',
-            f'{product.total_value:.2f}',
-            status,
-
-        ])
 
-    return response
+@login_required
+def export_stock_csv(request):
+    """Export CSV Estoque (streaming)"""
+    return csv_response(EXPORT_REPORTS['stock'], request.GET)
 
 
+@login_required
 def export_movements_csv(request):
-    """Export CSV Movimentos"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="relatorio_movimentacoes.csv"'
+    """Export CSV Movimentos (streaming, mesmos filtros da view, inclui o arquivo se alcançado)"""
+    return csv_response(EXPORT_REPORTS['movements'], request.GET)
 
-    writer = csv.writer(response)
-    writer.writerow([
-        'Data/Hora', 'Produto', 'SKU',
-        'Tipo', 'Quantidade', 'Responsável',
-        'Motivo'
-    ])
 
-    # Busca movimentações com mesmos filtros da view
-    movements = StockMovement.objects.select_related('product', 'user').order_by('-created_at')
+@login_required
+def export_stock_xlsx(request):
+    """Export XLSX Estoque (células numéricas tipadas)"""
+    return xlsx_response(EXPORT_REPORTS['stock'], request.GET)
 
-    # Aplica filtros data
-    start_date = request.GET.get('start')
-    end_date = request.GET.get('end')
 
-    if start_date:
-        try:
-            start = datetime.strptime(start_date, '%Y-%m-%d')
-            movements = movements.filter(created_at__gte=start)
-        except ValueError:
-            pass
-    
-    if end_date:
+@login_required
+def export_movements_xlsx(request):
+    """Export XLSX Movimentos (mesmos filtros da view, datas e quantidades tipadas)"""
+    return xlsx_response(EXPORT_REPORTS['movements'], request.GET)
+
+
+@login_required
+def export_pdf(request, report):
+    """
+    Export PDF (estoque ou movimentações). Entrega o arquivo em cache se a
+    versão dos dados não mudou; senão cria um job de exportação e leva à
+    página do job, que baixa o PDF quando estiver pronto.
+    """
+    if report not in EXPORT_REPORTS:
+        raise Http404('Relatório não encontrado')
+
+    path = pdf.cached_path(report, EXPORT_REPORTS[report].normalize(request.GET))
+    if path.exists():
         try:
-            end = datetime.strptime(end_date, '%Y-%m-%d')
-            end = end + timedelta(days=1)
-            movements = movements.filter(created_at__lt=end)
-        except ValueError:
-            pass
-    
-    # Aplica filtro de tipo
-    movement_type = request.GET.get('type')
-    if movement_type in dict(StockMovement.MOVEMENT_TYPES):
-        movements = movements.filter(movement_type=movement_type)
-    
-    # Escreve dados
-    for movement in movements:
-        tipo_display = movement.get_movement_type_display()
-        quantidade = f"-{movement.quantity}" if movement.movement_type == 'OUT' else str(movement.quantity)
-
-        writer.writerow([
-            movement.created_at.strftime('%d/%m/%Y %H:%M'),
-            movement.product.name,
-            movement.product.sku,
-            tipo_display,
-            quantidade,
-            movement.user.username,
-            movement.reason or '-'
-        ])
+            return FileResponse(
+                open(path, 'rb'),
+                as_attachment=True,
+                filename=f'{EXPORT_REPORTS[report].filename}.pdf',
+                content_type=EXPORTERS['pdf'].content_type,
+            )
+        except FileNotFoundError:
+            pass    # <- substituído por uma versão mais nova; segue para o job
 
-    return response
+    return submit_and_redirect(request, report, 'pdf', request.GET)
+
+
+# -- Jobs de exportação --
+def submit_and_redirect(request, report, export_format, params):
+    try:
+        job = submit_export(request.user, report, export_format, params)
+    except ExportLimitExceeded:
+        messages.error(
+            request,
+            f'Você já tem {settings.EXPORT_MAX_ACTIVE_PER_USER} exportações em andamento. '
+            'Aguarde alguma terminar.'
+        )
+        return redirect('reports:export_job_list')
+    return redirect('reports:export_job_detail', pk=job.pk)
+
+
+@login_required
+@require_POST
+def export_job_create(request):
+    """Cria um job de exportação com os filtros enviados pelo formulário do relatório"""
+    report = request.POST.get('report')
+    export_format = request.POST.get('format')
+    if report not in EXPORT_REPORTS or export_format not in EXPORTERS:
+        raise Http404('Exportação não encontrada')
+    return submit_and_redirect(request, report, export_format, request.POST)
+
+
+class ExportJobListView(LoginRequiredMixin, ListView):
+    """Exportações do usuário"""
+    template_name = 'reports/export_job_list.html'
+    context_object_name = 'jobs'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+
+
+@login_required
+def export_job_detail(request, pk):
+    """Acompanhamento de um job (a página consulta o status até o arquivo ficar pronto)"""
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    return render(request, 'reports/export_job_detail.html', {
+        'job': job,
+        'report': EXPORT_REPORTS[job.report],
+        'exporter': EXPORTERS[job.format],
+    })
+
+
+@login_required
+def export_job_status(request, pk):
+    """Status do job em JSON (uma consulta, usado no polling da página do job)"""
+    job = get_object_or_404(
+        ExportJob.objects.only('status', 'rows_written', 'total_rows', 'error', 'user_id'),
+        pk=pk, user=request.user,
+    )
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'progress': job.progress,
+        'error': job.error,
+        'download_url': reverse('reports:export_job_download', args=[job.pk]) if job.status == ExportJob.DONE else None,
+    })
+
+
+@login_required
+def export_job_download(request, pk):
+    """Download do arquivo de um job concluído"""
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user, status=ExportJob.DONE)
+    exporter = EXPORTERS[job.format]
+    try:
+        output = open(job.file_path, 'rb')
+    except FileNotFoundError:
+        raise Http404('Arquivo expirado. Gere a exportação novamente.')
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{EXPORT_REPORTS[job.report].filename}.{exporter.extension}',
+        content_type=exporter.content_type,
+    )
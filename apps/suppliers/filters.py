@@ -1,10 +1,11 @@
 import django_filters
+from .keys import cnpj_lookup, only_digits
 from .models import Supplier
 
 
 class SupplierFilter(django_filters.FilterSet):
     """
-    Filtra por nome, email e CNPJ
+    Filtra por nome, email e CNPJ (pelos dígitos, em qualquer formatação)
     """
     name = django_filters.CharFilter(
         lookup_expr='icontains',
@@ -15,10 +16,17 @@ class SupplierFilter(django_filters.FilterSet):
         label='Email'
     )
     cnpj = django_filters.CharFilter(
-        lookup_expr='icontains',
+        method='filter_cnpj',
         label='CNPJ'
     )
 
     class Meta:
         model = Supplier
         fields = ['name', 'email', 'cnpj']
+
+    def filter_cnpj(self, queryset, name, value):
+        """CNPJ começando pelos dígitos informados (índice em `cnpj_digits`)"""
+        digits = only_digits(value)
+        if not digits:
+            return queryset.filter(cnpj__icontains=value)
+        return queryset.filter(cnpj_lookup(digits))
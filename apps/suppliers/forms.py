@@ -27,8 +27,8 @@ class SupplierForm(forms.ModelForm):
             if len(cnpj_digits) != 14:
                 raise forms.ValidationError("CNPJ deve conter 14 dígitos.")
             
-            # Verifica unicidade
-            query = Supplier.objects.filter(cnpj=cnpj)
+            # Verifica unicidade pelos dígitos (mesmo CNPJ com outra pontuação)
+            query = Supplier.objects.filter(cnpj_digits=cnpj_digits)
             if self.instance and self.instance.pk:
                 query = query.exclude(pk=self.instance.pk)
             
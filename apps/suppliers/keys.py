@@ -0,0 +1,90 @@
+"""
+Chaves numéricas de CNPJ e telefone dos fornecedores.
+
+`Supplier.cnpj` e `Supplier.phone` guardam o valor como digitado
+("12.345.678/0001-90", "(11) 98765-4321"), e um `icontains` neles percorre
+a tabela inteira. `cnpj_digits` e `phone_digits` guardam só os dígitos, com
+índice B-tree: preenchidos em save() e bulk_create (`fill_keys`);
+`python manage.py refresh_supplier_keys` recalcula (ou confere, com --check)
+depois de alterações feitas direto no banco.
+
+Um termo "numérico" (só dígitos e a pontuação de CNPJ/telefone) vira busca
+por prefixo dos dígitos, escrita como intervalo (`>= '1234' AND < '1235'`) e
+não como LIKE: o intervalo usa o índice em qualquer banco, enquanto
+`LIKE '1234%'` só usa índice no SQLite com COLLATE NOCASE e no PostgreSQL
+com collation "C" ou opclass *_pattern_ops. CNPJ completo (14 dígitos) é
+busca exata. Telefones são comparados como gravados: quem cadastrou com
+"+55" precisa digitar o 55.
+"""
+
+import re
+
+from django.db.models import Q
+
+
+# Termo com só dígitos e a pontuação de CNPJ e telefone
+NUMERIC_TERM = re.compile(r'[\d\s./()+-]+')
+
+# Dígitos mínimos para buscar pelas chaves (o autocomplete exige 2 caracteres)
+MIN_DIGITS = 2
+
+CNPJ_LENGTH = 14
+
+
+def only_digits(value):
+    return re.sub(r'\D', '', str(value or ''))
+
+
+def numeric_term(query):
+    """Dígitos de `query` se ele parece um CNPJ ou telefone; '' caso contrário"""
+    query = (query or '').strip()
+    if not NUMERIC_TERM.fullmatch(query):
+        return ''
+    digits = only_digits(query)
+    return digits if len(digits) >= MIN_DIGITS else ''
+
+
+def prefix_lookup(field, digits):
+    """Q dos valores de `field` que começam com `digits` (intervalo no índice)"""
+    upper = str(int(digits) + 1).zfill(len(digits))
+    lookup = Q(**{f'{field}__gte': digits})
+    if len(upper) == len(digits):  # "99..." não tem limite superior de mesmo tamanho
+        lookup &= Q(**{f'{field}__lt': upper})
+    return lookup
+
+
+def cnpj_lookup(digits):
+    if len(digits) >= CNPJ_LENGTH:
+        return Q(cnpj_digits=digits)
+    return prefix_lookup('cnpj_digits', digits)
+
+
+def numeric_lookup(digits):
+    """Q dos fornecedores cujo CNPJ ou telefone começa com `digits`"""
+    return cnpj_lookup(digits) | prefix_lookup('phone_digits', digits)
+
+
+def matches(term, keys):
+    """Mesmo critério de `numeric_lookup`, em memória; `keys`: (cnpj_digits, phone_digits)"""
+    digits = numeric_term(term)
+    if not digits:
+        return False
+    cnpj, phone = keys
+    if len(digits) >= CNPJ_LENGTH:
+        return cnpj == digits or phone.startswith(digits)
+    return cnpj.startswith(digits) or phone.startswith(digits)
+
+
+def fill_keys(suppliers):
+    """Preenche `cnpj_digits` e `phone_digits` a partir de `cnpj` e `phone`"""
+    for supplier in suppliers:
+        supplier.cnpj_digits = only_digits(supplier.cnpj)
+        supplier.phone_digits = only_digits(supplier.phone)
+
+
+def outdated_keys(queryset):
+    """Fornecedores de `queryset` com chaves desatualizadas, já com os valores corrigidos (não gravados)"""
+    for supplier in queryset.only('cnpj', 'phone', 'cnpj_digits', 'phone_digits').order_by('pk').iterator(chunk_size=2000):
+        if (supplier.cnpj_digits, supplier.phone_digits) != (only_digits(supplier.cnpj), only_digits(supplier.phone)):
+            fill_keys([supplier])
+            yield supplier
@@ -7,6 +7,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction, IntegrityError
 from faker import Faker
 from apps.suppliers.models import Supplier
+from apps.inventory.counts import add_rows
 
 
 class Command(BaseCommand):
@@ -253,6 +254,8 @@ class Command(BaseCommand):
                         suppliers_list,
                         batch_size=100
                     )
+                    # bulk_create não dispara sinais: atualiza o total de linhas mantido
+                    add_rows(Supplier, len(suppliers_list))
                     
                     self.stdout.write(
                         self.style.SUCCESS(
@@ -0,0 +1,64 @@
+"""
+Management command para recalcular as chaves numéricas dos fornecedores.
+Uso: python manage.py refresh_supplier_keys [opções]
+
+`Supplier.cnpj_digits` e `Supplier.phone_digits` são preenchidos em save()
+e bulk_create. Rode este comando depois de alterações que não passam por
+esses pontos (UPDATE em lote, importação direta no banco) ou com --check
+para contar os fornecedores desatualizados. Só as linhas que mudam são
+gravadas, em lotes, uma transação por lote.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.suppliers.keys import outdated_keys
+from apps.suppliers.models import Supplier
+
+
+class Command(BaseCommand):
+    """
+    Recalcula Supplier.cnpj_digits e Supplier.phone_digits a partir de cnpj e phone.
+    """
+
+    help = 'Recalcula as chaves numéricas (CNPJ e telefone) dos fornecedores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Fornecedores por transação (padrão: 2000)'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Apenas conta os fornecedores desatualizados, sem gravar'
+        )
+
+    def handle(self, *args, **options):
+        outdated = outdated_keys(Supplier.objects.all())
+
+        if options['check']:
+            count = sum(1 for _ in outdated)
+            if count:
+                self.stdout.write(self.style.WARNING(f'⚠️  {count} fornecedor(es) com chaves desatualizadas'))
+            else:
+                self.stdout.write(self.style.SUCCESS('✅ Chaves de CNPJ e telefone conferem'))
+            return
+
+        batch_size = max(1, options['batch_size'])
+        batch, updated = [], 0
+        for supplier in outdated:
+            batch.append(supplier)
+            if len(batch) == batch_size:
+                updated += self.save_batch(batch)
+                batch = []
+        if batch:
+            updated += self.save_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {updated} fornecedor(es) atualizado(s)'))
+
+    def save_batch(self, suppliers):
+        with transaction.atomic():
+            return Supplier.objects.bulk_update(suppliers, ['cnpj_digits', 'phone_digits'])
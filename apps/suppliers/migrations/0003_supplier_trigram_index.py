@@ -0,0 +1,38 @@
+# Busca aproximada por trigramas (ver apps/inventory/trigram.py): extensão
+# pg_trgm e índice GIN no nome. Fora do PostgreSQL não há o que criar
+# (índice em memória).
+
+from django.db import migrations
+
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS supplier_name_trgm_idx ON suppliers_supplier USING GIN (name gin_trgm_ops)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS supplier_name_trgm_idx",
+]
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_REVERSE:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0002_supplier_supplier_name_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,60 @@
+# Chaves numéricas de CNPJ e telefone (ver apps/suppliers/keys.py): só os
+# dígitos, com índice B-tree para busca exata e por prefixo. Substituem o
+# índice em `cnpj`, que não atendia o `icontains` da busca. As colunas são
+# preenchidas antes da criação dos índices.
+
+import re
+
+from django.db import migrations, models
+
+
+def only_digits(value):
+    return re.sub(r'\D', '', str(value or ''))
+
+
+def fill_digit_keys(apps, schema_editor):
+    """Preenche as chaves dos fornecedores existentes, em lotes"""
+    Supplier = apps.get_model('suppliers', 'Supplier')
+    batch = []
+    for supplier in Supplier.objects.only('cnpj', 'phone').order_by('pk').iterator(chunk_size=2000):
+        supplier.cnpj_digits = only_digits(supplier.cnpj)
+        supplier.phone_digits = only_digits(supplier.phone)
+        batch.append(supplier)
+        if len(batch) == 2000:
+            Supplier.objects.bulk_update(batch, ['cnpj_digits', 'phone_digits'])
+            batch = []
+    if batch:
+        Supplier.objects.bulk_update(batch, ['cnpj_digits', 'phone_digits'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0003_supplier_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='supplier',
+            name='supplier_cnpj_idx',
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='cnpj_digits',
+            field=models.CharField(blank=True, default='', editable=False, max_length=18),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='phone_digits',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_digit_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['cnpj_digits'], name='supplier_cnpj_digits_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['phone_digits'], name='supplier_phone_digits_idx'),
+        ),
+    ]
@@ -1,7 +1,17 @@
 from django.db import models
 
+from .keys import fill_keys
+
 # Create your models here.
 
+class SupplierQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Preenche as chaves numéricas antes de inserir (bulk_create não chama save())"""
+        objs = list(objs)
+        fill_keys(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Supplier(models.Model):
     name = models.CharField(max_length=200)
     contact_person = models.CharField(max_length=100, blank=True)
@@ -9,6 +19,11 @@ class Supplier(models.Model):
     phone = models.CharField(max_length=20, blank=True)
     address = models.TextField(blank=True)
     cnpj = models.CharField(max_length=18, blank=True)
+    # Só os dígitos de CNPJ e telefone, para busca exata/por prefixo no índice (ver keys.py)
+    cnpj_digits = models.CharField(max_length=18, blank=True, default='', editable=False)
+    phone_digits = models.CharField(max_length=20, blank=True, default='', editable=False)
+
+    objects = SupplierQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Fornecedor"
@@ -17,9 +32,15 @@ class Supplier(models.Model):
         indexes = [
             models.Index(fields=['name'], name='supplier_name_idx'),
             models.Index(fields=['email'], name='supplier_email_idx'),
-            models.Index(fields=['cnpj'], name='supplier_cnpj_idx'),
+            models.Index(fields=['cnpj_digits'], name='supplier_cnpj_digits_idx'),
+            models.Index(fields=['phone_digits'], name='supplier_phone_digits_idx'),
         ]
 
     def __str__(self):
         return self.name
-    
\ No newline at end of file
+
+    def save(self, *args, **kwargs):
+        fill_keys([self])
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'cnpj_digits', 'phone_digits'}
+        super().save(*args, **kwargs)
@@ -1,3 +1,98 @@
 from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.db.models import Q
+from django.contrib.auth.models import User
+from apps.suppliers.forms import SupplierForm
+from apps.suppliers.keys import numeric_term, prefix_lookup
+from apps.suppliers.models import Supplier
+from io import StringIO
 
 # Create your tests here.
+
+
+class SupplierDigitKeysTest(TestCase):
+    """Testes das chaves numéricas de CNPJ e telefone dos fornecedores"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='comprador', password='senha123456'))
+        self.paulista = Supplier.objects.create(
+            name='Distribuidora Paulista', phone='(11) 98765-4321', cnpj='12.345.678/0001-90'
+        )
+        self.mineira = Supplier.objects.create(
+            name='Atacado Mineiro', phone='(31) 3333-1234', cnpj='12.399.000/0001-10'
+        )
+
+    def autocomplete(self, term):
+        response = self.client.get(reverse('suppliers:supplier_autocomplete'), {'q': term})
+        return [r['name'] for r in response.json()['results']]
+
+    def test_chaves_preenchidas_na_gravacao(self):
+        """Testa save(), save(update_fields) e bulk_create"""
+        self.assertEqual((self.paulista.cnpj_digits, self.paulista.phone_digits), ('12345678000190', '11987654321'))
+
+        self.paulista.phone = '(11) 2222-0000'
+        self.paulista.save(update_fields=['phone'])
+        self.paulista.refresh_from_db()
+        self.assertEqual(self.paulista.phone_digits, '1122220000')
+
+        Supplier.objects.bulk_create([Supplier(name='Casa do Parafuso', cnpj='98.765.432/0001-00')])
+        self.assertEqual(Supplier.objects.get(name='Casa do Parafuso').cnpj_digits, '98765432000100')
+
+    def test_termos_numericos_e_intervalos(self):
+        """Testa a detecção de termos numéricos e o prefixo como intervalo"""
+        self.assertEqual(numeric_term('12.345.678/0001-90'), '12345678000190')
+        self.assertEqual(numeric_term('(11) 9876'), '119876')
+        self.assertEqual(numeric_term('Distribuidora 12'), '')
+        self.assertEqual(numeric_term('1'), '')
+        self.assertEqual(prefix_lookup('cnpj_digits', '0129'), Q(cnpj_digits__gte='0129') & Q(cnpj_digits__lt='0130'))
+        self.assertEqual(prefix_lookup('cnpj_digits', '99'), Q(cnpj_digits__gte='99'))
+        self.assertEqual(
+            list(Supplier.objects.filter(prefix_lookup('cnpj_digits', '12399')).values_list('name', flat=True)),
+            ['Atacado Mineiro'],
+        )
+        self.assertEqual(Supplier.objects.filter(prefix_lookup('cnpj_digits', '99')).count(), 0)
+
+    def test_autocomplete_por_cnpj_e_telefone(self):
+        """Testa busca exata, por prefixo e com outra pontuação"""
+        self.assertEqual(self.autocomplete('12345678000190'), ['Distribuidora Paulista'])
+        self.assertEqual(self.autocomplete('12.3'), ['Atacado Mineiro', 'Distribuidora Paulista'])
+        self.assertEqual(self.autocomplete('(31) 3333'), ['Atacado Mineiro'])
+        self.assertEqual(self.autocomplete('11 98765-4321'), ['Distribuidora Paulista'])
+        self.assertEqual(self.autocomplete('0001-90'), [])
+        self.assertEqual(self.autocomplete('distribuidra'), ['Distribuidora Paulista'])
+
+    def test_autocomplete_por_trecho_do_email(self):
+        """Testa se trechos do email (com ou sem "@") encontram o fornecedor"""
+        self.mineira.email = 'compras@atacadomineiro.com.br'
+        self.mineira.save()
+        Supplier.objects.create(name='Casa do Parafuso', email='casaparafuso@gmail.com')
+
+        self.assertEqual(self.autocomplete('gmail'), ['Casa do Parafuso'])
+        self.assertEqual(self.autocomplete('compras@'), ['Atacado Mineiro'])
+        self.assertEqual(self.autocomplete('atacadomineiro'), ['Atacado Mineiro'])
+
+    def test_filtro_e_unicidade_por_digitos(self):
+        """Testa o filtro de CNPJ da lista e a unicidade com outra formatação"""
+        response = self.client.get(reverse('suppliers:supplier_list'), {'cnpj': '12.345.6'})
+        self.assertEqual([s.name for s in response.context['filter'].qs], ['Distribuidora Paulista'])
+
+        form = SupplierForm(data={'name': 'Duplicado', 'cnpj': '12345678000190'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('cnpj', form.errors)
+
+    def test_comando_de_recalculo(self):
+        """Testa --check e o recálculo após UPDATE direto"""
+        Supplier.objects.filter(pk=self.mineira.pk).update(cnpj='11.111.111/0001-11')
+
+        out = StringIO()
+        call_command('refresh_supplier_keys', '--check', stdout=out)
+        self.assertIn('1 fornecedor(es)', out.getvalue())
+
+        call_command('refresh_supplier_keys', stdout=StringIO())
+        self.assertEqual(Supplier.objects.get(pk=self.mineira.pk).cnpj_digits, '11111111000111')
+        out = StringIO()
+        call_command('refresh_supplier_keys', '--check', stdout=out)
+        self.assertIn('conferem', out.getvalue())
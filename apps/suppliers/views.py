@@ -7,18 +7,20 @@ from django.views.generic import (
     DeleteView,
 )
 from django.views import View
-from django.views.decorators.cache import cache_page
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.http import JsonResponse
-from django.db.models import Q
 from django.utils.decorators import method_decorator
 
 from .models import Supplier
 from .forms import SupplierForm
 from .filters import SupplierFilter
+from . import keys
 
 from apps.accounts.mixins import AdminRequiredMixin, ManagerOrAdminRequiredMixin
+from apps.inventory.autocomplete import SUPPLIERS, AutocompleteCache
+from apps.inventory.pagination import EstimatedCountPaginator
+from apps.inventory.trigram import fuzzy_search
 from django_ratelimit.decorators import ratelimit
 
 # Create your views here.
@@ -30,6 +32,7 @@ class SupplierListView(LoginRequiredMixin, ListView):
     template_name = 'suppliers/supplier_list.html'
     context_object_name = 'suppliers'
     paginate_by = 15
+    paginator_class = EstimatedCountPaginator
 
     def get_queryset(self):
         """ Adiciona busca simples por nome, email ou CNPJ """
@@ -62,25 +65,49 @@ class SupplierDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'supplier'
 
 @method_decorator(ratelimit(key='ip', rate='30/m', method='GET'), name='dispatch')  # Rate limiting para prevenir abuso API
-@method_decorator(cache_page(60 * 5), name='dispatch')      # Cache de 5 minutos
 class SupplierAutocompleteView(View):
     """
     API endpoint para autocomplete de fornecedores
     API com rate limit: máximo 30 requisições por minuto por IP.
-    Cache: 5 minutos para reduzir carga no DB.
+    Cache por termo normalizado, invalidado pelas gravações de fornecedores
+    (ver apps/inventory/autocomplete.py).
+    Termo com só dígitos e pontuação (CNPJ, telefone): busca exata/por
+    prefixo nas chaves numéricas indexadas (ver keys.py). Demais termos: nome
+    por similaridade de trigramas (tolera erros de digitação), completado
+    pelos emails que contêm o termo (ex.: "gmail").
     """
 
+    autocomplete_cache = AutocompleteCache(SUPPLIERS, matches=keys.matches)
+
     def get(self, request):
         query = request.GET.get('q', '').strip()
 
         if len(query) < 2:
             return JsonResponse({'results': []})
-        
-        suppliers = Supplier.objects.filter(
-            Q(name__icontains=query) |
-            Q(email__icontains=query) |
-            Q(cnpj__icontains=query)
-        ).only('id', 'name', 'email', 'phone').order_by('name')[:10]
+
+        results = self.autocomplete_cache.get(query, self.search)
+
+        return JsonResponse({
+            'results': results,
+            'count': len(results),
+            'query': query
+        })
+
+    def search(self, query):
+        """Resultados e chaves numéricas de cada um (None fora da busca por chaves)"""
+        queryset = Supplier.objects.only('id', 'name', 'email', 'phone', 'cnpj_digits', 'phone_digits')
+        digits = keys.numeric_term(query)
+
+        if digits:
+            suppliers = list(queryset.filter(keys.numeric_lookup(digits)).order_by('name')[:10])
+        else:
+            suppliers = fuzzy_search(queryset, query, ('name',), limit=10)
+            if len(suppliers) < 10:
+                found = [s.id for s in suppliers]
+                suppliers += list(
+                    queryset.filter(email__icontains=query)
+                    .exclude(id__in=found).order_by('name')[:10 - len(found)]
+                )
 
         results = [
             {
@@ -92,12 +119,7 @@ class SupplierAutocompleteView(View):
             }
             for s in suppliers
         ]
-        
-        return JsonResponse({
-            'results': results,
-            'count': len(results),
-            'query': query
-        })
+        return results, [(s.cnpj_digits, s.phone_digits) for s in suppliers] if digits else None
 
 
 
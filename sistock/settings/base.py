@@ -154,6 +154,72 @@ MEDIA_ROOT = BASE_DIR / 'media'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Estratégia de baixa de estoque em saídas (apps/inventory/services.py):
+# 'conditional' (UPDATE ... WHERE stock_quantity >= qtd) ou 'select_for_update'
+STOCK_DECREMENT_STRATEGY = config('STOCK_DECREMENT_STRATEGY', default='conditional')
+
+# Particionamento mensal da tabela de movimentações (somente PostgreSQL).
+# Ligado, a migração 0005 converte a tabela; partições futuras são criadas
+# com `python manage.py movement_partitions` (agendar mensalmente).
+STOCK_MOVEMENT_PARTITIONING = config('STOCK_MOVEMENT_PARTITIONING', default=False, cast=bool)
+
+# Janela de retenção da tabela de movimentações: meses mais antigos são
+# movidos para o arquivo frio com `python manage.py archive_movements`
+MOVEMENT_ARCHIVE_AFTER_MONTHS = config('MOVEMENT_ARCHIVE_AFTER_MONTHS', default=24, cast=int)
+
+# Fronteira do arquivo de movimentações em cache (segundos): curta, porque com
+# cache por processo os demais só veem um arquivamento novo quando ela expira
+ARCHIVED_UNTIL_CACHE_TIMEOUT = config('ARCHIVED_UNTIL_CACHE_TIMEOUT', default=5, cast=int)
+
+# Contagens estimadas: acima deste número de linhas, paginadores e cards
+# mostram "cerca de N" (estatísticas do PostgreSQL ou TableRowCount) em vez de COUNT(*)
+COUNT_ESTIMATE_THRESHOLD = config('COUNT_ESTIMATE_THRESHOLD', default=10_000, cast=int)
+
+# Busca aproximada por trigramas fora do PostgreSQL: segundos até reconstruir o
+# índice em memória de cada processo (edições feitas em outros processos)
+TRIGRAM_INDEX_TIMEOUT = config('TRIGRAM_INDEX_TIMEOUT', default=60 * 5, cast=int)
+
+# Índice de prefixos do autocomplete de produtos (em memória, por processo):
+# segundos até a reconstrução em segundo plano (mesma validade do cache dos autocompletes)
+PRODUCT_PREFIX_INDEX_TIMEOUT = config('PRODUCT_PREFIX_INDEX_TIMEOUT', default=60 * 5, cast=int)
+
+# Cache dos autocompletes (termo normalizado + versão no banco: escritas nos
+# modelos invalidam em todos os processos)
+AUTOCOMPLETE_CACHE_TIMEOUT = config('AUTOCOMPLETE_CACHE_TIMEOUT', default=60 * 5, cast=int)
+
+# Select2 de produtos (ProductLookupView): validade curta das respostas em
+# cache, que mostram o saldo (gravações também invalidam)
+PRODUCT_LOOKUP_CACHE_TIMEOUT = config('PRODUCT_LOOKUP_CACHE_TIMEOUT', default=30, cast=int)
+# Validade do token do widget (data-field_id, segundos): o formulário precisa ser recarregado depois disso
+PRODUCT_WIDGET_TOKEN_MAX_AGE = config('PRODUCT_WIDGET_TOKEN_MAX_AGE', default=60 * 60 * 12, cast=int)
+
+# Busca global: prazo de cada seção (segundos); seções atrasadas voltam vazias
+GLOBAL_SEARCH_TIMEOUT = config('GLOBAL_SEARCH_TIMEOUT', default=0.5, cast=float)
+
+# Métricas do dashboard em cache: invalidadas pelas gravações (versões no banco,
+# valem para todos os processos); idade máxima (segundos)
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=60 * 10, cast=int)
+
+# Token da coleta de métricas (GET /metrics/ com "Authorization: Bearer <token>");
+# vazio: só superusuários logados
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Arquivos gerados de relatórios (exportações e PDFs em cache por filtros + versão dos dados)
+REPORT_CACHE_DIR = config('REPORT_CACHE_DIR', default=str(BASE_DIR / 'var' / 'report_cache'))
+
+# Resultados dos relatórios em cache (chave inclui a versão dos dados: escritas invalidam)
+REPORT_RESULT_CACHE_TIMEOUT = config('REPORT_RESULT_CACHE_TIMEOUT', default=60 * 10, cast=int)
+
+# Jobs de exportação (python manage.py run_export_worker)
+EXPORT_WORKER_CONCURRENCY = config('EXPORT_WORKER_CONCURRENCY', default=2, cast=int)
+EXPORT_MAX_RUNNING = config('EXPORT_MAX_RUNNING', default=2, cast=int)
+EXPORT_MAX_ACTIVE_PER_USER = config('EXPORT_MAX_ACTIVE_PER_USER', default=3, cast=int)
+EXPORT_RETENTION_HOURS = config('EXPORT_RETENTION_HOURS', default=24, cast=int)
+# Job em andamento sem heartbeat há mais deste tempo volta para a fila (worker interrompido)
+EXPORT_STALE_MINUTES = config('EXPORT_STALE_MINUTES', default=30, cast=int)
+# True: executa o job durante a requisição (sem worker; útil em testes)
+EXPORT_JOBS_INLINE = config('EXPORT_JOBS_INLINE', default=False, cast=bool)
+
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'inventory:dashboard'
 LOGOUT_REDIRECT_URL = 'accounts:login'
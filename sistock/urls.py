@@ -20,6 +20,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 
+from apps.inventory.metrics import metrics_view
+
 
 def redirect_to_dashboard(request):
     """Redireciona ao Dashboard"""
@@ -37,6 +39,9 @@ urlpatterns = [
     path('suppliers/', include('apps.suppliers.urls')),
     path('reports/', include('apps.reports.urls')),
 
+    # Métricas (formato Prometheus)
+    path('metrics/', metrics_view, name='metrics'),
+
     # Root redirect
     path('', redirect_to_dashboard, name='root'),
     
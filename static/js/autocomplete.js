@@ -105,7 +105,7 @@ class Autocomplete {
             }
             
             const data = await response.json();
-            this.displayResults(data.results, query);
+            this.displayResponse(data, query);
 
         } catch (error) {
             if (error.name === 'AbortError') {
@@ -134,6 +134,10 @@ class Autocomplete {
         `;
     }
 
+    displayResponse(data, query) {
+        this.displayResults(data.results, query);
+    }
+
     displayResults(results, query) {
         if (results.length === 0) {
             this.resultsContainer.innerHTML = `
@@ -193,3 +197,80 @@ class Autocomplete {
         this.resultsContainer.classList.remove('show');
     }
 }
+
+
+/**
+ * Busca global: produtos, fornecedores e movimentações em uma requisição
+ * Uso: new GlobalSearch(inputElement, apiUrl)
+ * A resposta vem agrupada por seção ({sections: {products: {results, status}, ...}})
+ */
+class GlobalSearch extends Autocomplete {
+    static SECTIONS = {
+        products: { title: 'Produtos', icon: 'fa-box' },
+        suppliers: { title: 'Fornecedores', icon: 'fa-truck' },
+        movements: { title: 'Movimentações', icon: 'fa-exchange-alt' },
+    };
+
+    displayResponse(data, query) {
+        const sections = Object.entries(data.sections || {});
+
+        if (sections.every(([, section]) => section.results.length === 0 && section.status === 'ok')) {
+            this.displayResults([], query);
+            return;
+        }
+
+        this.resultsContainer.innerHTML = '';
+
+        sections.forEach(([name, section]) => {
+            const meta = GlobalSearch.SECTIONS[name] || { title: name, icon: 'fa-search' };
+
+            const header = document.createElement('div');
+            header.className = 'autocomplete-section';
+            header.innerHTML = `<i class="fas ${meta.icon}"></i> ${meta.title}`;
+            this.resultsContainer.appendChild(header);
+
+            // Seção atrasada ou com erro: as demais são exibidas normalmente
+            if (section.status !== 'ok') {
+                const notice = document.createElement('div');
+                notice.className = 'autocomplete-empty';
+                notice.textContent = 'Busca indisponível no momento.';
+                this.resultsContainer.appendChild(notice);
+                return;
+            }
+
+            if (section.results.length === 0) {
+                const empty = document.createElement('div');
+                empty.className = 'autocomplete-empty';
+                empty.textContent = 'Nenhum resultado';
+                this.resultsContainer.appendChild(empty);
+                return;
+            }
+
+            section.results.forEach(result => {
+                const item = document.createElement('div');
+                item.className = 'autocomplete-item';
+                item.innerHTML = this.formatSectionResult(name, result, query);
+                item.addEventListener('click', () => this.selectItem(result));
+                this.resultsContainer.appendChild(item);
+            });
+        });
+
+        this.showResults();
+    }
+
+    formatSectionResult(name, result, query) {
+        if (name === 'movements') {
+            return `
+                <div class="autocomplete-item-title">${result.product_name} (${result.movement_type_display})</div>
+                <div class="autocomplete-item-subtitle">${result.quantity} un. - ${result.user} - ${result.created_at}</div>
+            `;
+        }
+        return this.options.formatResult(result, query);
+    }
+
+    defaultOnSelect(result) {
+        if (result.url) {
+            window.location.href = result.url;
+        }
+    }
+}